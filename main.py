@@ -7,9 +7,10 @@ SYSTÈME DE COORDONNÉES :
   -Résolution capteur : 4056×3040 (Pi AI Camera).
   -L'image rognée fait ~3002×2918 pixels (dynamique selon crop).
   
-  Conversion (dynamique) :
-    mm_x = (pixel_x / crop_w) * 320
-    mm_y = (1 - pixel_y / crop_h) * 320
+  Conversion : homographie (+ distorsion) de models/calibration.npz (python -m src.calibration),
+  ramenée à la taille de l'image rognée. Sans calibration, règle de trois :
+    mm_x = (1 - pixel_x / crop_w) * 320
+    mm_y = (pixel_y / crop_h) * 320
 
   Les bacs sont sur le bord droit (X=320mm).
   
@@ -22,19 +23,29 @@ SYSTÈME DE COORDONNÉES :
     6.Aller et retour pour pousser les pièces qui seraient rester sur le bords
 """
 import time
+T_LANCEMENT = time.perf_counter() #référence du rapport de démarrage
 import sys
 import os
+import json
+import importlib
+import threading
+from collections import deque
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))) #pour bien trouver les dépendences
 
 import cv2
+import numpy as np
 import tkinter as tk
 from tkinter import messagebox
 
-from src.detection import detecter_objets, GST_PIPELINE
+# src.detection (torch, torchvision, skimage) n'est PAS importé ici : il est importé et préchauffé
+# en arrière-plan par Prechauffage pour que la fenêtre s'affiche tout de suite
 from src.piece_priority import (
     Piece, Boite, Plateau,
-    calculer_priorite, decrire_trajet
+    STRATEGIES_ORDRE, decrire_trajet, grouper_balayages, pieces_de
 )
+from src.push_compiler import ParametresPoussee, compiler, sequence_piece, pieces_touchees, couloir
+from src.tray_model import TrayState, paire_json, INCERTITUDE_BASE_MM
+from src.calibration import charger_ou_lineaire
 from src.tronxy_gui_pixel import TronxyPixelGUI
 from src.bac_assignment_gui import BacAssignmentGUI
 
@@ -78,47 +89,240 @@ F_POUSSEE = 6000
 F_Z = 1500
 F_BALAYAGE = 6000
 
+POUSSEE = ParametresPoussee(bord_x=BORD_X_MM, offset_x=OFFSET_X_MM, z_haute=Z_HAUTE, z_basse=Z_BASSE,
+                            f_rapide=F_RAPIDE, f_poussee=F_POUSSEE, f_z=F_Z)
+COMPILER_POUSSEES = True # Un programme compilé par lot entre deux re-scans (False : séquence fixe pièce par pièce)
+STRATEGIE_ORDRE = "glouton" # "glouton" (plus près du bord d'abord) ou "trajet" (mêmes collisions, moins de déplacements à vide)
+# "trajet" ne passe qu'en simulation (python -m src.benchmark ordre) : on garde "glouton" tant qu'il n'est pas validé sur la machine
+BALAYAGES_GROUPES = True # Les pièces d'un même bac alignées en Y sont poussées ensemble par un seul trait
+
+PARKING = {"X": 0.0, "Y": PLATE_H_MM, "Z": Z_HAUTE} # position de la tête pendant les photos
+
+#Run de référence du modèle cinématique (durées mesurées entre deux M400), None pour ne pas l'enregistrer
+REFERENCE_MOUVEMENTS = "mesures/reference_mouvements.json"
+
 #Re-scan
+RESCAN_POLITIQUE = "couloir" # "fixe" : photo toutes les RESCAN_EVERY_N pièces ; "couloir" : seulement si une poussée peut en déplacer une autre
 RESCAN_EVERY_N = 3 # Reprends une photo toutes les n poussée de pièces
+RESCAN_MAX_N = 10 # Politique "couloir" : photo de sécurité après ce nombre de pièces sans re-scan
+PREDICTION_PLATEAU = True # Politique "couloir" : re-planifie sur les positions prédites (TrayState) au lieu de reprendre une photo
+SEUIL_INCERTITUDE_MM = 8.0 # ... tant que l'incertitude des pièces déplacées reste sous ce seuil
+PAIRES_DETECTION = "mesures/paires_detection.jsonl" # Détections avant / après et poussées entre les deux (None : pas d'enregistrement)
+VERIFICATION_ROI = True # Avant un re-scan : photo vérifiée dans les seules zones des dernières poussées, sans DINOv2
+RAYON_PIECE_MM = 8.0 # demi-côté de la zone vérifiée autour d'une pièce
+LATENCES_VERIFICATION = {"vérification ROI": [], "re-scan complet": [], "re-scan sur photo ROI": []} # s, parking et photo compris (sauf le dernier)
+DETECTION_INCREMENTALE = True # Les re-scans ne recalculent que les zones modifiées depuis la photo précédente
+
+#Caméra
+CAMERA_CONTINUE = True # Thread de capture permanent : la photo est prise dès que la tête est garée
+CAMERA_TIMEOUT_S = 5.0 # Attente max d'une nouvelle frame (la caméra tourne à 1 image/s)
+CAMERA_ECHECS_MAX = 50 # Lectures ratées consécutives avant d'arrêter le thread de capture
+CAMERA_TAMPON_FRAMES = 1 # Frames que le pilote peut garder en file (appsink max-buffers=1) : une frame lue juste après t
+                         # a pu être exposée avant t, on attend donc CAMERA_TAMPON_FRAMES frames de plus
+CAMERA_HISTORIQUE = 16 # (séquence, instant de lecture) des dernières frames, pour retrouver la séquence à l'instant t
+
+
+CALIBRATION = charger_ou_lineaire() # pixels de l'image rognée -> mm, partagée avec l'interface pixels
 
 
 def pixels_vers_mm(px, py, crop_w, crop_h):
-    mm_x = (1.0 - px / crop_w) * PLATE_W_MM
-    mm_y = (py / crop_h) * PLATE_H_MM
-    return round(mm_x, 2), round(mm_y, 2)
+    mm_x, mm_y = CALIBRATION.pixels_vers_mm(px, py, crop_w, crop_h)
+    return round(float(mm_x), 2), round(float(mm_y), 2)
 
 #GESTION CAMÉRA
 class CameraManager:
-    def __init__(self):
+    """
+    Deux modes :
+      - continu (CAMERA_CONTINUE) : un thread lit la caméra en permanence et garde seulement la
+        dernière frame dans un buffer préalloué, avec son horodatage et son numéro de séquence.
+        get_frame(after=t) rend la première frame exposée après t : horodatée à la fin de read(), elle doit
+        suivre de plus de CAMERA_TAMPON_FRAMES la dernière frame lue avant t (file du pilote).
+      - ponctuel : ouverture + 2 s d'attente, puis on jette 5 frames à chaque capture.
+    """
+
+    def __init__(self, continu=None):
+        self.continu = CAMERA_CONTINUE if continu is None else continu
         self.cap = None
+        self._thread = None
+        self._actif = False
+        self._cond = threading.Condition()
+        self._buffers = [None, None]  # [frame publiée, frame en cours d'écriture]
+        self._sequence = 0            # numéro de la frame publiée (0 = aucune)
+        self._horodatage = 0.0        # time.monotonic() à la fin de sa lecture
+        self._lectures = deque(maxlen=CAMERA_HISTORIQUE)  # (sequence, horodatage) des dernières frames lues
+        self.info_derniere_frame = None  # (sequence, horodatage) de la dernière frame rendue
 
     def start(self): #démarre le truc
         if self.cap is None or not self.cap.isOpened():
+            from src.detection import GST_PIPELINE # attend la fin de l'import en arrière-plan si besoin
             print("Démarrage de la caméra (GStreamer)...")
             self.cap = cv2.VideoCapture(GST_PIPELINE, cv2.CAP_GSTREAMER) #prends un photo avec le setup gst
             if not self.cap.isOpened():
                 print("Erreur GStreamer. Tentative webcam standard (0)...")
                 self.cap = cv2.VideoCapture(0)
-            time.sleep(2)
-
-    def get_frame(self): #prend la photo
+            if not self.continu:
+                time.sleep(2)
+        if self.continu and self.cap.isOpened() and (self._thread is None or not self._thread.is_alive()):
+            self._actif = True
+            self._thread = threading.Thread(target=self._boucle_capture, daemon=True)
+            self._thread.start()
+
+    def _boucle_capture(self):
+        echecs = 0
+        while self._actif:
+            # Le buffer d'écriture est réutilisé par OpenCV s'il a déjà la bonne taille
+            ret, frame = self.cap.read(self._buffers[1])
+            if not ret:
+                echecs += 1
+                if echecs >= CAMERA_ECHECS_MAX:
+                    print("ERREUR caméra : lecture impossible, arrêt du thread de capture")
+                    self._actif = False
+                    with self._cond:
+                        self._cond.notify_all()
+                continue
+            echecs = 0
+            lue = time.monotonic() # après read() : l'image a pu attendre dans la file du pilote, voir get_frame
+            with self._cond:
+                self._buffers[0], self._buffers[1] = frame, self._buffers[0]
+                self._sequence += 1
+                self._horodatage = lue
+                self._lectures.append((self._sequence, lue))
+                self._cond.notify_all()
+
+    def get_frame(self, after=None, timeout_s=CAMERA_TIMEOUT_S): #prend la photo
+        """
+        Retourne une copie de la frame la plus récente, ou None si échec.
+        after : horodatage time.monotonic() ; en mode continu, attend la première frame exposée après
+        cet instant (par ex. l'arrivée de la tête au parking) : la séquence doit dépasser de plus de
+        CAMERA_TAMPON_FRAMES celle de la dernière frame lue avant after.
+        """
         if self.cap is None or not self.cap.isOpened():
             self.start()
-        if self.cap and self.cap.isOpened():
+        if not (self.cap and self.cap.isOpened()):
+            return None
+
+        if not self.continu:
             for _ in range(5):
                 self.cap.grab()
             ret, frame = self.cap.read()
-            if ret:
-                return frame
-        return None
+            return frame if ret else None
+
+        with self._cond:
+            seuil = self._sequence_minimale(after)
+            ok = self._cond.wait_for(lambda: self._sequence > seuil or not self._actif, timeout=timeout_s)
+            if not ok or self._sequence <= seuil:
+                print(f"ERREUR caméra : pas de nouvelle frame en {timeout_s} s")
+                return None
+            self.info_derniere_frame = (self._sequence, self._horodatage)
+            return self._buffers[0].copy()  # la détection dessine sur la frame
+
+    def _sequence_minimale(self, after):
+        # Séquence à dépasser (appelé sous self._cond) : dernière frame lue avant after + profondeur de la file du pilote
+        if after is None:
+            return 0
+        avant = [seq for seq, lue in self._lectures if lue <= after]
+        if avant:
+            return avant[-1] + CAMERA_TAMPON_FRAMES
+        # after est plus ancien que l'historique : on part de la plus ancienne frame connue
+        return (self._lectures[0][0] - 1 if self._lectures else 0) + CAMERA_TAMPON_FRAMES
 
     def stop(self):
+        self._actif = False
+        if self._thread is not None:
+            self._thread.join(timeout=CAMERA_TIMEOUT_S)
+            self._thread = None
         if self.cap and self.cap.isOpened():
             self.cap.release()
             print("Caméra arrêtée.")
 
 
+#PRÉCHAUFFAGE DU CLASSIFIEUR
+class Prechauffage:
+    """
+    Importe src.detection, charge DINOv2 + la tête PCA/KMeans et fait une inférence à vide
+    dans un thread lancé au démarrage, pendant que l'interface s'affiche et que l'imprimante fait son homing.
+    """
+
+    def __init__(self):
+        self.pret = threading.Event()
+        self.detection = None  # module src.detection une fois importé
+        self.detecteur = None  # IncrementalDetector pour les re-scans
+        self.erreur = None
+        self.temps = {}  # durées du rapport de démarrage (s)
+
+    def demarrer(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        try:
+            t0 = time.perf_counter()
+            self.detection = importlib.import_module("src.detection")
+            self.detecteur = self.detection.IncrementalDetector()
+            t1 = time.perf_counter()
+            self.temps["import"] = t1 - t0
+
+            classifier = self.detection._classifier
+            classifier.load()
+            t2 = time.perf_counter()
+            self.temps["chargement"] = t2 - t1
+
+            # Inférence à vide : les premières passes de torch allouent et choisissent leurs noyaux
+            classifier.extract_features([np.zeros((224, 224, 3), np.uint8)])
+            self.temps["inference_vide"] = time.perf_counter() - t2
+            self.temps["modele_pret"] = time.perf_counter() - T_LANCEMENT
+        except Exception as e:
+            self.erreur = e
+            print(f"ERREUR préchauffage : {e}")
+        finally:
+            self.rapport()
+            self.pret.set()
+
+    def attendre(self):
+        """Bloque jusqu'à la fin du préchauffage et retourne le module src.detection."""
+        if not self.pret.is_set():
+            t0 = time.perf_counter()
+            print("Attente de la fin du préchauffage du classifieur...")
+            self.pret.wait()
+            print(f"Préchauffage terminé après {time.perf_counter() - t0:.1f} s d'attente")
+        if self.erreur is not None:
+            raise RuntimeError("Le classifieur n'a pas pu être chargé") from self.erreur
+        return self.detection
+
+    def noter(self, cle, duree):
+        # Ne garde que la première occurrence (1re fenêtre, 1re détection)
+        if cle not in self.temps:
+            self.temps[cle] = duree
+            self.rapport()
+
+    def rapport(self):
+        libelles = [
+            ("fenetre", "Fenêtre affichée (depuis le lancement)"),
+            ("import", "Import de src.detection"),
+            ("chargement", "Chargement DINOv2 + tête"),
+            ("inference_vide", "Inférence à vide"),
+            ("modele_pret", "Modèle prêt (depuis le lancement)"),
+            ("premiere_detection", "1re détection réelle"),
+        ]
+        print("=== Rapport de démarrage ===")
+        for cle, libelle in libelles:
+            if cle in self.temps:
+                print(f"  {libelle:<40} : {self.temps[cle]:6.2f} s")
+
+
 camera = CameraManager()
+prechauffage = Prechauffage()
+
+
+def detecter(frame, incrementale=False):
+    """Attend le préchauffage puis détecte (détection complète ou incrémentale)."""
+    detection = prechauffage.attendre()
+    t0 = time.perf_counter()
+    if incrementale:
+        resultat = prechauffage.detecteur.detect(frame)
+    else:
+        resultat = detection.detecter_objets(frame)
+    prechauffage.noter("premiere_detection", time.perf_counter() - t0)
+    return resultat
 
 #faits touts le processus
 
@@ -133,7 +337,7 @@ def lancer_detection_seule():
 
 def lancer_detection(frame):
     """Détecte et affiche. Retourne (objets, crop_w, crop_h)."""
-    objets, img_result, img_debug, crop_w, crop_h = detecter_objets(frame) 
+    objets, img_result, img_debug, crop_w, crop_h = detecter(frame)
     cv2.imshow("Detection - Resultat", img_result)
     cv2.imshow("Detection - Debug", img_debug)
     print(f"{len(objets)} pièce(s) détectée(s) : {objets}")
@@ -141,57 +345,168 @@ def lancer_detection(frame):
     return objets, crop_w, crop_h
 
 
+def capturer_frame(gui):
+    """Déplace la tête hors champ et retourne la première frame exposée après son arrivée (None si échec)."""
+    # Tête hors champ
+    print("-> Déplacement tête hors champ...")
+    gui.controller.send_batch(["G90", f"G1 X0 Y{PLATE_H_MM} Z{Z_HAUTE} F{F_RAPIDE}"])
+    gui.controller.synchroniser() # seul point où l'on attend la fin des mouvements : avant la photo
+    t_parking = time.monotonic()
+    if not camera.continu:
+        time.sleep(0.5)
+
+    # Capture : première frame exposée après l'arrivée de la tête au parking (file du pilote comprise)
+    frame = camera.get_frame(after=t_parking)
+    if frame is None:
+        print("ERREUR : Image vide")
+    return frame
+
+
 def capturer_et_detecter(gui):
     """
     Déplace la tête hors champ, capture une photo, détecte les pièces.
     Retourne (objets, crop_w, crop_h, img_result) ou None si échec.
     """
-    # Tête hors champ
-    print("-> Déplacement tête hors champ...")
-    gui.controller.send_command("G90")
-    gui.controller.send_command(f"G1 X0 Y{PLATE_H_MM} Z{Z_HAUTE} F{F_RAPIDE}")
-    gui.controller._drain_input()
-    gui.controller.send_command("M400", timeout_s=60)
-    time.sleep(0.5)
-
-    # Capture
-    frame = camera.get_frame()
+    t0 = time.perf_counter()
+    frame = capturer_frame(gui)
     if frame is None:
-        print("ERREUR : Image vide")
         return None
+    return detecter_frame(frame, t0)
 
-    # Détection
-    objets, img_result, img_debug, crop_w, crop_h = detecter_objets(frame)
+
+def detecter_frame(frame, t0=None):
+    """
+    Détection complète sur une frame déjà prise tête au parking.
+    t0 : début du re-scan (parking et photo compris) ; sans t0, la latence de la seule détection est notée à part.
+    Retourne (objets, crop_w, crop_h, img_result).
+    """
+    cle = "re-scan complet" if t0 is not None else "re-scan sur photo ROI"
+    t0 = time.perf_counter() if t0 is None else t0
+    objets, img_result, img_debug, crop_w, crop_h = detecter(frame, incrementale=DETECTION_INCREMENTALE)
     cv2.imshow("Detection - Resultat", img_result)
     cv2.imshow("Detection - Debug", img_debug)
     cv2.waitKey(1)
 
     print(f"{len(objets)} pièce(s) détectée(s)")
+    LATENCES_VERIFICATION[cle].append(time.perf_counter() - t0)
     return objets, crop_w, crop_h, img_result
 
 
+def mm_vers_pixels(mm_x, mm_y, crop_w, crop_h):
+    """Inverse de pixels_vers_mm."""
+    px, py = CALIBRATION.mm_vers_pixels(mm_x, mm_y, crop_w, crop_h)
+    return float(px), float(py)
+
+
+def zone_pixels(x1, y1, x2, y2, crop_w, crop_h):
+    """Rectangle (px, bornes dans n'importe quel ordre) arrondi et limité à l'image rognée."""
+    x1, x2 = sorted((x1, x2))
+    y1, y2 = sorted((y1, y2))
+    return (max(0, int(x1)), max(0, int(y1)), min(crop_w, int(np.ceil(x2))), min(crop_h, int(np.ceil(y2))))
+
+
+def verifier_poussees(gui, poussees, plateau_estime):
+    """
+    Vérification rapide des dernières poussées, sans classification (localisation dans quelques zones seulement) :
+      1. la place de départ de chaque pièce poussée doit être vide
+      2. le couloir de la brosse ne doit contenir aucune pièce, hors pièces restantes (positions prédites)
+      3. chaque pièce déplacée par une poussée doit être retrouvée près de sa position prédite (3 incertitudes) :
+         sa position est recalée sur la pièce trouvée la plus proche
+    Retourne (ok, raison, frame) : en cas d'échec, la frame sert au re-scan complet sans nouvelle photo.
+    """
+    t0 = time.perf_counter()
+    frame = capturer_frame(gui)
+    if frame is None:
+        return False, "image vide", None
+    detection = prechauffage.attendre()
+    cropped = detection.rogner(frame)
+    crop_h, crop_w = cropped.shape[:2]
+    sx, sy = crop_w / PLATE_W_MM, crop_h / PLATE_H_MM # px par mm
+
+    def zone_autour(x, y, rayon_mm):
+        px, py = mm_vers_pixels(x, y, crop_w, crop_h)
+        return zone_pixels(px - rayon_mm * sx, py - rayon_mm * sy, px + rayon_mm * sx, py + rayon_mm * sy, crop_w, crop_h)
+
+    def finir(ok, raison):
+        LATENCES_VERIFICATION["vérification ROI"].append(time.perf_counter() - t0)
+        return ok, raison, frame
+
+    #1 Places de départ
+    for element in poussees:
+        for p in pieces_de(element):
+            if detection.pieces_dans_zone(cropped, zone_autour(p.x, p.y, RAYON_PIECE_MM)):
+                return finir(False, f"P{p.id} encore à sa place")
+
+    #2 Couloirs, hors pièces restantes
+    for element in poussees:
+        for a, b in couloir(element, PLATEAU, POUSSEE):
+            (ax, ay), (bx, by) = mm_vers_pixels(*a, crop_w, crop_h), mm_vers_pixels(*b, crop_w, crop_h)
+            demi = POUSSEE.marge
+            x1, y1, x2, y2 = zone_pixels(ax - demi * sx, ay - demi * sy, bx + demi * sx, by + demi * sy, crop_w, crop_h)
+            masque = np.zeros((y2 - y1, x2 - x1), np.uint8)
+            cv2.line(masque, (int(ax) - x1, int(ay) - y1), (int(bx) - x1, int(by) - y1), 255,
+                     thickness=max(1, int(2 * demi * min(sx, sy))))
+            for e in plateau_estime.pieces.values():
+                px, py = mm_vers_pixels(e.piece.x, e.piece.y, crop_w, crop_h)
+                rayon = (RAYON_PIECE_MM + 3 * e.incertitude) * max(sx, sy)
+                cv2.circle(masque, (int(px) - x1, int(py) - y1), int(rayon), 0, -1)
+            if detection.pieces_dans_zone(cropped, (x1, y1, x2, y2), masque):
+                return finir(False, f"pièce inattendue dans le couloir de {element}")
+
+    #3 Pièces déplacées : retrouvées et recalées
+    for e in plateau_estime.deplacees():
+        trouvees = detection.pieces_dans_zone(cropped, zone_autour(e.piece.x, e.piece.y, RAYON_PIECE_MM + 3 * e.incertitude))
+        if not trouvees:
+            return finir(False, f"P{e.piece.id} introuvable près de sa position prédite")
+        px, py = mm_vers_pixels(e.piece.x, e.piece.y, crop_w, crop_h)
+        cx, cy = min(trouvees, key=lambda c: (c[0] - px) ** 2 + (c[1] - py) ** 2)
+        x, y = pixels_vers_mm(cx, cy, crop_w, crop_h)
+        e.piece = Piece(id=e.piece.id, x=x, y=y, classe=e.piece.classe)
+        e.incertitude = INCERTITUDE_BASE_MM
+
+    return finir(True, f"{sum(len(pieces_de(e)) for e in poussees)} place(s) vide(s), couloirs libres, "
+                       f"{len(plateau_estime.deplacees())} pièce(s) déplacée(s) recalée(s)")
+
+
+def rapport_verifications():
+    """Latence médiane d'une vérification ROI, d'un re-scan complet (parking et photo compris) et d'un re-scan sur la photo ROI."""
+    for nom, durees in LATENCES_VERIFICATION.items():
+        if durees:
+            print(f"  {nom:>16} : {len(durees)} fois, médiane {sorted(durees)[len(durees) // 2] * 1000:.0f} ms")
+
+
 def convertir_en_pieces(objets_detectes, crop_w, crop_h):
     """
     Convertit les dicts de détection en Pieces (mm).
     Utilise le mapping dynamique LABEL_TO_BAC pour la classe (= numéro de bac).
     """
     pieces = [] #liste de toutes les pièces
-    for i, obj in enumerate(objets_detectes, 1):
+    # Tous les centres convertis en un seul appel
+    xs, ys = CALIBRATION.pixels_vers_mm([obj['x'] for obj in objets_detectes], [obj['y'] for obj in objets_detectes],
+                                        crop_w, crop_h)
+    for i, (obj, mm_x, mm_y) in enumerate(zip(objets_detectes, xs, ys), 1):
         bac_num = LABEL_TO_BAC.get(obj['classe']) #asigne les pièces a un bac
         if bac_num is None:
             print(f"  Pièce {i}: label '{obj['classe']}' sans bac assigné, ignorée.")
             continue
 
-        mm_x, mm_y = pixels_vers_mm(obj['x'], obj['y'], crop_w, crop_h) #converti position des pièces
+        mm_x, mm_y = round(float(mm_x), 2), round(float(mm_y), 2) #converti position des pièces
         print(f"  Pièce {i}: pixel({obj['x']}, {obj['y']}) "
               f"→ mm({mm_x}, {mm_y}) [{obj['classe']}→bac {bac_num}]")
         pieces.append(Piece(id=i, x=mm_x, y=mm_y, classe=bac_num)) #crée objet pièces
     return pieces
 
 
-def calculer_ordre(pieces):
-    """Calcule et affiche l'ordre de priorité."""
-    ordre = calculer_priorite(pieces, PLATEAU)
+def calculer_ordre(pieces, modele=None):
+    """
+    Calcule et affiche l'ordre de priorité (stratégie STRATEGIE_ORDRE).
+    Avec un modèle cinématique, le dernier critère est la durée estimée du tri de la pièce (depuis le parking)
+    plutôt que la distance à son bac.
+    """
+    cout = None
+    if modele is not None:
+        cout = lambda p: modele.duree(commandes_piece(p), depart=PARKING)
+    ordre = STRATEGIES_ORDRE[STRATEGIE_ORDRE](pieces, PLATEAU, cout=cout)
 
     print("\n" + "=" * 50)
     print("  ORDRE DE PRIORITÉ")
@@ -200,64 +515,123 @@ def calculer_ordre(pieces):
         p = entry["piece"]
         trajet = decrire_trajet(p, PLATEAU) #reçoit le trajet a faire à la pièce
         print(f"  {rang}. {p} | dist_bord={entry['dist_bord']:.1f}mm "
-              f"| collisions={entry['collisions']} | {trajet}")
+              f"| collisions={entry['collisions']} | coût={entry['cout']:.2f} | {trajet}")
 
     return ordre
 
 
-def deplacer_une_piece(gui, p):
-    """Déplace une pièce vers son bac."""
-    piece_mm_x = p.x
-    piece_mm_y = p.y
-    bac_y = BACS_Y_MM[p.classe]
-
-    print(f"  Position pièce : ({piece_mm_x:.1f}, {piece_mm_y:.1f}) mm")
-    print(f"  Bac cible : {p.classe} → (X={BORD_X_MM}, Y={bac_y})")
+def commandes_piece(p):
+    """G-code du déplacement d'une pièce vers son bac (séquence fixe, voir l'en-tête)."""
+    return sequence_piece(p, PLATEAU, POUSSEE)
 
-    # ÉTAPE 1:Approche avec offset X
-    approche_x = max(piece_mm_x - OFFSET_X_MM, 0)
-    gui.controller.send_command(f"G1 X{approche_x} Y{piece_mm_y} F{F_RAPIDE}")
-    gui.controller.send_command("M400", timeout_s=15)
 
-    # ÉTAPE 2:Descente
-    gui.controller.send_command(f"G1 Z{Z_BASSE} F{F_Z}")
-    gui.controller.send_command("M400", timeout_s=15)
+def decouper_en_lots(elements, deja_triees):
+    """
+    Éléments (pièces ou balayages) triés entre deux re-scans (toutes les RESCAN_EVERY_N pièces depuis le début
+    du cycle ; un balayage n'est pas coupé, le re-scan a lieu juste après).
+    """
+    if RESCAN_EVERY_N <= 0:
+        return [list(elements)]
+    lots, lot, n = [], [], deja_triees
+    for i, element in enumerate(elements, 1):
+        lot.append(element)
+        avant, n = n, n + len(pieces_de(element))
+        if n // RESCAN_EVERY_N > avant // RESCAN_EVERY_N or i == len(elements):
+            lots.append(lot)
+            lot = []
+    return lots
+
+
+def decouper_par_couloirs(elements, deja_triees, depuis_photo=0):
+    """
+    Politique "couloir" : les poussées s'enchaînent tant que le couloir balayé par la brosse (pieces_touchees)
+    ne passe sur aucune pièce restante ; photo de sécurité après RESCAN_MAX_N pièces.
+    Retourne (lots, raison de chaque re-scan, re-scans évités par rapport à la politique "fixe" dans chaque lot :
+    éléments après lesquels la politique "fixe" aurait repris une photo). Les re-scans évités d'un lot ne sont
+    comptés qu'une fois le lot envoyé : le plan est refait après le premier lot.
+    """
+    lots, lot, raisons, evites, evites_lot = [], [], [], [], []
+    for i, element in enumerate(elements):
+        lot.append(element)
+        n = len(pieces_de(element))
+        fixe = RESCAN_EVERY_N > 0 and (deja_triees + n) // RESCAN_EVERY_N > deja_triees // RESCAN_EVERY_N
+        deja_triees, depuis_photo = deja_triees + n, depuis_photo + n
+        restantes = [p for suivant in elements[i + 1:] for p in pieces_de(suivant)]
+        if not restantes:
+            break
 
-    # ÉTAPE 3: Poussée X vers le bord
-    gui.controller.send_command(f"G1 X{BORD_X_MM - 15} F{F_POUSSEE}") # 1cm du bord pour ne pas tomber dans le bon bac
-    gui.controller.send_command("M400", timeout_s=15)
+        touchees = pieces_touchees(element, restantes, PLATEAU, POUSSEE)
+        if touchees:
+            raisons.append(f"couloir de {element} sur {', '.join(f'P{p.id}' for p in touchees)}")
+        elif depuis_photo >= RESCAN_MAX_N:
+            raisons.append(f"sécurité, {depuis_photo} pièces sans photo")
+        else:
+            if fixe:
+                evites_lot.append(element)
+            continue
+        lots.append(lot)
+        evites.append(evites_lot)
+        lot, evites_lot, depuis_photo = [], [], 0
+    if lot:
+        lots.append(lot)
+        evites.append(evites_lot)
+    return lots, raisons, evites
+
+
+def enregistrer_paire(avant, poussees, apres):
+    """Ajoute une paire de détections (et les poussées entre les deux) à PAIRES_DETECTION, pour évaluer TrayState."""
+    if not PAIRES_DETECTION or not poussees:
+        return
+    os.makedirs(os.path.dirname(PAIRES_DETECTION), exist_ok=True)
+    with open(PAIRES_DETECTION, "a") as f:
+        f.write(json.dumps(paire_json(avant, poussees, apres)) + "\n")
 
-    # ÉTAPE 4: Alignement Y
-    if abs(piece_mm_y - bac_y) > 1.0: #la pièce est devant le bon bac, au centre (marge de 1mm)
-        gui.controller.send_command(f"G1 Y{bac_y} F{F_POUSSEE}")
-        gui.controller.send_command("M400", timeout_s=15)
 
-    # ÉTAPE 5:Balayage dans le bac
-    gui.controller.send_command(f"G1 X{BORD_X_MM} F{F_POUSSEE}") #On pousse la pièce dans le bac
-    gui.controller.send_command("M400", timeout_s=15)
+def deplacer_une_piece(gui, p):
+    """
+    Déplace une pièce vers son bac.
+    Les mouvements sont envoyés en un lot streamé (pas de M400 entre eux) : le planificateur les enchaîne
+    sans arrêt complet, la synchronisation se fait avant la prochaine photo.
+    """
+    print(f"  Position pièce : ({p.x:.1f}, {p.y:.1f}) mm")
+    print(f"  Bac cible : {p.classe} → (X={BORD_X_MM}, Y={BACS_Y_MM[p.classe]})")
+    return gui.controller.send_batch(commandes_piece(p)) # lignes numérotées avec checksum, renvoyées si corrompues
 
-    gui.controller.send_command(f"G1 X{BORD_X_MM-20} Z{Z_HAUTE} F{F_Z}") #On recule en montant pour faire le rebalayage
-    gui.controller.send_command("M400", timeout_s=15)
 
-    gui.controller.send_command(f"G1 Z{Z_BASSE} F{F_Z}") #Redescente
-    gui.controller.send_command("M400", timeout_s=15)
+def deplacer_lot(gui, lot, restantes):
+    """
+    Trie les pièces (ou balayages) d'un lot, dans l'ordre, jusqu'au prochain re-scan.
+    Avec COMPILER_POUSSEES, un seul programme compilé (remontées fusionnées, rebalayages inutiles supprimés) ;
+    restantes = pièces triées après ce lot, que la brosse basse doit éviter.
+    """
+    if not COMPILER_POUSSEES:
+        return all(deplacer_une_piece(gui, p) for p in lot) # s'arrête à la première pièce en échec
 
-    gui.controller.send_command(f"G1 X{BORD_X_MM} F{F_POUSSEE}") #repoussage
-    gui.controller.send_command("M400", timeout_s=15)
-    # ÉTAPE 6:Remontée
-    gui.controller.send_command(f"G1 Z{Z_HAUTE} F{F_Z}")
-    gui.controller.send_command("M400", timeout_s=15)
+    programme = compiler(lot, PLATEAU, POUSSEE, depart=dict(gui.controller.etat.position),
+                         obstacles=restantes, modele=gui.controller.modele)
+    for p in lot:
+        print(f"  {p} → bac {p.classe} (Y={BACS_Y_MM[p.classe]})")
+    print(f"  Programme : {len(programme.commandes)} lignes, {programme.duree_estimee:.1f} s estimées "
+          f"({programme.gain:.1f} s de moins que pièce par pièce)")
+    return gui.controller.send_batch(programme.commandes)
 
 
 def pipeline_complet(gui):
     """Pipeline : Homing → Capture → Détection → Assignation bacs → Tri avec re-scan."""
     global LABEL_TO_BAC
 
-    # 1.Homing
-    gui.controller.send_command("G28", timeout_s=60)
+    # 1.Homing (le préchauffage du classifieur continue en arrière-plan pendant ce temps)
+    gui.controller.etat.reinitialiser_compteurs()
+    gui.controller.home_all()
     gui.controller.send_command("G90")
 
-    # 2.Première capture + détection
+    # 2.Première capture + détection (complète)
+    try:
+        prechauffage.attendre()
+    except RuntimeError as e:
+        messagebox.showerror("Erreur", str(e))
+        return
+    prechauffage.detecteur.reset()
     result = capturer_et_detecter(gui)
     if result is None:
         messagebox.showerror("Erreur", "Image vide (problème caméra)")
@@ -289,34 +663,101 @@ def pipeline_complet(gui):
 
     # 4.Boucle de tri avec re-scan
     pieces_triees_total = 0
+    rescans = rescans_evites = 0
+    plateau_estime = TrayState(PLATEAU, POUSSEE) # positions prédites entre deux photos
+    pieces = None # None : repartir de la dernière détection
+    derniere_detection, poussees_photo, poussees_verif = None, [], [] # poussées depuis la dernière détection / photo
+    abandon = False
 
     while True:  #while pièce
         # Conversion + priorité
-        print("\n--- Conversion pixels → mm ---")
-        pieces = convertir_en_pieces(objets, crop_w, crop_h)
+        if pieces is None:
+            print("\n--- Conversion pixels → mm ---")
+            pieces = convertir_en_pieces(objets, crop_w, crop_h)
+            if derniere_detection is not None:
+                enregistrer_paire(derniere_detection, poussees_photo, pieces)
+            derniere_detection, poussees_photo, poussees_verif = pieces, [], []
+            plateau_estime.recaler(pieces)
         if not pieces:
             print("Plus de pièces à trier.")
             break
 
-        ordre = calculer_ordre(pieces)
+        ordre = calculer_ordre(pieces, gui.controller.modele)
         if not ordre:
             break
 
-        print(f"\n--- Tri de {len(ordre)} pièce(s) ---")
-
-        for i, entry in enumerate(ordre, 1):
-            p = entry["piece"]
-            print(f"\n--- Pièce {i}/{len(ordre)} ---")
+        elements = [e["piece"] for e in ordre]
+        if BALAYAGES_GROUPES:
+            elements = grouper_balayages(elements, PLATEAU)
+            print(f"\n--- Tri de {len(ordre)} pièce(s) en {len(elements)} trait(s) "
+                  f"({len(ordre) / len(elements):.2f} pièce(s) par trait) ---")
+        else:
+            print(f"\n--- Tri de {len(ordre)} pièce(s) ---")
 
-            deplacer_une_piece(gui, p)
-            pieces_triees_total += 1
+        if RESCAN_POLITIQUE == "couloir":
+            lots, raisons, evites = decouper_par_couloirs(elements, pieces_triees_total,
+                                                          sum(len(pieces_de(e)) for e in poussees_verif))
+        else:
+            lots = decouper_en_lots(elements, pieces_triees_total)
+            raisons = [f"toutes les {RESCAN_EVERY_N} pièces"] * (len(lots) - 1)
+            evites = [[] for _ in lots]
+        faites = 0
+        for k, lot in enumerate(lots):
+            restantes = [e for suivant in lots[k + 1:] for e in suivant]
+            n_lot = sum(len(pieces_de(e)) for e in lot)
+            print(f"\n--- Pièce(s) {faites + 1}-{faites + n_lot}/{len(ordre)} ---")
+
+            if not deplacer_lot(gui, lot, restantes):
+                # Lot refusé ou interrompu : on ne sait pas quelles poussées ont eu lieu, ni modèle ni paire avant / après
+                print(f"\n*** ÉCHEC D'ENVOI du lot : RE-SCAN complet ***")
+                rescans += 1
+                derniere_detection, poussees_photo, poussees_verif = None, [], []
+                result = capturer_et_detecter(gui)
+                if result is None:
+                    print("ERREUR : re-scan impossible après l'échec d'envoi, arrêt du tri")
+                    abandon = True
+                    break
+                objets, crop_w, crop_h, img_result = result
+                pieces = None
+                break
+            faites += n_lot
+            pieces_triees_total += n_lot
+            for element in evites[k]: # lot envoyé : ses re-scans évités ont vraiment eu lieu sans photo
+                print(f"  Re-scan évité après {element} : couloir libre, aucune pièce restante déplacée")
+            rescans_evites += len(evites[k])
+            for element in lot:
+                plateau_estime.appliquer(element)
+            poussees_photo += lot
+            poussees_verif += lot
 
             # Re-scan périodique
-            if RESCAN_EVERY_N > 0 and i < len(ordre) and (pieces_triees_total % RESCAN_EVERY_N == 0):
-                print(f"\n*** RE-SCAN après {pieces_triees_total} pièces ***")
-                result = capturer_et_detecter(gui)
+            if restantes:
+                depuis_photo = sum(len(pieces_de(e)) for e in poussees_verif)
+                if (RESCAN_POLITIQUE == "couloir" and PREDICTION_PLATEAU and depuis_photo < RESCAN_MAX_N
+                        and plateau_estime.pieces and plateau_estime.incertitude_max() <= SEUIL_INCERTITUDE_MM):
+                    print(f"\n*** RE-PLANIFICATION sans photo ({raisons[k]}) : "
+                          f"{len(plateau_estime.deplacees())} pièce(s) déplacée(s), {len(plateau_estime.tombees)} tombée(s), "
+                          f"incertitude max {plateau_estime.incertitude_max():.1f} mm ***")
+                    rescans_evites += 1
+                    pieces = plateau_estime.pieces_restantes()
+                    break
+                frame = None
+                if VERIFICATION_ROI:
+                    ok, detail, frame = verifier_poussees(gui, poussees_verif, plateau_estime)
+                    print(f"\n*** VÉRIFICATION après {pieces_triees_total} pièces ({raisons[k]}) : "
+                          f"{'OK' if ok else 'ÉCHEC'}, {detail} ***")
+                    poussees_verif = []
+                    if ok:
+                        rescans_evites += 1
+                        pieces = plateau_estime.pieces_restantes()
+                        break
+                print(f"\n*** RE-SCAN après {pieces_triees_total} pièces ({raisons[k]}) ***")
+                rescans += 1
+                # La photo de la vérification est prise tête au parking : détection complète dessus, sans repartir au parking
+                result = detecter_frame(frame) if frame is not None else capturer_et_detecter(gui)
                 if result is not None:
                     new_objets, crop_w, crop_h, img_result = result
+                    pieces = None
                     if new_objets:
                         objets = new_objets
                         # On casse la boucle interne pour recalculer les priorités
@@ -332,27 +773,39 @@ def pipeline_complet(gui):
             result = capturer_et_detecter(gui)
             if result is not None:
                 objets, crop_w, crop_h, img_result = result
+                pieces = None
                 if not objets:
                     print("Plateau vide. Tri terminé !")
+                    enregistrer_paire(derniere_detection, poussees_photo, [])
                     break
                 else:
                     print(f"Encore {len(objets)} pièce(s) détectée(s), on continue.")
                     continue
             break
+        if abandon:
+            break
 
     # Retour position parking
     print(f"\n=== TRI TERMINÉ ({pieces_triees_total} pièces) ===")
-    gui.controller.send_command(f"G1 X0 Y0 F{F_RAPIDE}")
-    gui.controller.send_command("M400", timeout_s=30)
-
-    gui.controller.send_command(f"G1 Z75 F{F_Z}")
-    gui.controller.send_command("M400", timeout_s=15)
+    print(f"Re-scans : {rescans} effectué(s), {rescans_evites} évité(s) (couloirs libres, positions prédites "
+          f"ou vérification ROI, politique {RESCAN_POLITIQUE})")
+    rapport_verifications()
+    gui.controller.send_batch([f"G1 X0 Y0 F{F_RAPIDE}", f"G1 Z75 F{F_Z}"])
+    gui.controller.synchroniser()
+    gui.controller.rapport_latences() # histogramme des allers-retours série par commande
+    gui.controller.etat.rapport() # commandes et octets évités par le filtre modal sur ce cycle
+    if REFERENCE_MOUVEMENTS:
+        os.makedirs(os.path.dirname(REFERENCE_MOUVEMENTS), exist_ok=True)
+        gui.controller.sauver_reference(REFERENCE_MOUVEMENTS)
 
     messagebox.showinfo("Terminé", f"Cycle fini ! {pieces_triees_total} pièce(s) triée(s).")
 
 
 def main():
+    prechauffage.demarrer() # import + chargement du modèle pendant que la fenêtre s'ouvre
+
     root = tk.Tk() #ensuite c'est la partie graphique
+    root.after(0, lambda: prechauffage.noter("fenetre", time.perf_counter() - T_LANCEMENT))
 
     def on_close():
         camera.stop()
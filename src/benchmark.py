@@ -0,0 +1,642 @@
+"""
+Benchmarks de performance du pipeline de tri.
+
+À lancer depuis la racine du projet (les modèles sont cherchés dans models/) :
+    python -m src.benchmark batch      # classification crop par crop vs par lots
+    python -m src.benchmark cache      # re-scan d'un plateau presque inchangé avec le cache
+    python -m src.benchmark incremental  # détection incrémentale vs complète sur des paires synthétiques
+    python -m src.benchmark backend    # prétraitement skimage vs opencv : parité et durée par crop
+    python -m src.benchmark startup    # chargement DINOv2 : torch.hub vs artefact exporté
+    python -m src.benchmark pyramide   # localisation sur image réduite : durée et précision des centres
+    python -m src.benchmark plateau    # extraction "plateau" (une passe DINOv2) vs crop par crop
+    python -m src.benchmark balayages  # pièces d'un même bac poussées ensemble : pièces par trait, durée par pièce
+    python -m src.benchmark ordre      # stratégies d'ordre de tri : déplacements à vide et temps de planification
+    python -m src.benchmark priorite   # calculer_priorite (matrice + tas) vs version d'origine : même ordre, passage à l'échelle
+    python -m src.benchmark collisions # matrice de collisions vectorisée vs piece_sur_trajet paire par paire
+    python -m src.benchmark verification  # vérification des zones poussées (sans classification) vs détection complète
+"""
+
+import os
+import sys
+import time
+import random
+import itertools
+import cv2
+import numpy as np
+
+from .detection import (Classifier, IncrementalDetector, detecter_objets, localiser, rogner, pieces_dans_zone,
+                        a_l_echelle_plateau, CUT_LEFT_PCT, CUT_TOP_PCT)
+from .calibration import taille_piece_px
+from .export_model import mesurer_demarrage
+from .piece_priority import (Piece, Balayage, STRATEGIES_ORDRE, calculer_priorite, calculer_priorite_reference,
+                             grouper_balayages, pieces_de, piece_sur_trajet, longueur_trajet, tableau_pieces,
+                             matrice_collisions)
+from .push_compiler import compiler, plateau_defaut
+
+
+DATASET_PATH = "dataset_edge"
+N_PIECES = (1, 10, 50)
+N_REPETITIONS = 3
+N_PIECES_CACHE = 30
+N_PIECES_BOUGEES = 3
+N_PAIRES_SYNTHETIQUES = 5
+N_FORMES_SYNTHETIQUES = 25
+N_FRAMES_DERIVE = 16 # séquence de re-scans avec bruit capteur et dérive d'éclairage
+BRUIT_CAPTEUR = 3.0 # écart-type (niveaux de gris) du bruit ajouté à chaque frame
+PAS_ECLAIRAGE = 1.5 # niveaux de gris ajoutés à tout le plateau à chaque frame (sous SEUIL_CHANGEMENT)
+ACCORD_DERIVE_MIN = 0.95 # F-score min des contours incrémentaux face à la détection complète entre deux resynchronisations
+PARITE_CONTOURS_MIN = 0.95 # accord minimal des cartes de contours (tolérance 1 px) entre backends
+PARITE_CLUSTERS_MIN = 0.90 # accord minimal des clusters entre backends
+FACTEURS_PYRAMIDE = (2, 3, 4)
+N_PIECES_PLATEAU = (5, 20, 60)
+TAILLE_PLATEAU = 1500 # côté du plateau synthétique (px, ordre de grandeur de l'image rognée)
+PAS_GRILLE_PLATEAU = 150 # une pièce par case, réduite pour tenir dans la case avec une marge
+N_PIECES_BALAYAGES = (10, 30, 60)
+N_PLATEAUX_BALAYAGES = 5 # plateaux synthétiques par taille
+ECART_MIN_PIECES_MM = 12 # deux pièces ne se chevauchent pas
+N_PIECES_ORDRE = (10, 30, 60, 100)
+N_PLATEAUX_ORDRE = 5
+N_PIECES_PRIORITE = (10, 100, 300, 1000)
+N_PIECES_REFERENCE_MAX = 300 # au-delà, la version d'origine (O(n³)) est trop lente pour être mesurée
+N_PIECES_COLLISIONS = (10, 100, 300, 1000)
+N_PLATEAUX_COLLISIONS = 20 # plateaux aléatoires comparés paire par paire
+N_PIECES_POUSSEES = 4 # par frame : poussées hors du plateau, puis vérifiées
+DEMI_ZONE_VERIFICATION = 50 # px, demi-côté d'une zone vérifiée (pièces synthétiques : demi-axe <= 45, écart >= 110)
+
+
+def lister_images(dossier=DATASET_PATH):
+    return sorted(os.path.join(dossier, f) for f in os.listdir(dossier)
+                  if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+
+
+def charger_crops(n, dossier=DATASET_PATH):
+    """Charge n images BGR du dataset (réutilisées en boucle si le dossier en contient moins)."""
+    fichiers = lister_images(dossier)
+    if not fichiers:
+        raise FileNotFoundError(f"Aucune image dans '{dossier}/'")
+    return [cv2.imread(fichiers[i % len(fichiers)]) for i in range(n)]
+
+
+def chronometrer(fn, repetitions=N_REPETITIONS):
+    """Retourne la meilleure durée (s) de fn() sur plusieurs répétitions."""
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        fn()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur
+
+
+def bench_batch(classifier=None):
+    """Compare classify_crop appelé pour chaque pièce et classify_crops en un seul appel."""
+    classifier = classifier or Classifier()
+    classifier.load()
+    # Sans cache d'embeddings, pour mesurer l'inférence
+    classifier.clear_cache()
+    cache_max, classifier.cache_max = classifier.cache_max, 0
+
+    print(f"{'pièces':>8} | {'par crop (s)':>13} | {'par lot (s)':>12} | {'gain':>6}")
+    for n in N_PIECES:
+        crops = charger_crops(n)
+        classifier.classify_crops(crops[:1])  # préchauffage
+
+        t_crop = chronometrer(lambda: [classifier.classify_crop(c) for c in crops])
+        t_lot = chronometrer(lambda: classifier.classify_crops(crops))
+        print(f"{n:>8} | {t_crop:>13.3f} | {t_lot:>12.3f} | {t_crop / t_lot:>5.1f}x")
+    classifier.cache_max = cache_max
+
+
+def bench_cache(classifier=None):
+    """Premier scan de N_PIECES_CACHE pièces puis re-scan où seules N_PIECES_BOUGEES ont changé."""
+    classifier = classifier or Classifier()
+    classifier.load()
+    classifier.clear_cache()
+
+    crops = charger_crops(N_PIECES_CACHE)
+    # Les pièces déplacées sont simulées par un retournement de l'image
+    rescan = [cv2.flip(c, 1) for c in crops[:N_PIECES_BOUGEES]] + crops[N_PIECES_BOUGEES:]
+
+    t0 = time.perf_counter()
+    classifier.classify_crops(crops)
+    t_scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    classifier.classify_crops(rescan)
+    t_rescan = time.perf_counter() - t0
+
+    print(f"Premier scan ({N_PIECES_CACHE} pièces) : {t_scan:.3f} s")
+    print(f"Re-scan ({N_PIECES_BOUGEES} pièce(s) déplacée(s)) : {t_rescan:.3f} s")
+    print(f"Cache : {classifier.cache_stats()}")
+
+
+def formes_aleatoires(rng, n, largeur=2028, hauteur=1520, ecart_min=110):
+    """
+    n pièces synthétiques (ellipses) qui ne se touchent pas :
+    [cx, cy, demi-axe a, demi-axe b, angle, niveau de gris].
+    """
+    formes = []
+    while len(formes) < n:
+        cx = int(rng.integers(int(largeur * 0.25), int(largeur * 0.75)))
+        cy = int(rng.integers(200, hauteur - 200))
+        if any(np.hypot(cx - f[0], cy - f[1]) < ecart_min for f in formes):
+            continue
+        formes.append([
+            cx, cy,
+            int(rng.integers(15, 45)), int(rng.integers(8, 20)),
+            int(rng.integers(0, 180)), int(rng.integers(150, 255)),
+        ])
+    return formes
+
+
+def frame_synthetique(formes, largeur=2028, hauteur=1520):
+    """Plateau sombre uniforme avec des pièces claires, sans bruit capteur."""
+    frame = np.full((hauteur, largeur, 3), 40, np.uint8)
+    for cx, cy, a, b, angle, niveau in formes:
+        cv2.ellipse(frame, (cx, cy), (a, b), angle, 0, 360, (niveau, niveau, niveau), -1)
+    return frame
+
+
+def paire_synthetique(rng):
+    """Frame avant / après une poussée : quelques pièces glissent le long d'un même couloir en X."""
+    formes = formes_aleatoires(rng, N_FORMES_SYNTHETIQUES)
+    avant = frame_synthetique(formes)
+    poussees = rng.choice(len(formes), N_PIECES_BOUGEES, replace=False)
+    for i in poussees:
+        formes[i][0] += int(rng.integers(20, 120))
+    return avant, frame_synthetique(formes)
+
+
+def sequence_bruitee(rng):
+    """
+    N_FRAMES_DERIVE frames successives : une pièce poussée par frame, bruit capteur propre à chaque frame et
+    éclairage qui monte de PAS_ECLAIRAGE par frame (écarts sous SEUIL_CHANGEMENT, jamais vus par masque_changement).
+    """
+    formes = formes_aleatoires(rng, N_FORMES_SYNTHETIQUES)
+    for k in range(N_FRAMES_DERIVE):
+        if k:
+            formes[int(rng.integers(len(formes)))][0] += int(rng.integers(20, 120))
+        frame = frame_synthetique(formes).astype(np.float32) + k * PAS_ECLAIRAGE
+        frame += rng.normal(0, BRUIT_CAPTEUR, frame.shape).astype(np.float32)
+        yield np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def verifier_derive(rng):
+    """
+    Détection incrémentale sur sequence_bruitee face à detecter_objets : mêmes pièces (centres appariés) et
+    contours proches entre deux resynchronisations, résultat identique quand le détecteur se resynchronise,
+    et au moins une resynchronisation sur la séquence.
+    """
+    detecteur = IncrementalDetector()
+    resyncs, accords = 0, []
+    for k, frame in enumerate(sequence_bruitee(rng)):
+        objets_incr, _, carte_incr, _, _ = detecteur.detect(frame.copy())
+        objets_ref, _, carte_ref, _, _ = detecter_objets(frame.copy())
+        if detecteur.stats["tuiles"] < 0:
+            resyncs += k > 0
+            assert np.array_equal(carte_incr, carte_ref) and objets_incr == objets_ref, \
+                f"frame {k} : détection complète différente de detecter_objets"
+            continue
+        _, manquees, en_trop = apparier_centres([(o["x"], o["y"]) for o in objets_ref],
+                                                [(o["x"], o["y"]) for o in objets_incr])
+        assert manquees == en_trop == 0, f"frame {k} : {manquees} pièce(s) manquée(s), {en_trop} en trop"
+        accords.append(accord_contours(carte_incr, carte_ref))
+        assert accords[-1] >= ACCORD_DERIVE_MIN, f"frame {k} : contours trop éloignés ({accords[-1]:.3f})"
+    assert resyncs > 0, "dérive d'éclairage sans resynchronisation"
+    print(f"Séquence bruitée ({N_FRAMES_DERIVE} frames, bruit {BRUIT_CAPTEUR}, éclairage +{PAS_ECLAIRAGE}/frame) : "
+          f"{resyncs} resynchronisation(s), accord des contours min {min(accords):.3f}, mêmes pièces")
+
+
+def bench_incremental(classifier=None, seed=0):
+    """
+    Vérifie sur des paires de frames synthétiques que la détection incrémentale donne exactement
+    le même résultat (objets et carte de contours) que detecter_objets sur la frame complète,
+    puis, sur une séquence avec bruit capteur et dérive d'éclairage, qu'elle reste proche et se resynchronise
+    (verifier_derive). Compare les durées.
+    """
+    from . import detection
+    if classifier is not None:
+        detection._classifier = classifier
+    detection._classifier.load()
+    # Sans cache d'embeddings, pour ne mesurer que le gain de la détection incrémentale
+    detection._classifier.clear_cache()
+    cache_max, detection._classifier.cache_max = detection._classifier.cache_max, 0
+
+    rng = np.random.default_rng(seed)
+    t_complet, t_incr = [], []
+    for k in range(N_PAIRES_SYNTHETIQUES):
+        avant, apres = paire_synthetique(rng)
+
+        detecteur = IncrementalDetector()
+        detecteur.detect(avant.copy())
+        t0 = time.perf_counter()
+        objets_incr, _, carte_incr, _, _ = detecteur.detect(apres.copy())
+        t_incr.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        objets_ref, _, carte_ref, _, _ = detecter_objets(apres.copy())
+        t_complet.append(time.perf_counter() - t0)
+
+        assert np.array_equal(carte_incr, carte_ref), f"paire {k} : cartes de contours différentes"
+        assert objets_incr == objets_ref, f"paire {k} : objets différents\n{objets_incr}\n{objets_ref}"
+        print(f"Paire {k} : {len(objets_ref)} pièce(s), résultat identique "
+              f"({detecteur.stats['tuiles']} tuile(s), {detecteur.stats['reutilisees']} réutilisée(s))")
+
+    verifier_derive(rng)
+
+    detection._classifier.cache_max = cache_max
+    print(f"Détection complète : {np.median(t_complet):.3f} s (médiane)")
+    print(f"Détection incrémentale : {np.median(t_incr):.3f} s (médiane)")
+
+
+def accord_contours(a, b):
+    """F-score entre deux cartes de contours, un pixel étant compté juste s'il a un voisin (1 px) dans l'autre."""
+    noyau = np.ones((3, 3), np.uint8)
+    na, nb = np.count_nonzero(a), np.count_nonzero(b)
+    if na == 0 and nb == 0:
+        return 1.0
+    precision = np.count_nonzero((b > 0) & (cv2.dilate(a, noyau) > 0)) / max(nb, 1)
+    rappel = np.count_nonzero((a > 0) & (cv2.dilate(b, noyau) > 0)) / max(na, 1)
+    return 2 * precision * rappel / max(precision + rappel, 1e-9)
+
+
+def bench_backend(classifier=None):
+    """
+    Parité et vitesse du backend "opencv" face au backend "skimage" sur les images de dataset_edge :
+    accord des cartes de contours, accord des clusters et durée de prétraitement par crop.
+    """
+    classifier = classifier or Classifier(cache_max=0)
+    classifier.load()
+    cache_max, classifier.cache_max = classifier.cache_max, 0
+    crops = [cv2.imread(f) for f in lister_images()]
+
+    def avec_backend(backend, fn):
+        precedent, classifier.backend = classifier.backend, backend
+        try:
+            return fn()
+        finally:
+            classifier.backend = precedent
+
+    accords = []
+    for crop in crops:
+        ref = avec_backend("skimage", lambda: classifier.preprocess_edge(crop))
+        rapide = avec_backend("opencv", lambda: classifier.preprocess_edge(crop))
+        accords.append(accord_contours(ref, rapide))
+    accord_contours_moyen = float(np.mean(accords))
+
+    clusters_ref = avec_backend("skimage", lambda: classifier.classify_crops(crops))
+    clusters_rapide = avec_backend("opencv", lambda: classifier.classify_crops(crops))
+    accord_clusters = np.mean([a[1] == b[1] for a, b in zip(clusters_ref, clusters_rapide)])
+
+    t_ref = avec_backend("skimage", lambda: chronometrer(lambda: [classifier.crop_to_tensor(c) for c in crops]))
+    t_rapide = avec_backend("opencv", lambda: chronometrer(lambda: [classifier.crop_to_tensor(c) for c in crops]))
+    classifier.cache_max = cache_max
+
+    print(f"{len(crops)} images de '{DATASET_PATH}/'")
+    print(f"Accord des contours (F-score, 1 px) : {accord_contours_moyen:.3f} (min {min(accords):.3f})")
+    print(f"Accord des clusters : {accord_clusters:.1%}")
+    print(f"Prétraitement + tenseur par crop : skimage {t_ref / len(crops) * 1000:.2f} ms, "
+          f"opencv {t_rapide / len(crops) * 1000:.2f} ms ({t_ref / t_rapide:.1f}x)")
+
+    assert accord_contours_moyen >= PARITE_CONTOURS_MIN, "cartes de contours trop différentes"
+    assert accord_clusters >= PARITE_CLUSTERS_MIN, "clusters trop différents"
+
+
+def apparier_centres(ref, test, distance_max=40):
+    """
+    Associe chaque centre de ref au plus proche de test.
+    Retourne (paires [(i_ref, i_test)], n manquants, n en trop) ; au-delà de distance_max px
+    (une demi-pièce), la pièce de ref est considérée comme manquée.
+    """
+    if not ref or not test:
+        return [], len(ref), len(test)
+    dist = np.linalg.norm(np.array(ref, float)[:, None, :] - np.array(test, float)[None, :, :], axis=2)
+    proches = dist.argmin(axis=1)
+    paires = [(i, int(j)) for i, j in enumerate(proches) if dist[i, j] < distance_max]
+    return paires, len(ref) - len(paires), len(test) - len({j for _, j in paires})
+
+
+def bench_pyramide(seed=0):
+    """
+    Localisation en pleine résolution vs sur l'image réduite (FACTEURS_PYRAMIDE) sur des frames
+    synthétiques : durée, pièces manquées / en trop et écart des centres en px et en mm.
+    """
+    from main import pixels_vers_mm
+
+    rng = np.random.default_rng(seed)
+    frames = [frame_synthetique(formes_aleatoires(rng, N_FORMES_SYNTHETIQUES)) for _ in range(N_PAIRES_SYNTHETIQUES)]
+    croppeds = [rogner(f) for f in frames]
+    crop_h, crop_w = croppeds[0].shape[:2]
+
+    def centres(facteur):
+        return [[(cx, cy) for _, cx, cy, _ in localiser(c, facteur)[1]] for c in croppeds]
+
+    ref = centres(1)
+    t_ref = chronometrer(lambda: centres(1)) / len(croppeds)
+    print(f"Pleine résolution : {t_ref * 1000:.1f} ms/frame, {sum(map(len, ref))} pièces")
+
+    print(f"{'facteur':>7} | {'ms/frame':>8} | {'gain':>5} | {'manquées':>8} | {'en trop':>7} | "
+          f"{'écart moy (px)':>14} | {'écart max (px)':>14} | {'écart max (mm)':>14}")
+    for facteur in FACTEURS_PYRAMIDE:
+        test = centres(facteur)
+        t = chronometrer(lambda: centres(facteur)) / len(croppeds)
+        ecarts_px, ecarts_mm, manquees, en_trop = [], [], 0, 0
+        for r, c in zip(ref, test):
+            paires, m, x = apparier_centres(r, c)
+            manquees += m
+            en_trop += x
+            for i, j in paires:
+                ecarts_px.append(np.hypot(r[i][0] - c[j][0], r[i][1] - c[j][1]))
+                ax, ay = pixels_vers_mm(*r[i], crop_w, crop_h)
+                bx, by = pixels_vers_mm(*c[j], crop_w, crop_h)
+                ecarts_mm.append(np.hypot(ax - bx, ay - by))
+        print(f"{facteur:>7} | {t * 1000:>8.1f} | {t_ref / t:>4.1f}x | {manquees:>8} | {en_trop:>7} | "
+              f"{np.mean(ecarts_px):>14.2f} | {np.max(ecarts_px):>14.2f} | {np.max(ecarts_mm):>14.2f}")
+
+
+def plateau_synthetique(crops, rng, taille):
+    """
+    Colle les crops, ramenés à la taille d'une pièce sur le plateau (taille px, voir calibration.taille_piece_px),
+    dans une grille du plateau (avec jitter). Retourne (plateau, rects).
+    """
+    plateau = np.zeros((TAILLE_PLATEAU, TAILLE_PLATEAU, 3), np.uint8)
+    n_cases = TAILLE_PLATEAU // PAS_GRILLE_PLATEAU
+    cases = rng.permutation(n_cases * n_cases)[:len(crops)]
+    rects = []
+    for crop, case in zip(crops, cases):
+        crop = a_l_echelle_plateau(crop, taille)
+        h, w = crop.shape[:2]
+        x = case % n_cases * PAS_GRILLE_PLATEAU + int(rng.integers(0, PAS_GRILLE_PLATEAU - w))
+        y = case // n_cases * PAS_GRILLE_PLATEAU + int(rng.integers(0, PAS_GRILLE_PLATEAU - h))
+        plateau[y:y + h, x:x + w] = crop
+        rects.append((x, y, x + w, y + h))
+    return plateau, rects
+
+
+def accord_clusters(a, b):
+    """Accord entre deux étiquetages dont les numéros de clusters ne se correspondent pas (meilleure permutation)."""
+    a, b = np.asarray(a), np.asarray(b)
+    k = int(max(a.max(), b.max())) + 1
+    contingence = np.zeros((k, k), int)
+    np.add.at(contingence, (a, b), 1)
+    meilleur = max(contingence[np.arange(k), list(p)].sum() for p in itertools.permutations(range(k)))
+    return meilleur / len(a)
+
+
+def bench_plateau(classifier=None, seed=0):
+    """
+    Extraction "plateau" (prétraitement et DINOv2 une fois sur tout le plateau, tokens moyennés par pièce)
+    face au chemin crop par crop, sur des plateaux synthétiques de N_PIECES_PLATEAU pièces de dataset_edge :
+    durée totale de classification et accord des clusters.
+    """
+    classifier = classifier or Classifier(cache_max=0)
+    classifier.load()
+    if classifier.head_plateau is None:
+        print("Tête 'plateau' absente : lancez d'abord python src/train_classifier.py --plateau")
+        return
+    cache_max, classifier.cache_max = classifier.cache_max, 0
+    rng = np.random.default_rng(seed)
+    taille = taille_piece_px() # comme l'entraînement de la tête plateau (train_classifier.features_plateau)
+    classifier.classify_tray(*plateau_synthetique(charger_crops(1), rng, taille))  # préchauffage (chargement du modèle)
+
+    print(f"{'pièces':>6} | {'crops (ms)':>10} | {'plateau (ms)':>12} | {'gain':>5} | {'accord clusters':>15}")
+    for n in N_PIECES_PLATEAU:
+        plateau, rects = plateau_synthetique(charger_crops(n), rng, taille)
+        crops = [plateau[y1:y2, x1:x2] for x1, y1, x2, y2 in rects]
+        t_crops = chronometrer(lambda: classifier.classify_crops(crops))
+        t_plateau = chronometrer(lambda: classifier.classify_tray(plateau, rects))
+        accord = accord_clusters([c for _, c in classifier.classify_crops(crops)],
+                                 [c for _, c in classifier.classify_tray(plateau, rects)])
+        print(f"{n:>6} | {t_crops * 1000:>10.0f} | {t_plateau * 1000:>12.0f} | {t_crops / t_plateau:>4.1f}x | "
+              f"{accord:>15.1%}")
+    classifier.cache_max = cache_max
+
+
+def pieces_en_bandes(rng, n, plateau):
+    """
+    Plateau synthétique (mm) : la moitié des pièces environ reprend le Y d'une pièce de même classe (à +- 5 mm),
+    comme des vis d'un même lot tombées en ligne.
+    """
+    pieces = []
+    while len(pieces) < n:
+        classe = rng.choice(list(plateau.boites))
+        voisines = [p for p in pieces if p.classe == classe]
+        if voisines and rng.random() < 0.5:
+            y = rng.choice(voisines).y + rng.uniform(-5, 5)
+        else:
+            y = rng.uniform(20, 300)
+        x = rng.uniform(20, 280)
+        if all(np.hypot(p.x - x, p.y - y) >= ECART_MIN_PIECES_MM for p in pieces):
+            pieces.append(Piece(id=len(pieces) + 1, x=round(x, 1), y=round(min(max(y, 5), 315), 1), classe=classe))
+    return pieces
+
+
+def verifier_balayages(ordre, elements, plateau):
+    """Chaque pièce est poussée une fois ; un groupe a un seul bac et aucune pièce étrangère restante sur son trajet."""
+    assert sorted(p.id for e in elements for p in pieces_de(e)) == sorted(p.id for p in ordre), "pièce perdue ou dupliquée"
+    triees = set()
+    for e in elements:
+        if isinstance(e, Balayage):
+            assert len({p.classe for p in e.pieces}) == 1, f"{e} : plusieurs bacs"
+            restantes = [a for a in ordre if a.id not in triees and a.classe != e.classe]
+            assert not any(piece_sur_trajet(p, a, plateau) for p in e.pieces for a in restantes), \
+                f"{e} : pièce étrangère sur le trajet"
+        triees.update(p.id for p in pieces_de(e))
+
+
+def bench_balayages(seed=0):
+    """
+    Tri de plateaux synthétiques avec et sans regroupement des pièces d'un même bac en un seul trait
+    (programme compilé entier, durées du modèle cinématique).
+    """
+    rng = random.Random(seed)
+    plateau = plateau_defaut()
+    depart = {"X": 0.0, "Y": 320.0, "Z": 15.0}
+    print(f"{'pièces':>6} | {'pièces/trait':>12} | {'seules (s/pièce)':>16} | {'groupées (s/pièce)':>18} | {'gain':>6}")
+    for n in N_PIECES_BALAYAGES:
+        traits = t_seules = t_groupees = 0.0
+        for _ in range(N_PLATEAUX_BALAYAGES):
+            ordre = [e["piece"] for e in calculer_priorite(pieces_en_bandes(rng, n, plateau), plateau)]
+            elements = grouper_balayages(ordre, plateau)
+            verifier_balayages(ordre, elements, plateau)
+            traits += len(elements)
+            t_seules += compiler(ordre, plateau, depart=depart).duree_estimee
+            t_groupees += compiler(elements, plateau, depart=depart).duree_estimee
+        total = n * N_PLATEAUX_BALAYAGES
+        print(f"{n:>6} | {total / traits:>12.2f} | {t_seules / total:>16.2f} | {t_groupees / total:>18.2f} | "
+              f"{1 - t_groupees / t_seules:>6.1%}")
+
+
+def pieces_aleatoires_mm(rng, n, plateau):
+    """Plateau synthétique (mm), pièces réparties uniformément."""
+    return [Piece(id=i, x=round(rng.uniform(20, 280), 1), y=round(rng.uniform(20, 300), 1),
+                  classe=rng.choice(list(plateau.boites))) for i in range(1, n + 1)]
+
+
+def collisions_en_route(ordre, plateau):
+    """Pour chaque pièce, ids des pièces encore présentes sur son trajet au moment où elle est poussée."""
+    return {p.id: {a.id for a in ordre[i + 1:] if piece_sur_trajet(p, a, plateau)} for i, p in enumerate(ordre)}
+
+
+def bench_ordre(seed=0):
+    """
+    Compare les stratégies d'ordre (STRATEGIES_ORDRE) : déplacements à vide totaux et temps de planification.
+    Vérifie que chaque stratégie garde exactement les collisions de l'ordre glouton.
+    """
+    rng = random.Random(seed)
+    plateau = plateau_defaut()
+    print(f"{'pièces':>6} | " + " | ".join(f"{nom + ' (mm)':>14} | {nom + ' (ms)':>14}" for nom in STRATEGIES_ORDRE)
+          + f" | {'gain trajet':>11}")
+    for n in N_PIECES_ORDRE:
+        longueurs = dict.fromkeys(STRATEGIES_ORDRE, 0.0)
+        durees = dict.fromkeys(STRATEGIES_ORDRE, 0.0)
+        for _ in range(N_PLATEAUX_ORDRE):
+            pieces = pieces_aleatoires_mm(rng, n, plateau)
+            reference = None
+            for nom, strategie in STRATEGIES_ORDRE.items():
+                t0 = time.perf_counter()
+                ordre = [e["piece"] for e in strategie(pieces, plateau)]
+                durees[nom] += time.perf_counter() - t0
+                longueurs[nom] += longueur_trajet(ordre, plateau)
+                assert sorted(p.id for p in ordre) == sorted(p.id for p in pieces), f"{nom} : pièce perdue ou dupliquée"
+                reference = reference or collisions_en_route(ordre, plateau)
+                assert collisions_en_route(ordre, plateau) == reference, f"{nom} : collisions différentes de l'ordre glouton"
+        ligne = " | ".join(f"{longueurs[nom] / N_PLATEAUX_ORDRE:>14.0f} | {durees[nom] / N_PLATEAUX_ORDRE * 1000:>14.1f}"
+                           for nom in STRATEGIES_ORDRE)
+        print(f"{n:>6} | {ligne} | {1 - longueurs['trajet'] / longueurs['glouton']:>11.1%}")
+
+
+def bench_priorite(seed=0):
+    """
+    calculer_priorite (matrice de collisions + tas) contre calculer_priorite_reference : ordre et entrées identiques
+    (coordonnées arrondies à 5 mm pour provoquer des égalités), puis durée jusqu'à 1000 pièces.
+    """
+    rng = random.Random(seed)
+    plateau = plateau_defaut()
+    print(f"{'pièces':>6} | {'origine (ms)':>12} | {'vectorisé (ms)':>14} | {'gain':>7}")
+    for n in N_PIECES_PRIORITE:
+        pieces = [Piece(id=p.id, x=5 * round(p.x / 5), y=5 * round(p.y / 5), classe=p.classe)
+                  for p in pieces_aleatoires_mm(rng, n, plateau)]
+        t_vectorise = chronometrer(lambda: calculer_priorite(pieces, plateau), repetitions=1)
+        if n > N_PIECES_REFERENCE_MAX:
+            print(f"{n:>6} | {'-':>12} | {t_vectorise * 1000:>14.1f} | {'-':>7}")
+            continue
+        for cout in (None, lambda p: round(p.y, -1)):
+            assert calculer_priorite(pieces, plateau, cout) == calculer_priorite_reference(pieces, plateau, cout), \
+                f"{n} pièces : ordre différent de la version d'origine"
+        t_reference = chronometrer(lambda: calculer_priorite_reference(pieces, plateau), repetitions=1)
+        print(f"{n:>6} | {t_reference * 1000:>12.1f} | {t_vectorise * 1000:>14.1f} | {t_reference / t_vectorise:>6.1f}x")
+
+
+def bench_collisions(seed=0):
+    """
+    matrice_collisions contre piece_sur_trajet appelé pour chaque paire : matrices identiques sur des plateaux
+    aléatoires (dont des coordonnées multiples de 5 mm, qui tombent pile sur la marge), puis durée.
+    """
+    rng = random.Random(seed)
+    plateau = plateau_defaut()
+
+    def scalaire(pieces):
+        return np.array([[a.id != p.id and piece_sur_trajet(p, a, plateau) for a in pieces] for p in pieces])
+
+    for k in range(N_PLATEAUX_COLLISIONS):
+        pieces = pieces_aleatoires_mm(rng, rng.randint(2, 80), plateau)
+        if k % 2:
+            pieces = [Piece(id=p.id, x=5 * round(p.x / 5), y=5 * round(p.y / 5), classe=p.classe) for p in pieces]
+        assert np.array_equal(matrice_collisions(tableau_pieces(pieces, plateau), plateau), scalaire(pieces)), \
+            f"plateau {k} : matrice vectorisée différente de piece_sur_trajet"
+    print(f"{N_PLATEAUX_COLLISIONS} plateaux aléatoires : matrices identiques")
+
+    print(f"{'pièces':>6} | {'paire par paire (ms)':>20} | {'vectorisé (ms)':>14} | {'gain':>7}")
+    for n in N_PIECES_COLLISIONS:
+        pieces = pieces_aleatoires_mm(rng, n, plateau)
+        t_scalaire = chronometrer(lambda: scalaire(pieces), repetitions=1)
+        t_vectorise = chronometrer(lambda: matrice_collisions(tableau_pieces(pieces, plateau), plateau))
+        print(f"{n:>6} | {t_scalaire * 1000:>20.1f} | {t_vectorise * 1000:>14.2f} | {t_scalaire / t_vectorise:>6.0f}x")
+
+
+def bench_verification(classifier=None, seed=0):
+    """
+    Frames synthétiques où N_PIECES_POUSSEES pièces ont été poussées hors du plateau et N_PIECES_BOUGEES déplacées :
+    la vérification par zones doit trouver vides les places quittées, et occupées les nouvelles places et celles
+    des pièces restées. Compare sa durée à celle de la détection complète (localisation + classification).
+    """
+    from . import detection
+    if classifier is not None:
+        detection._classifier = classifier
+    detection._classifier.load()
+    detection._classifier.clear_cache()
+    cache_max, detection._classifier.cache_max = detection._classifier.cache_max, 0
+
+    rng = np.random.default_rng(seed)
+    t_verif, t_complet, n_zones = [], [], 0
+    for k in range(N_PAIRES_SYNTHETIQUES):
+        formes = formes_aleatoires(rng, N_FORMES_SYNTHETIQUES)
+        frame = frame_synthetique(formes)
+        dx, dy = int(frame.shape[1] * CUT_LEFT_PCT), int(frame.shape[0] * CUT_TOP_PCT) # origine de l'image rognée
+        # Seules les pièces vues par la détection complète (les plus petites passent sous l'aire minimale)
+        vues = [(cx + dx, cy + dy) for _, cx, cy, _ in localiser(rogner(frame))[1]]
+        formes = [f for f in formes if any(np.hypot(f[0] - x, f[1] - y) < 10 for x, y in vues)]
+
+        indices = rng.permutation(len(formes))
+        poussees = indices[:N_PIECES_POUSSEES]
+        bougees = indices[N_PIECES_POUSSEES:N_PIECES_POUSSEES + N_PIECES_BOUGEES]
+        vides = [(formes[i][0], formes[i][1]) for i in poussees]
+        for i in bougees:
+            vides.append((formes[i][0], formes[i][1]))
+            formes[i][1] += int(rng.choice([-1, 1])) * 60 # même X, assez loin pour quitter sa zone sans toucher une voisine
+        occupees = [(f[0], f[1]) for i, f in enumerate(formes) if i not in poussees]
+        apres = frame_synthetique([f for i, f in enumerate(formes) if i not in poussees])
+        cropped = rogner(apres)
+        crop_h, crop_w = cropped.shape[:2]
+
+        def zone(cx, cy):
+            cx, cy, d = cx - dx, cy - dy, DEMI_ZONE_VERIFICATION
+            return max(0, cx - d), max(0, cy - d), min(crop_w, cx + d), min(crop_h, cy + d)
+
+        def verifier():
+            return ([pieces_dans_zone(cropped, zone(*c)) for c in vides],
+                    [pieces_dans_zone(cropped, zone(*c)) for c in occupees])
+
+        resultats_vides, resultats_occupees = verifier()
+        for c, trouvees in zip(vides, resultats_vides):
+            # Une pièce déplacée de 60 px peut déborder sur la zone quittée : seul son centre compte
+            proches = [t for t in trouvees if max(abs(t[0] + dx - c[0]), abs(t[1] + dy - c[1])) < 30]
+            assert not proches, f"frame {k} : place {c} vue occupée"
+        for c, trouvees in zip(occupees, resultats_occupees):
+            assert trouvees, f"frame {k} : pièce {c} non retrouvée"
+        n_zones += len(vides) + len(occupees)
+
+        t_verif.append(chronometrer(verifier))
+        t0 = time.perf_counter()
+        detecter_objets(apres.copy())
+        t_complet.append(time.perf_counter() - t0)
+        print(f"Frame {k} : {len(vides)} place(s) vide(s), {len(occupees)} pièce(s) retrouvée(s)")
+
+    detection._classifier.cache_max = cache_max
+    n = n_zones / N_PAIRES_SYNTHETIQUES
+    print(f"Vérification ({n:.0f} zones/frame) : {np.median(t_verif) * 1000:.1f} ms (médiane)")
+    print(f"Détection complète : {np.median(t_complet) * 1000:.1f} ms (médiane), "
+          f"{np.median(t_complet) / np.median(t_verif):.0f}x plus lente")
+
+
+BENCHMARKS = {
+    "batch": bench_batch,
+    "cache": bench_cache,
+    "incremental": bench_incremental,
+    "backend": bench_backend,
+    "startup": mesurer_demarrage,
+    "pyramide": bench_pyramide,
+    "plateau": bench_plateau,
+    "balayages": bench_balayages,
+    "ordre": bench_ordre,
+    "priorite": bench_priorite,
+    "collisions": bench_collisions,
+    "verification": bench_verification,
+}
+
+
+if __name__ == "__main__":
+    noms = sys.argv[1:] or list(BENCHMARKS)
+    for nom in noms:
+        print(f"\n=== Benchmark : {nom} ===")
+        BENCHMARKS[nom]()
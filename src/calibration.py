@@ -0,0 +1,319 @@
+"""
+Calibration pixels (image rognée) -> mm plateau.
+
+Une homographie, ajustée sur des mires dont on connaît la position en mm, remplace la règle de trois
+(image supposée carrée, vue de face et sans distorsion). En option, la distorsion radiale de l'objectif
+est estimée d'abord (k1, sur les mires elles-mêmes) et les pixels sont redressés avant l'homographie.
+Le résultat est sauvegardé dans models/calibration.npz et chargé par main.py et l'interface pixels.
+
+Mires, au choix :
+  - touchées avec la tête : pixel de la mire sur la photo, position X Y de la tête posée dessus (mm)
+  - détectées sur une photo : pièces posées à des positions connues, appariées à la pièce localisée la plus proche
+    de leur position prévue par la calibration courante
+
+À lancer depuis la racine du projet :
+    python -m src.calibration                                    # vérifications sur points synthétiques déformés
+    python -m src.calibration points.json [--distorsion]         # [[px, py, mm_x, mm_y], ...] -> models/calibration.npz
+    python -m src.calibration mires.json --photo plateau.png [--distorsion]  # [[mm_x, mm_y], ...] détectées sur la photo
+"""
+
+import os
+import sys
+import json
+import tempfile
+import cv2
+import numpy as np
+
+
+MODEL_DIR = "models"
+CALIBRATION_PATH = os.path.join(MODEL_DIR, "calibration.npz")
+PLATEAU_MM = (320.0, 320.0) # largeur (X), hauteur (Y)
+TAILLE_ROGNEE = (1552, 1474) # image 2028x1520 rognée par detection.rogner (calibration par défaut)
+N_MIRES_MIN = 4
+N_MIRES_DISTORSION_MIN = 9 # la distorsion ajoute des inconnues : plus de mires, bien réparties
+APPARIEMENT_MIRE_MM = 15.0 # écart max entre une mire prévue et la pièce localisée
+K1_BORNES = (-0.5, 0.5) # distorsion radiale cherchée (r en unités de la plus grande dimension de l'image)
+N_ITERATIONS_K1 = 40
+TAILLE_PIECE_MM = 23.0 # plus grand côté d'une pièce sur le plateau (~110 px sur l'image rognée, ~4.8 px/mm)
+ERREUR_MAX_MM = 1.0 # au-delà (erreur moyenne sur les mires), la calibration est signalée
+
+
+class Calibration:
+    """
+    Homographie H (pixels redressés -> mm) pour une image rognée de taille donnée.
+    Si K et dist sont présents, les pixels sont d'abord redressés (distorsion de l'objectif).
+    Les conversions acceptent des scalaires ou des tableaux : tous les centres en un seul appel.
+    """
+
+    def __init__(self, H, taille, K=None, dist=None):
+        self.H = np.asarray(H, np.float64)
+        self.H_inv = np.linalg.inv(self.H)
+        self.taille = (int(taille[0]), int(taille[1])) # (crop_w, crop_h) de la calibration
+        self.K = None if K is None else np.asarray(K, np.float64)
+        self.dist = None if dist is None else np.asarray(dist, np.float64)
+
+    @classmethod
+    def lineaire(cls, taille=TAILLE_ROGNEE, plateau=PLATEAU_MM):
+        """Ancienne règle de trois : mm_x = (1 - px / w) * largeur, mm_y = py / h * hauteur."""
+        (w, h), (largeur, hauteur) = taille, plateau
+        return cls([[-largeur / w, 0, largeur], [0, hauteur / h, 0], [0, 0, 1]], taille)
+
+    @classmethod
+    def charger(cls, chemin=CALIBRATION_PATH):
+        """Calibration sauvegardée, ou None s'il n'y en a pas."""
+        if not os.path.exists(chemin):
+            return None
+        data = np.load(chemin)
+        K, dist = (data["K"], data["dist"]) if "K" in data else (None, None)
+        return cls(data["H"], data["taille"], K, dist)
+
+    def save(self, chemin=CALIBRATION_PATH):
+        os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+        extra = {} if self.K is None else {"K": self.K, "dist": self.dist}
+        np.savez(chemin, H=self.H, taille=np.array(self.taille), **extra)
+
+    def echelle(self, crop_w=None, crop_h=None):
+        #Pixels d'une image rognée de taille (crop_w, crop_h) -> pixels de la taille calibrée
+        if crop_w is None:
+            return 1.0, 1.0
+        return self.taille[0] / crop_w, self.taille[1] / crop_h
+
+    def px_par_mm(self, crop_w=None, crop_h=None):
+        """Échelle moyenne (px/mm) au centre du plateau, sur une image rognée de taille (crop_w, crop_h)."""
+        cx, cy = PLATEAU_MM[0] / 2, PLATEAU_MM[1] / 2
+        px, py = self.mm_vers_pixels([cx, cx + 1, cx], [cy, cy, cy + 1], crop_w, crop_h)
+        return (np.hypot(px[1] - px[0], py[1] - py[0]) + np.hypot(px[2] - px[0], py[2] - py[0])) / 2
+
+    def pixels_vers_mm(self, px, py, crop_w=None, crop_h=None):
+        """Pixels (image rognée, scalaires ou tableaux) -> mm plateau."""
+        px, py = np.asarray(px, np.float64), np.asarray(py, np.float64)
+        ex, ey = self.echelle(crop_w, crop_h)
+        pts = np.stack([px.ravel() * ex, py.ravel() * ey], axis=1)
+        if self.K is not None:
+            pts = cv2.undistortPoints(pts.reshape(-1, 1, 2), self.K, self.dist, P=self.K).reshape(-1, 2)
+        x, y = appliquer_homographie(self.H, pts)
+        return x.reshape(px.shape), y.reshape(py.shape)
+
+    def mm_vers_pixels(self, mm_x, mm_y, crop_w=None, crop_h=None):
+        """Inverse de pixels_vers_mm."""
+        mm_x, mm_y = np.asarray(mm_x, np.float64), np.asarray(mm_y, np.float64)
+        px, py = appliquer_homographie(self.H_inv, np.stack([mm_x.ravel(), mm_y.ravel()], axis=1))
+        if self.K is not None:
+            px, py = distordre(np.stack([px, py], axis=1), self.K, self.dist).T
+        ex, ey = self.echelle(crop_w, crop_h)
+        return (px / ex).reshape(mm_x.shape), (py / ey).reshape(mm_y.shape)
+
+    def __repr__(self):
+        return f"Calibration({self.taille[0]}x{self.taille[1]} px, {'avec' if self.K is not None else 'sans'} distorsion)"
+
+
+def charger_ou_lineaire(chemin=CALIBRATION_PATH):
+    """Calibration sauvegardée si elle existe, sinon la règle de trois d'origine."""
+    calibration = Calibration.charger(chemin)
+    if calibration is None:
+        print(f"Pas de calibration dans '{chemin}' : conversion linéaire (python -m src.calibration pour calibrer)")
+        return Calibration.lineaire()
+    return calibration
+
+
+def taille_piece_px(calibration=None):
+    """Plus grand côté (px) d'une pièce sur l'image rognée : TAILLE_PIECE_MM à l'échelle de la calibration."""
+    calibration = calibration or charger_ou_lineaire()
+    return max(1, round(TAILLE_PIECE_MM * float(calibration.px_par_mm())))
+
+
+def appliquer_homographie(H, pts):
+    #(n, 2) -> deux tableaux (n,) en coordonnées homogènes
+    h = np.column_stack([pts, np.ones(len(pts))]) @ H.T
+    return h[:, 0] / h[:, 2], h[:, 1] / h[:, 2]
+
+
+def distordre(pts, K, dist):
+    #Pixels redressés -> pixels vus par la caméra (inverse de cv2.undistortPoints)
+    normalises = cv2.undistortPoints(pts.reshape(-1, 1, 2), K, None).reshape(-1, 2) # K^-1 seulement
+    points_3d = np.column_stack([normalises, np.ones(len(normalises))])
+    pixels, _ = cv2.projectPoints(points_3d, np.zeros(3), np.zeros(3), K, dist)
+    return pixels.reshape(-1, 2)
+
+
+def redresser(pixels, K, dist):
+    return cv2.undistortPoints(pixels.reshape(-1, 1, 2), K, dist, P=K).reshape(-1, 2)
+
+
+def residu_homographie(redresses, mm):
+    #Homographie aux moindres carrés et écart moyen (mm) des mires
+    H, _ = cv2.findHomography(redresses, mm, 0)
+    if H is None:
+        return None, np.inf
+    x, y = appliquer_homographie(H, redresses)
+    return H, np.mean(np.hypot(x - mm[:, 0], y - mm[:, 1]))
+
+
+def calibrer(pixels, mm, taille, distorsion=False):
+    """
+    Ajuste la calibration sur des mires : pixels (n, 2) dans l'image rognée de taille (crop_w, crop_h),
+    mm (n, 2) positions plateau. Retourne (Calibration, erreurs en mm par mire).
+    Avec distorsion, cherche d'abord le k1 (distorsion radiale, point principal au centre, focale supposée égale à
+    la plus grande dimension) pour lequel les mires redressées tiennent le mieux sur une homographie.
+    """
+    pixels, mm = np.asarray(pixels, np.float64), np.asarray(mm, np.float64)
+    n_min = N_MIRES_DISTORSION_MIN if distorsion else N_MIRES_MIN
+    if len(pixels) < n_min:
+        raise ValueError(f"{len(pixels)} mire(s), il en faut au moins {n_min}")
+
+    #1 Distorsion : recherche par section dorée sur k1 (résidu unimodal sur K1_BORNES)
+    K = dist = None
+    if distorsion:
+        w, h = taille
+        K = np.array([[max(w, h), 0, w / 2], [0, max(w, h), h / 2], [0, 0, 1]])
+        residu = lambda k1: residu_homographie(redresser(pixels, K, np.array([k1, 0, 0, 0, 0])), mm)[1]
+        a, b = K1_BORNES
+        r = (np.sqrt(5) - 1) / 2
+        c, d = b - r * (b - a), a + r * (b - a)
+        rc, rd = residu(c), residu(d)
+        for _ in range(N_ITERATIONS_K1):
+            if rc < rd:
+                b, d, rd = d, c, rc
+                c = b - r * (b - a)
+                rc = residu(c)
+            else:
+                a, c, rc = c, d, rd
+                d = a + r * (b - a)
+                rd = residu(d)
+        dist = np.array([(a + b) / 2, 0, 0, 0, 0])
+
+    #2 Homographie (moindres carrés sur toutes les mires)
+    H, _ = residu_homographie(pixels if K is None else redresser(pixels, K, dist), mm)
+    if H is None:
+        raise ValueError("mires dégénérées (alignées ?)")
+    calibration = Calibration(H, taille, K, dist)
+    x, y = calibration.pixels_vers_mm(pixels[:, 0], pixels[:, 1])
+    return calibration, np.hypot(x - mm[:, 0], y - mm[:, 1])
+
+
+def detecter_mires(cropped, mires_mm, initiale):
+    """
+    Pièces posées aux positions mires_mm : chaque mire est appariée à la pièce localisée la plus proche de sa
+    position prévue par la calibration initiale. Retourne (pixels, mm) des mires retrouvées.
+    """
+    from .detection import localiser
+
+    crop_h, crop_w = cropped.shape[:2]
+    centres = np.array([(cx, cy) for _, cx, cy, _ in localiser(cropped)[1]], np.float64).reshape(-1, 2)
+    cx, cy = initiale.pixels_vers_mm(centres[:, 0], centres[:, 1], crop_w, crop_h)
+    pixels, mm = [], []
+    for mire in mires_mm:
+        ecarts = np.hypot(cx - mire[0], cy - mire[1])
+        if len(ecarts) == 0 or ecarts.min() > APPARIEMENT_MIRE_MM:
+            print(f"Mire {mire} non retrouvée")
+            continue
+        pixels.append(centres[ecarts.argmin()])
+        mm.append(mire)
+    return np.array(pixels), np.array(mm, np.float64)
+
+
+def mires_synthetiques(rng, n_cote=5, distorsion=0.0, bruit_px=0.0, taille=TAILLE_ROGNEE):
+    """
+    Grille de n_cote x n_cote mires sur le plateau, vue par une caméra légèrement inclinée (homographie tirée
+    autour de la règle de trois) avec une distorsion radiale k1 et un bruit de localisation.
+    Retourne (pixels, mm, Calibration exacte).
+    """
+    marge = 20.0
+    grille = np.linspace(marge, PLATEAU_MM[0] - marge, n_cote)
+    mm = np.array([(x, y) for x in grille for y in grille])
+
+    coins_mm = np.array([[0, 0], [PLATEAU_MM[0], 0], [PLATEAU_MM[0], PLATEAU_MM[1]], [0, PLATEAU_MM[1]]], np.float32)
+    w, h = taille
+    coins_px = np.array([[w, 0], [0, 0], [0, h], [w, h]], np.float64) + rng.normal(0, 0.03 * w, (4, 2))
+    H = cv2.getPerspectiveTransform(coins_px.astype(np.float32), coins_mm)
+
+    K = np.array([[max(w, h), 0, w / 2], [0, max(w, h), h / 2], [0, 0, 1]])
+    dist = np.array([distorsion, 0, 0, 0, 0], np.float64)
+    exacte = Calibration(H, taille, K, dist) if distorsion else Calibration(H, taille)
+    px, py = exacte.mm_vers_pixels(mm[:, 0], mm[:, 1])
+    pixels = np.column_stack([px, py]) + rng.normal(0, bruit_px, (len(mm), 2)) if bruit_px else np.column_stack([px, py])
+    return pixels, mm, exacte
+
+
+def verifier_synthetique(seed=0):
+    """Homographies et distorsions tirées au hasard : ajustement, conversion vectorisée, aller-retour, sauvegarde."""
+    rng = np.random.default_rng(seed)
+
+    #1 La calibration par défaut est l'ancienne règle de trois
+    lineaire = Calibration.lineaire((1501, 1459))
+    for px, py in [(0, 0), (1501, 1459), (750.5, 300)]:
+        x, y = lineaire.pixels_vers_mm(px, py)
+        assert np.allclose([x, y], [(1 - px / 1501) * 320, py / 1459 * 320]), "règle de trois"
+
+    #2 Homographie seule, sans bruit : exacte
+    for _ in range(20):
+        pixels, mm, _ = mires_synthetiques(rng)
+        calibration, erreurs = calibrer(pixels, mm, TAILLE_ROGNEE)
+        assert erreurs.max() < 1e-3, f"homographie exacte : erreur {erreurs.max():.2e} mm"
+
+    #3 Bruit de localisation : erreur sur une grille de contrôle bien plus fine que les mires
+    x, y = np.meshgrid(np.linspace(0, 320, 33), np.linspace(0, 320, 33))
+    for _ in range(20):
+        pixels, mm, exacte = mires_synthetiques(rng, bruit_px=1.0)
+        calibration, _ = calibrer(pixels, mm, TAILLE_ROGNEE)
+        px, py = exacte.mm_vers_pixels(x, y)
+        ex, ey = calibration.pixels_vers_mm(px, py)
+        assert np.hypot(ex - x, ey - y).max() < 1.0, "bruit 1 px : erreur de contrôle > 1 mm"
+
+    #4 Distorsion : le redressement est nécessaire, et suffisant
+    print(f"{'k1':>6} | {'homographie seule (mm)':>22} | {'avec distorsion (mm)':>20}")
+    for k1 in (-0.15, -0.05, 0.05, 0.1):
+        pixels, mm, exacte = mires_synthetiques(rng, n_cote=7, distorsion=k1, bruit_px=0.3)
+        px, py = exacte.mm_vers_pixels(x, y)
+        ecarts = []
+        for avec in (False, True):
+            calibration, _ = calibrer(pixels, mm, TAILLE_ROGNEE, distorsion=avec)
+            ex, ey = calibration.pixels_vers_mm(px, py)
+            ecarts.append(np.hypot(ex - x, ey - y).max())
+        print(f"{k1:>6} | {ecarts[0]:>22.2f} | {ecarts[1]:>20.2f}")
+        assert ecarts[1] < 1.0, f"k1={k1} : erreur {ecarts[1]:.2f} mm avec distorsion"
+        assert ecarts[1] < ecarts[0], f"k1={k1} : le redressement n'améliore rien"
+
+    #5 Vectorisé = point par point, aller-retour, autre taille d'image, sauvegarde
+    px, py = calibration.mm_vers_pixels(x, y, 3104, 2948)
+    ex, ey = calibration.pixels_vers_mm(px, py, 3104, 2948)
+    assert np.hypot(ex - x, ey - y).max() < 1e-3, "aller-retour mm -> pixels -> mm"
+    un_par_un = np.array([calibration.pixels_vers_mm(a, b, 3104, 2948) for a, b in zip(px.ravel(), py.ravel())])
+    assert np.allclose(un_par_un, np.column_stack([ex.ravel(), ey.ravel()])), "vectorisé différent du point par point"
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "calibration.npz")
+        calibration.save(chemin)
+        rechargee = Calibration.charger(chemin)
+    assert np.allclose(rechargee.pixels_vers_mm(px, py, 3104, 2948), (ex, ey)), "calibration rechargée différente"
+    print("Calibration : vérifications OK")
+
+
+def main(args):
+    distorsion = "--distorsion" in args
+    args = [a for a in args if a != "--distorsion"]
+    with open(args[0]) as f:
+        points = np.array(json.load(f), np.float64)
+
+    if "--photo" in args:
+        cropped = cv2.imread(args[args.index("--photo") + 1])
+        from .detection import rogner
+        cropped = rogner(cropped)
+        taille = (cropped.shape[1], cropped.shape[0])
+        pixels, mm = detecter_mires(cropped, points, charger_ou_lineaire())
+    else:
+        taille = TAILLE_ROGNEE
+        pixels, mm = points[:, :2], points[:, 2:]
+
+    calibration, erreurs = calibrer(pixels, mm, taille, distorsion)
+    print(f"{len(mm)} mire(s) : erreur moyenne {erreurs.mean():.2f} mm, max {erreurs.max():.2f} mm")
+    if erreurs.mean() > ERREUR_MAX_MM:
+        print("ATTENTION : erreur élevée, vérifier les mires (inversées, mal placées ?)")
+    calibration.save()
+    print(f"{calibration} sauvegardée dans '{CALIBRATION_PATH}'")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        main(sys.argv[1:])
+    else:
+        verifier_synthetique()
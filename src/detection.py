@@ -4,8 +4,10 @@ import torch
 from PIL import Image
 from torchvision import transforms
 from skimage import color, filters, feature, util
-import joblib
 import os
+from collections import OrderedDict
+
+from .export_model import load_dinov2, TUILE_PLATEAU
 
 
 # ==========================================
@@ -19,33 +21,152 @@ CUT_LEFT_PCT, CUT_RIGHT_PCT = 0.13, 0.105
 
 GST_PIPELINE = ( #setup des images
     "libcamerasrc ! video/x-raw, format=NV12, width=2028, height=1520, framerate=1/1 "
-    "! videoconvert ! video/x-raw, format=BGR ! appsink drop=1"
+    "! videoconvert ! video/x-raw, format=BGR ! appsink drop=1 max-buffers=1" # file bornée : CAMERA_TAMPON_FRAMES (main.py)
 )
 
 # Chemins vers les modèles pré-entraînés
 MODEL_DIR = "models"
 PCA_PATH = os.path.join(MODEL_DIR, "pca.joblib")
 KMEANS_PATH = os.path.join(MODEL_DIR, "kmeans.joblib")
+HEAD_PATH = os.path.join(MODEL_DIR, "head.npz") # PCA + KMeans exportés en NumPy par train_classifier.py
+HEAD_PLATEAU_PATH = os.path.join(MODEL_DIR, "head_plateau.npz") # idem sur features "plateau" (--plateau)
+
+BATCH_MAX = 16 # nombre max de crops envoyés ensemble à DINOv2 (limite la mémoire sur le Pi)
+CACHE_MAX = 256 # nombre max de pièces gardées en cache (embedding + cluster), 0 pour désactiver
+HASH_SIZE = 8 # taille du hash perceptuel (HASH_SIZE² bits)
+HASH_BBOX_PAS = 8 # quantification en px de la taille du crop dans la clé de cache
+
+# Prétraitement des crops : "skimage" (identique à preprocessing.py) ou "opencv" (rapide, uint8/float32)
+BACKEND = "skimage"
+QUANTIFICATION = False # DINOv2 en int8 (CPU) : plus rapide, à valider avec src/eval_quantization.py
+TAILLE_ENTREE = 224 # taille des images données à DINOv2
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+POIDS_GRIS_BGR = np.array([[0.0721, 0.7154, 0.2125]], np.float32) # mêmes poids que skimage.color.rgb2gray
+SOBEL_ECHELLE = 1000.0 # cv2.Canny n'accepte que des gradients int16 : gradients float multipliés par ce facteur
+
+# Extraction des features : "crop" (une passe DINOv2 par pièce, redimensionnée en 224x224) ou
+# "plateau" (une passe sur tout le plateau en tuiles, tokens de patchs moyennés sur chaque pièce)
+EXTRACTION = "crop"
+TAILLE_PATCH = 14 # côté en px d'un patch DINOv2 (vits14)
+
+
+def pooler_tokens(grille, rect):
+    """Moyenne des tokens de la grille (h_patchs, w_patchs, 384) sur les patchs touchés par rect (x1, y1, x2, y2) en px."""
+    x1, y1, x2, y2 = rect
+    bloc = grille[y1 // TAILLE_PATCH: -(-y2 // TAILLE_PATCH), x1 // TAILLE_PATCH: -(-x2 // TAILLE_PATCH)]
+    return bloc.reshape(-1, bloc.shape[-1]).mean(axis=0)
+
+
+def a_l_echelle_plateau(image, taille_px):
+    """Redimensionne une image de pièce (crop ou edges) pour que son plus grand côté fasse taille_px, sa taille sur le plateau."""
+    h, w = image.shape[:2]
+    k = taille_px / max(h, w)
+    return cv2.resize(image, (max(1, round(w * k)), max(1, round(h * k))), interpolation=cv2.INTER_AREA)
+
+
+def cle_crop(crop_bgr):
+    """
+    Clé de cache d'un crop : hash perceptuel (dHash) de l'image normalisée + taille quantifiée.
+    Une pièce qui n'a pas bougé entre deux scans donne la même clé malgré le bruit capteur.
+    """
+    gray = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY)
+    petit = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (petit[:, 1:] > petit[:, :-1]).flatten()
+    h, w = crop_bgr.shape[:2]
+    return np.packbits(bits).tobytes(), h // HASH_BBOX_PAS, w // HASH_BBOX_PAS
+
+
+# Localisation grossière : contours cherchés sur l'image rognée réduite de ce facteur (1 = pleine résolution).
+# Les crops de classification sont toujours pris dans l'image d'origine.
+FACTEUR_LOCALISATION = 1
+
+# Détection incrémentale (re-scans, toujours en pleine résolution)
+TUILE = 128 # taille des tuiles (px) re-localisées quand elles ont changé, multiple de HALO
+HALO = 16 # contexte (px) autour d'une tuile : flou 13x13 + Canny + dilatation 7x7 portent à 11 px
+SEUIL_CHANGEMENT = 25 # écart de niveau (0-255) à partir duquel un pixel est considéré comme modifié
+RATIO_TUILES_MAX = 0.5 # au-delà de cette fraction de tuiles modifiées, on refait une détection complète
+# Les écarts sous SEUIL_CHANGEMENT (dérive d'éclairage, ombres progressives) ne rafraîchissent pas la référence :
+# détection complète après RESYNC_MAX détections incrémentales de suite, ou dès que la dérive moyenne dépasse DERIVE_MAX
+RESYNC_MAX = 10
+DERIVE_MAX = 6.0 # écart moyen (0-255) entre les moyennes par blocs de HALO px de la frame et de la référence
+
+# Bords de l'image rognée qui ne doivent jamais donner de pièce (px pleine résolution)
+BORD_EXCLU_PX = 100
 
 
 # Une couleur par cluster
 COULEURS_CLUSTERS = [(255,0,0),(0,255,0),(0,0,255),(0,255,255),(128,128,128)]
 
 
+class NumpyHead:
+    """
+    Tête PCA + KMeans en NumPy pur (float32), sans scikit-learn à l'inférence.
+
+    La projection PCA et la recherche du centroïde le plus proche sont fusionnées :
+        argmin_k ||(x - mean) W^T - c_k||²  =  argmin_k ( -2 x A_k + b_k )
+    avec A = W^T C^T et b = 2 mean A + ||c||², soit un seul produit matriciel par lot.
+    """
+
+    def __init__(self, mean, components, centers):
+        self.mean = np.asarray(mean, np.float32)
+        self.components = np.asarray(components, np.float32)
+        self.centers = np.asarray(centers, np.float32)
+        self._A = self.components.T @ self.centers.T
+        self._b = 2 * self.mean @ self._A + (self.centers ** 2).sum(axis=1)
+
+    @classmethod
+    def from_npz(cls, chemin=HEAD_PATH):
+        data = np.load(chemin)
+        return cls(data["mean"], data["components"], data["centers"])
+
+    @classmethod
+    def from_sklearn(cls, pca, kmeans):
+        # Avec whiten=True, sklearn divise la projection par sqrt(variance expliquée)
+        components = pca.components_
+        if pca.whiten:
+            components = components / np.sqrt(pca.explained_variance_)[:, None]
+        return cls(pca.mean_, components, kmeans.cluster_centers_)
+
+    def save(self, chemin=HEAD_PATH):
+        np.savez(chemin, mean=self.mean, components=self.components, centers=self.centers)
+
+    def transform(self, feats):
+        #Projection PCA seule : (n, 384) -> (n, n_composantes)
+        return (np.asarray(feats, np.float32) - self.mean) @ self.components.T
+
+    def predict(self, feats):
+        #Cluster le plus proche pour chaque ligne de feats (n, 384)
+        scores = self._b - 2 * (np.asarray(feats, np.float32) @ self._A)
+        return scores.argmin(axis=1)
+
+
 class Classifier:
    #Classifieur basé sur DINOv2 + PCA + KMeans.
 
-    def __init__(self):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+    def __init__(self, batch_max=BATCH_MAX, cache_max=CACHE_MAX, backend=BACKEND, quantize=QUANTIFICATION):
+        if backend not in ("skimage", "opencv"):
+            raise ValueError(f"Backend de prétraitement inconnu : {backend}")
+        self.backend = backend
+        self.batch_max = batch_max
+        self.cache_max = cache_max
+        self.cache = OrderedDict()  # cle_crop -> (embedding DINOv2, cluster_id), ordre LRU
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.quantize = quantize
+        # Les noyaux int8 dynamiques n'existent que sur CPU
+        self.device = "cuda" if torch.cuda.is_available() and not quantize else "cpu"
         self.model = None
-        self.pca = None
-        self.kmeans = None
+        self.head = None # tête PCA + KMeans (NumpyHead)
+        self.model_patch = None # DINOv2 -> tokens de patchs (extraction "plateau"), chargé à la première utilisation
+        self.head_plateau = None # tête PCA + KMeans entraînée sur les features "plateau"
         self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
+            transforms.Resize((TAILLE_ENTREE, TAILLE_ENTREE)),
             transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                 std=[0.229, 0.224, 0.225])
+            transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
         ])
+        self._mean = np.array(IMAGENET_MEAN, np.float32)[:, None, None]
+        self._std = np.array(IMAGENET_STD, np.float32)[:, None, None]
         self._loaded = False
 
     def load(self):
@@ -53,27 +174,33 @@ class Classifier:
         if self._loaded:
             return
 
-        print("Chargement de DINOv2...")
-        self.model = torch.hub.load('facebookresearch/dinov2', 'dinov2_vits14')
-        self.model.to(self.device)
-        self.model.eval()
-
-        if os.path.exists(PCA_PATH) and os.path.exists(KMEANS_PATH):
-            print("Chargement PCA + KMeans pré-entraînés...")
-            self.pca = joblib.load(PCA_PATH)
-            self.kmeans = joblib.load(KMEANS_PATH)
+        self.model = load_dinov2(self.device, quantize=self.quantize)
+
+        if os.path.exists(HEAD_PATH):
+            print("Chargement de la tête PCA + KMeans (NumPy)...")
+            self.head = NumpyHead.from_npz(HEAD_PATH)
+        elif os.path.exists(PCA_PATH) and os.path.exists(KMEANS_PATH):
+            # Anciens modèles : joblib importe scikit-learn pour les désérialiser
+            import joblib
+            print("Chargement PCA + KMeans pré-entraînés (joblib)...")
+            print(f"Conseil : lancez 'python src/train_classifier.py --head' pour créer {HEAD_PATH}.")
+            self.head = NumpyHead.from_sklearn(joblib.load(PCA_PATH), joblib.load(KMEANS_PATH))
         else:
             print(f"ATTENTION : Modèles PCA/KMeans introuvables dans '{MODEL_DIR}/'.")
             print("Lancez d'abord train_classifier.py pour entraîner et sauvegarder les modèles.")
-            self.pca = None
-            self.kmeans = None
+            self.head = None
 
+        if os.path.exists(HEAD_PLATEAU_PATH):
+            self.head_plateau = NumpyHead.from_npz(HEAD_PLATEAU_PATH)
 
         self._loaded = True
         print("Classifieur prêt.")
 
     def preprocess_edge(self, crop_bgr):
         # Applique le même prétraitement que preprocessing.py sur un crop BGR.
+        if self.backend == "opencv":
+            return self._preprocess_edge_opencv(crop_bgr)
+
         rgb = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2RGB)
         gray = color.rgb2gray(rgb)
         gray = util.img_as_float(gray)
@@ -87,80 +214,210 @@ class Classifier:
 
         return (edges * 255).astype(np.uint8)
 
-    def classify_crop(self, crop_bgr):
-        """
-        Classifie un crop BGR d'une pièce individuelle.
-        1. Prétraitement edges (comme preprocessing.py)
-        2. Conversion en image RGB 3 canaux (edges répliqué)
-        3. Extraction features DINOv2
-        4. PCA → KMeans → label
-        """
+    def _preprocess_edge_opencv(self, crop_bgr):
+        # Même chaîne que la version skimage, en float32 avec OpenCV (pas de float64 ni de copies RGB)
+        gray = cv2.transform(crop_bgr.astype(np.float32), POIDS_GRIS_BGR * (1.0 / 255))
 
-        # DEBUG — à retirer ensuite
-        print(f"[DEBUG] pca chargé : {self.pca is not None}")
-        print(f"[DEBUG] kmeans chargé : {self.kmeans is not None}")
+        # Seuillage hard (nettoie le fond bruité)
+        gray[gray < 0.15] = 0
+
+        # filters.gaussian(sigma=2) puis le lissage interne de feature.canny(sigma=2) :
+        # noyaux tronqués à 4 sigma, bords répliqués
+        gaussian = cv2.GaussianBlur(gray, (17, 17), 2, borderType=cv2.BORDER_REPLICATE)
+        smooth = cv2.GaussianBlur(gaussian, (17, 17), 2, borderType=cv2.BORDER_REPLICATE)
+
+        # Gradients de Sobel + Canny avec les seuils par défaut de skimage (0.1 / 0.2, norme L2)
+        dx = cv2.Sobel(smooth, cv2.CV_32F, 1, 0, ksize=3) * SOBEL_ECHELLE
+        dy = cv2.Sobel(smooth, cv2.CV_32F, 0, 1, ksize=3) * SOBEL_ECHELLE
+        edges = cv2.Canny(dx.astype(np.int16), dy.astype(np.int16),
+                          0.1 * SOBEL_ECHELLE, 0.2 * SOBEL_ECHELLE, L2gradient=True)
 
-    
-        if self.pca is None or self.kmeans is None:
-            return "Inconnu", -1
+        # skimage ne garde jamais de contour sur le pixel de bord de l'image
+        edges[[0, -1], :] = 0
+        edges[:, [0, -1]] = 0
+        return edges
 
-        #1 Prétraitement : même pipeline que preprocessing.py
+    def crop_to_tensor(self, crop_bgr):
+        # Crop BGR -> edges -> image RGB 3 canaux (edges répliqué) -> tenseur normalisé 3x224x224
         edges = self.preprocess_edge(crop_bgr)
+        if self.backend == "opencv":
+            return self._edges_to_tensor(edges)
 
-        #2 Convertir edges mono-canal en image RGB 3 canaux pour DINOv2
         edges_rgb = cv2.cvtColor(edges, cv2.COLOR_GRAY2RGB)
-        pil_img = Image.fromarray(edges_rgb)
+        return self.transform(Image.fromarray(edges_rgb))
 
-        #3 Extraction features DINOv2
-        img_tensor = self.transform(pil_img).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            feat = self.model(img_tensor)
-        feat_np = feat.cpu().numpy().flatten().reshape(1, -1)
+    def _edges_to_tensor(self, edges):
+        # Équivalent NumPy de Resize + ToTensor + Normalize, sans passer par PIL
+        h, w = edges.shape
+        interpolation = cv2.INTER_AREA if h * w > TAILLE_ENTREE ** 2 else cv2.INTER_LINEAR
+        resized = cv2.resize(edges, (TAILLE_ENTREE, TAILLE_ENTREE), interpolation=interpolation)
+        return torch.from_numpy(self._normaliser(resized))
 
-        #4 PCA + KMeans
-        feat_reduced = self.pca.transform(feat_np)
-        cluster_id = int(self.kmeans.predict(feat_reduced)[0])
+    def _normaliser(self, edges):
+        # Edges uint8 (..., H, W) -> float32 (..., 3, H, W), canal répliqué et normalisé ImageNet
+        x = edges.astype(np.float32)[..., None, :, :] * (1.0 / 255)
+        return (x - self._mean) / self._std
+
+    def extract_features(self, crops_bgr):
+        """
+        Extrait les features DINOv2 d'une liste de crops BGR.
+        Les crops sont empilés par lots de self.batch_max : une seule passe du modèle par lot.
+        Retourne une matrice (n_crops, 384).
+        """
+        feats = []
+        for i in range(0, len(crops_bgr), self.batch_max):
+            batch = torch.stack([self.crop_to_tensor(c) for c in crops_bgr[i:i + self.batch_max]])
+            with torch.no_grad():
+                feat = self.model(batch.to(self.device))
+            feats.append(feat.cpu().numpy())
+        return np.concatenate(feats, axis=0)
+
+    def patch_tokens(self, edges):
+        """
+        Tokens de patchs DINOv2 d'une image d'edges (uint8) de taille quelconque, découpée en tuiles
+        TUILE_PLATEAU x TUILE_PLATEAU (complétées en noir). Retourne une grille (h_patchs, w_patchs, 384)
+        où la case (i, j) décrit les pixels [14i, 14i+14) x [14j, 14j+14).
+        """
+        if self.model_patch is None:
+            self.model_patch = load_dinov2(self.device, quantize=self.quantize, patch_tokens=True)
+
+        t, g = TUILE_PLATEAU, TUILE_PLATEAU // TAILLE_PATCH
+        h, w = edges.shape
+        n_ty, n_tx = -(-h // t), -(-w // t)
+        image = np.zeros((n_ty * t, n_tx * t), np.uint8)
+        image[:h, :w] = edges
+        tuiles = image.reshape(n_ty, t, n_tx, t).transpose(0, 2, 1, 3).reshape(-1, t, t)
+
+        tokens = []
+        for i in range(0, len(tuiles), self.batch_max):
+            batch = torch.from_numpy(self._normaliser(tuiles[i:i + self.batch_max]))
+            with torch.no_grad():
+                tokens.append(self.model_patch(batch.to(self.device)).cpu().numpy())
+        tokens = np.concatenate(tokens).reshape(n_ty, n_tx, g, g, -1)
+        return tokens.transpose(0, 2, 1, 3, 4).reshape(n_ty * g, n_tx * g, -1)
+
+    def extract_tray_features(self, cropped, rects):
+        """
+        Features "plateau" : prétraitement edges et DINOv2 une seule fois sur tout le plateau,
+        puis moyenne des tokens de patchs sous le rectangle de chaque pièce. Retourne (n_pieces, 384).
+        """
+        grille = self.patch_tokens(self.preprocess_edge(cropped))
+        return np.stack([pooler_tokens(grille, rect) for rect in rects])
+
+    def classify_tray(self, cropped, rects):
+        """Classifie toutes les pièces du plateau (rectangles (x1, y1, x2, y2)) avec l'extraction "plateau"."""
+        if self.head_plateau is None:
+            print(f"ATTENTION : {HEAD_PLATEAU_PATH} introuvable (train_classifier.py --plateau), "
+                  "classification crop par crop.")
+            return self.classify_crops([cropped[y1:y2, x1:x2] for x1, y1, x2, y2 in rects])
+        if len(rects) == 0:
+            return []
+
+        cluster_ids = self.head_plateau.predict(self.extract_tray_features(cropped, rects))
+        return [(f"cluster{int(c)}", int(c)) for c in cluster_ids]
+
+    def classify_crops(self, crops_bgr):
+        """
+        Classifie une liste de crops BGR en un seul passage.
+        1. Recherche de chaque crop dans le cache (pièces inchangées depuis le scan précédent)
+        2. Prétraitement edges des crops absents du cache (comme preprocessing.py)
+        3. Extraction features DINOv2 par lots
+        4. Tête PCA + KMeans appliquée une seule fois sur la matrice de features
+        Retourne une liste de (label, cluster_id) dans l'ordre des crops.
+        """
+        if self.head is None:
+            return [("Inconnu", -1)] * len(crops_bgr)
+        if len(crops_bgr) == 0:
+            return []
+
+        cles = [cle_crop(c) for c in crops_bgr]
+        cluster_ids = [None] * len(crops_bgr)
+        a_calculer = []
+        for i, cle in enumerate(cles):
+            if cle in self.cache:
+                self.cache.move_to_end(cle)
+                cluster_ids[i] = self.cache[cle][1]
+                self.cache_hits += 1
+            else:
+                a_calculer.append(i)
+                self.cache_misses += 1
+
+        if a_calculer:
+            feats = self.extract_features([crops_bgr[i] for i in a_calculer])
+            nouveaux_ids = self.head.predict(feats)
+            for i, feat, cluster_id in zip(a_calculer, feats, nouveaux_ids):
+                cluster_ids[i] = int(cluster_id)
+                self._mettre_en_cache(cles[i], feat, int(cluster_id))
+
+        return [(f"cluster{c}", c) for c in cluster_ids]
+
+    def _mettre_en_cache(self, cle, feat, cluster_id):
+        if self.cache_max <= 0:
+            return
+        self.cache[cle] = (feat, cluster_id)
+        self.cache.move_to_end(cle)
+        while len(self.cache) > self.cache_max:
+            self.cache.popitem(last=False)  # éviction de la pièce la moins récemment vue
+
+    def cache_stats(self):
+        total = self.cache_hits + self.cache_misses
+        return {
+            "taille": len(self.cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "taux_hit": self.cache_hits / total if total else 0.0,
+        }
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
-        label = f"cluster{cluster_id}"
-        return label, cluster_id
+    def classify_crop(self, crop_bgr):
+        """Classifie un crop BGR d'une pièce individuelle (voir classify_crops)."""
+        return self.classify_crops([crop_bgr])[0]
 
 
 # Instance globale du classifieur (chargement paresseux)
 _classifier = Classifier()
 
 
-def detecter_objets(frame):
-    """
-    Analyse la frame et retourne (données_objets, image_dessinée, image_debug, crop_w, crop_h).
-
-      1. Rognage
-      2. Détection de contours (localisation des pièces)
-      3. Pour chaque contour : extraction du crop -> classification DINOv2
-      4. Dessin des résultats
-    """
-
-    #Chargement paresseux du classifieur
-    _classifier.load()
-
-    donnees_objets = []
-
-    #1 ROGNAGE 
+def rogner(frame):
+    """Retire les bords de la frame qui ne montrent pas le plateau (vue sur la frame, pas de copie)."""
     height, width, _ = frame.shape
     y_start = int(height * CUT_TOP_PCT)
     y_end = int(height * (1 - CUT_BOTTOM_PCT))
     x_start = int(width * CUT_LEFT_PCT)
     x_end = int(width * (1 - CUT_RIGHT_PCT))
-    cropped = frame[y_start:y_end, x_start:x_end]
+    return frame[y_start:y_end, x_start:x_end]
 
-    crop_h, crop_w = cropped.shape[:2]
 
-    # 2. PRÉ-TRAITEMENT POUR DÉTECTION DE CONTOURS (localisation uniquement)
+def noyau_impair(taille, facteur):
+    # Taille de noyau ramenée à l'échelle réduite, toujours impaire et >= 1
+    return max(1, int(round(taille / facteur)) // 2 * 2 + 1)
+
+
+def carte_contours(cropped, facteur=1):
+    """
+    Flou + Canny + dilatation : carte binaire servant uniquement à localiser les pièces.
+    Avec facteur > 1, la carte est calculée sur l'image réduite d'autant (noyaux réduits aussi).
+    """
+    if facteur > 1:
+        # Dimensions ramenées à un multiple du facteur : INTER_AREA prend alors son chemin rapide
+        h, w = cropped.shape[:2]
+        cropped = cropped[:h - h % facteur, :w - w % facteur]
+        cropped = cv2.resize(cropped, (w // facteur, h // facteur), interpolation=cv2.INTER_AREA)
     gray = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (13, 13), 0)
+    k_flou = 13 if facteur == 1 else max(3, noyau_impair(13, facteur))
+    blur = cv2.GaussianBlur(gray, (k_flou, k_flou), 0)
     edges = cv2.Canny(blur, CANNY_LOW, CANNY_HIGH)
-    kernel = np.ones((7, 7), np.uint8)
-    dilated = cv2.dilate(edges, kernel, iterations=1)
+    k_dil = noyau_impair(7, facteur)
+    kernel = np.ones((k_dil, k_dil), np.uint8)
+    return cv2.dilate(edges, kernel, iterations=1)
+
 
+def exclure_zones_mortes(dilated, facteur=1):
+    """Met à zéro (en place) les zones de la carte de contours qui ne doivent jamais donner de pièce."""
     # Exclusion zone morte bas-droite
     h_d, w_d = dilated.shape
     exclude_w = int(w_d * 0.02)
@@ -168,17 +425,28 @@ def detecter_objets(frame):
     dilated[h_d - exclude_h: h_d, w_d - exclude_w: w_d] = 0
 
     # Exclusion des bords (pour que le trieuse ne les detecte pas en tant que pièce)
-    b = 100
+    b = int(BORD_EXCLU_PX / facteur)
     dilated[0:b, :] = 0
     dilated[h_d - b:h_d, :] = 0
     dilated[:, 0:b] = 0
     dilated[:, w_d - b:w_d] = 0
 
-    # 3. EXTRACTION DES CONTOURS
+
+def extraire_pieces(dilated, crop_w, crop_h, facteur=1):
+    """
+    Extrait les contours de la carte dilatée et garde ceux assez grands pour être une pièce.
+    Retourne une liste de (contour, cx, cy, (x1, y1, x2, y2)) où le rectangle est la zone
+    de crop à classifier (bounding box + 20% de marge).
+    Si la carte a été calculée à l'échelle 1/facteur, tout est ramené en coordonnées pleine
+    résolution (crop_w x crop_h).
+    """
     contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    area_min = int(100 * (crop_w * crop_h) / (474 * 461))
+    area_min = int(100 * (crop_w * crop_h) / (474 * 461)) / (facteur * facteur)
+    # Un pixel réduit couvre facteur x facteur pixels : on prend son centre
+    demi = (facteur - 1) / 2
 
+    pieces = []
     for cnt in contours:  # sort les contours de la pièce
         area = cv2.contourArea(cnt)
         if area < area_min:
@@ -187,11 +455,13 @@ def detecter_objets(frame):
         M = cv2.moments(cnt)  #pour le calcul du centre des pièces pour avoir les coordonées de la pièce
         if M['m00'] == 0:
             continue
-        cx = int(M['m10'] / M['m00'])
-        cy = int(M['m01'] / M['m00'])
+        cx = int(M['m10'] / M['m00'] * facteur + demi)
+        cy = int(M['m01'] / M['m00'] * facteur + demi)
 
-        # 4. EXTRACTION DU CROP pour classification
         x_bb, y_bb, w_bb, h_bb = cv2.boundingRect(cnt)
+        if facteur > 1:
+            cnt = cnt * facteur + int(demi)
+            x_bb, y_bb, w_bb, h_bb = x_bb * facteur, y_bb * facteur, w_bb * facteur, h_bb * facteur
 
         # Marge autour du bounding box (20%)
         margin_x = int(w_bb * 0.2)
@@ -201,16 +471,65 @@ def detecter_objets(frame):
         x2 = min(crop_w, x_bb + w_bb + margin_x)
         y2 = min(crop_h, y_bb + h_bb + margin_y)
 
-        piece_crop = cropped[y1:y2, x1:x2]
-
-        if piece_crop.size == 0:
+        if x2 <= x1 or y2 <= y1:
             continue
 
-        # 5. CLASSIFICATION par DINOv2 + PCA + KMeans
-        label, cluster_id = _classifier.classify_crop(piece_crop)
+        pieces.append((cnt, cx, cy, (x1, y1, x2, y2)))
+    return pieces
+
+
+def localiser(cropped, facteur=1):
+    """Carte de contours (à l'échelle 1/facteur) + pièces en coordonnées pleine résolution."""
+    crop_h, crop_w = cropped.shape[:2]
+    dilated = carte_contours(cropped, facteur)
+    exclure_zones_mortes(dilated, facteur)
+    return dilated, extraire_pieces(dilated, crop_w, crop_h, facteur)
+
+
+def pieces_dans_zone(cropped, rect, masque=None):
+    """
+    Localisation seule, sans classification, dans une zone (x1, y1, x2, y2) de l'image rognée, déjà limitée à l'image.
+    masque (uint8, taille de la zone) restreint la recherche, ex. au couloir d'une poussée.
+    Mêmes carte de contours, bords exclus et aire minimale que la détection complète.
+    Retourne les centres (cx, cy) des pièces trouvées, en coordonnées de l'image rognée.
+    """
+    crop_h, crop_w = cropped.shape[:2]
+    x1, y1, x2, y2 = rect
+    if x2 <= x1 or y2 <= y1:
+        return []
+    carte = carte_contours(cropped[y1:y2, x1:x2])
+    if masque is not None:
+        carte = cv2.bitwise_and(carte, masque)
+
+    # Bords exclus (la zone morte bas-droite est comprise dedans)
+    b = BORD_EXCLU_PX
+    carte[:max(0, b - y1), :] = 0
+    carte[max(0, crop_h - b - y1):, :] = 0
+    carte[:, :max(0, b - x1)] = 0
+    carte[:, max(0, crop_w - b - x1):] = 0
+
+    return [(cx + x1, cy + y1) for _, cx, cy, _ in extraire_pieces(carte, crop_w, crop_h)]
+
+
+def classifier_pieces(cropped, pieces):
+    """Classifie les crops de toutes les pièces en un seul passage. Retourne [(label, cluster_id)]."""
+    if EXTRACTION == "plateau":
+        return _classifier.classify_tray(cropped, [rect for _, _, _, rect in pieces])
+
+    # Les crops sont des vues sur `cropped` : à appeler avant le dessin
+    crops = [cropped[y1:y2, x1:x2] for _, _, _, (x1, y1, x2, y2) in pieces]
+    hits_avant = _classifier.cache_hits
+    resultats = _classifier.classify_crops(crops)
+    print(f"Classification : {_classifier.cache_hits - hits_avant}/{len(pieces)} pièce(s) en cache")
+    return resultats
+
+
+def dessiner_objets(cropped, pieces, resultats):
+    """Dessine contours, centres et labels sur `cropped` et retourne les données des objets."""
+    donnees_objets = []
+    for (cnt, cx, cy, _), (label, cluster_id) in zip(pieces, resultats):
         couleur = COULEURS_CLUSTERS[cluster_id % len(COULEURS_CLUSTERS)]
 
-        # 6. DESSIN
         cv2.drawContours(cropped, [cnt], -1, couleur, 2)
         cv2.circle(cropped, (cx, cy), 5, (0, 0, 255), -1)
         cv2.putText(cropped, f"{label}", (cx - 30, cy - 20),
@@ -221,10 +540,184 @@ def detecter_objets(frame):
             'x': cx,
             'y': cy
         })
+    return donnees_objets
+
+
+def detecter_objets(frame, facteur=FACTEUR_LOCALISATION):
+    """
+    Analyse la frame et retourne (données_objets, image_dessinée, image_debug, crop_w, crop_h).
+
+      1. Rognage
+      2. Détection de contours (localisation des pièces), sur l'image réduite si facteur > 1
+      3. Pour chaque contour : extraction du crop (toujours en pleine résolution)
+      4. Classification DINOv2 de tous les crops en un seul passage
+      5. Dessin des résultats
+    """
+
+    #Chargement paresseux du classifieur
+    _classifier.load()
+
+    #1 ROGNAGE
+    cropped = rogner(frame)
+    crop_h, crop_w = cropped.shape[:2]
+
+    #2-3 LOCALISATION (contours) ET ZONES DE CROP
+    dilated, pieces = localiser(cropped, facteur)
+
+    #4 CLASSIFICATION par DINOv2 + PCA + KMeans
+    resultats = classifier_pieces(cropped, pieces)
+
+    #5 DESSIN
+    donnees_objets = dessiner_objets(cropped, pieces, resultats)
 
     return donnees_objets, cropped, dilated, crop_w, crop_h
 
 
+class IncrementalDetector:
+    """
+    Détection incrémentale pour les re-scans.
+
+    Garde la frame rognée précédente, sa carte de contours et ses détections. À chaque nouvelle
+    frame, seules les tuiles modifiées sont re-localisées (flou + Canny + dilatation), et seules
+    les pièces dont la zone de crop a changé sont re-classifiées. Les autres gardent leur label.
+    La référence est resynchronisée par une détection complète toutes les resync_max frames, ou quand
+    la dérive sous le seuil (éclairage) dépasse derive_max.
+    """
+
+    def __init__(self, tuile=TUILE, seuil=SEUIL_CHANGEMENT, ratio_max=RATIO_TUILES_MAX,
+                 resync_max=RESYNC_MAX, derive_max=DERIVE_MAX):
+        if tuile % HALO != 0:
+            raise ValueError(f"La taille de tuile ({tuile}) doit être un multiple de HALO ({HALO})")
+        self.tuile = tuile
+        self.seuil = seuil
+        self.ratio_max = ratio_max
+        self.resync_max = resync_max
+        self.derive_max = derive_max
+        self.reset()
+
+    def reset(self):
+        #Oublie la frame précédente : la prochaine détection sera complète.
+        self.reference = None  # frame rognée de référence, sans dessin
+        self.dilated = None    # carte de contours (zones mortes exclues) de la référence
+        self.resultats = {}    # zone de crop -> (label, cluster_id) de la détection précédente
+        self.partielles = 0    # détections incrémentales depuis la dernière détection complète
+        self.stats = {}
+
+    def masque_changement(self, cropped):
+        """
+        Retourne (changement, tuiles) :
+          - changement : masque (h, w) à 255 là où un canal diffère de la référence de plus de self.seuil
+          - tuiles : booléens (n_ty, n_tx), tuiles dont la carte de contours peut avoir changé
+        """
+        h, w = cropped.shape[:2]
+        diff = cv2.split(cv2.absdiff(self.reference, cropped))
+        diff = cv2.max(cv2.max(diff[0], diff[1]), diff[2])
+        _, changement = cv2.threshold(diff, self.seuil, 255, cv2.THRESH_BINARY)
+
+        # Changement par blocs de HALO px (un bloc est modifié si un seul de ses pixels l'est),
+        # étendu d'un bloc : une modification influence la carte de contours jusqu'à HALO px autour
+        n_by, n_bx = -(-h // HALO), -(-w // HALO)
+        blocs = np.zeros((n_by * HALO, n_bx * HALO), np.uint8)
+        blocs[:h, :w] = changement
+        blocs = cv2.resize(blocs, (n_bx, n_by), interpolation=cv2.INTER_AREA) > 0
+        blocs = cv2.dilate(blocs.astype(np.uint8), np.ones((3, 3), np.uint8))
+
+        # Regroupement des blocs en tuiles
+        r = self.tuile // HALO
+        n_ty, n_tx = -(-n_by // r), -(-n_bx // r)
+        tuiles = np.zeros((n_ty * r, n_tx * r), np.uint8)
+        tuiles[:n_by, :n_bx] = blocs
+        tuiles = tuiles.reshape(n_ty, r, n_tx, r).max(axis=(1, 3)).astype(bool)
+        return changement, tuiles
+
+    def derive(self, cropped):
+        """
+        Dérive moyenne par rapport à la référence : écart moyen entre les moyennes (niveau de gris) par blocs
+        de HALO px. Le bruit capteur s'y moyenne, un décalage d'éclairage ou une ombre étendue non.
+        """
+        h, w = cropped.shape[:2]
+        taille = (max(1, w // HALO), max(1, h // HALO))
+        blocs = [cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), taille, interpolation=cv2.INTER_AREA)
+                 for image in (cropped, self.reference)]
+        return float(cv2.absdiff(*blocs).mean())
+
+    def _detection_complete(self, cropped):
+        dilated, pieces = localiser(cropped)
+        resultats = classifier_pieces(cropped, pieces)
+
+        self.reference = cropped.copy()
+        self.dilated = dilated
+        self.partielles = 0
+        self.stats = {"tuiles": -1, "reutilisees": 0, "classifiees": len(pieces)}
+        return pieces, resultats
+
+    def _detection_partielle(self, cropped, changement, tuiles):
+        crop_h, crop_w = cropped.shape[:2]
+        t = self.tuile
+
+        #1 Re-localisation des tuiles modifiées, calculée avec HALO px de contexte autour
+        for ty, tx in np.argwhere(tuiles):
+            y0, y1 = ty * t, min((ty + 1) * t, crop_h)
+            x0, x1 = tx * t, min((tx + 1) * t, crop_w)
+            wy0, wy1 = max(0, y0 - HALO), min(crop_h, y1 + HALO)
+            wx0, wx1 = max(0, x0 - HALO), min(crop_w, x1 + HALO)
+            carte = carte_contours(cropped[wy0:wy1, wx0:wx1])
+            self.dilated[y0:y1, x0:x1] = carte[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+            self.reference[y0:y1, x0:x1] = cropped[y0:y1, x0:x1]
+        exclure_zones_mortes(self.dilated)
+
+        #2 Contours sur la carte fusionnée (peu coûteux)
+        pieces = extraire_pieces(self.dilated, crop_w, crop_h)
+
+        #3 Classification des seules pièces dont la zone de crop a changé
+        resultats = [None] * len(pieces)
+        a_classer = []
+        for i, (_, _, _, rect) in enumerate(pieces):
+            x1, y1, x2, y2 = rect
+            if rect in self.resultats and not changement[y1:y2, x1:x2].any():
+                resultats[i] = self.resultats[rect]
+            else:
+                a_classer.append(i)
+
+        nouveaux = classifier_pieces(cropped, [pieces[i] for i in a_classer])
+        for i, res in zip(a_classer, nouveaux):
+            resultats[i] = res
+
+        self.partielles += 1
+        self.stats = {"tuiles": int(tuiles.sum()), "reutilisees": len(pieces) - len(a_classer),
+                      "classifiees": len(a_classer)}
+        return pieces, resultats
+
+    def detect(self, frame):
+        """Même interface et même résultat que detecter_objets(frame)."""
+        _classifier.load()
+
+        cropped = rogner(frame)
+        crop_h, crop_w = cropped.shape[:2]
+
+        if self.reference is None or self.reference.shape != cropped.shape:
+            pieces, resultats = self._detection_complete(cropped)
+        else:
+            changement, tuiles = self.masque_changement(cropped)
+            if tuiles.mean() > self.ratio_max:
+                # Trop de changements : la détection complète est plus rapide
+                pieces, resultats = self._detection_complete(cropped)
+            elif self.partielles >= self.resync_max or self.derive(cropped) > self.derive_max:
+                # Dérive sous le seuil accumulée dans les tuiles non recalculées : resynchronisation
+                print("Détection incrémentale : resynchronisation (détection complète)")
+                pieces, resultats = self._detection_complete(cropped)
+            else:
+                pieces, resultats = self._detection_partielle(cropped, changement, tuiles)
+
+        self.resultats = {rect: res for (_, _, _, rect), res in zip(pieces, resultats)}
+        if self.stats["tuiles"] >= 0:
+            print(f"Détection incrémentale : {self.stats['tuiles']}/{tuiles.size} tuile(s) recalculée(s), "
+                  f"{self.stats['reutilisees']} pièce(s) réutilisée(s)")
+
+        donnees_objets = dessiner_objets(cropped, pieces, resultats)
+        return donnees_objets, cropped, self.dilated.copy(), crop_w, crop_h
+
+
 if __name__ == "__main__":
     cap = cv2.VideoCapture(GST_PIPELINE, cv2.CAP_GSTREAMER) # prend photo
 
@@ -0,0 +1,88 @@
+"""
+Évaluation du mode d'inférence int8 de DINOv2 face au fp32.
+
+Chaque mode tourne dans son propre processus pour que le pic de mémoire (RSS) soit mesuré
+séparément. Sur les images de dataset_edge, le script rapporte :
+  - l'accord des clusters entre fp32 et int8
+  - la latence par crop (lot complet et crop seul)
+  - le pic de RSS du processus
+
+À lancer depuis la racine du projet :
+    python -m src.eval_quantization
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+import tempfile
+import cv2
+import numpy as np
+
+from .detection import Classifier
+from .benchmark import lister_images
+
+
+N_CROPS_SEULS = 20 # crops classifiés un par un pour la latence hors lot
+MODES = {"fp32": False, "int8": True}
+
+
+def evaluer_mode(quantize, sortie):
+    classifier = Classifier(cache_max=0, quantize=quantize)
+    classifier.load()
+    crops = [cv2.imread(f) for f in lister_images()]
+
+    classifier.classify_crops(crops[:1])  # préchauffage
+
+    t0 = time.perf_counter()
+    resultats = classifier.classify_crops(crops)
+    t_lot = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for crop in crops[:N_CROPS_SEULS]:
+        classifier.classify_crop(crop)
+    t_seul = time.perf_counter() - t0
+
+    with open(sortie, "w") as f:
+        json.dump({
+            "clusters": [c for _, c in resultats],
+            "ms_par_crop_lot": t_lot / len(crops) * 1000,
+            "ms_par_crop_seul": t_seul / min(N_CROPS_SEULS, len(crops)) * 1000,
+            "rss_max_mo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # ko sous Linux
+        }, f)
+
+
+def main():
+    mesures = {}
+    with tempfile.TemporaryDirectory() as dossier:
+        for mode in MODES:
+            sortie = os.path.join(dossier, f"{mode}.json")
+            subprocess.run([sys.executable, "-m", "src.eval_quantization", "--mode", mode, "--sortie", sortie],
+                           check=True)
+            with open(sortie) as f:
+                mesures[mode] = json.load(f)
+
+    ref, q = mesures["fp32"], mesures["int8"]
+    accord = np.mean(np.array(ref["clusters"]) == np.array(q["clusters"]))
+
+    print(f"\n{len(ref['clusters'])} images de dataset_edge")
+    print(f"{'mode':>6} | {'ms/crop (lot)':>13} | {'ms/crop (seul)':>14} | {'RSS max (Mo)':>12}")
+    for mode, m in mesures.items():
+        print(f"{mode:>6} | {m['ms_par_crop_lot']:>13.1f} | {m['ms_par_crop_seul']:>14.1f} | {m['rss_max_mo']:>12.0f}")
+    print(f"Accord des clusters fp32 / int8 : {accord:.1%}")
+    print(f"Accélération (lot) : {ref['ms_par_crop_lot'] / q['ms_par_crop_lot']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=list(MODES), help="évalue un seul mode (processus enfant)")
+    parser.add_argument("--sortie", help="fichier JSON des mesures du mode évalué")
+    args = parser.parse_args()
+
+    if args.mode:
+        evaluer_mode(MODES[args.mode], args.sortie)
+    else:
+        main()
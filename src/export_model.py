@@ -0,0 +1,153 @@
+"""
+Export de DINOv2 en artefact TorchScript figé, chargeable sans réseau.
+
+torch.hub.load reconstruit le modèle depuis le code Python du dépôt facebookresearch/dinov2
+(réseau ou cache hub nécessaire) à chaque démarrage. Ce script le fait une seule fois :
+  1. Charge dinov2_vits14 depuis torch.hub (et le quantifie en int8 avec --int8)
+  2. Le trace avec une entrée 224x224 puis le fige (torch.jit.freeze : poids inclus)
+  3. Vérifie que l'artefact donne les mêmes features que le modèle d'origine
+  4. Sauvegarde models/dinov2_vits14.pt (models/dinov2_vits14_int8.pt avec --int8)
+
+À lancer une fois, depuis la racine du projet, sur une machine avec accès réseau :
+    python src/export_model.py          # modèle fp32
+    python src/export_model.py --int8   # modèle quantifié int8 (mode d'inférence CPU optionnel)
+    python src/export_model.py --patch  # tokens de patchs sur des tuiles de plateau (extraction "plateau")
+Les options peuvent être combinées.
+"""
+
+import os
+import sys
+import time
+import platform
+import torch
+
+
+MODEL_DIR = "models"
+DINOV2_PATH = os.path.join(MODEL_DIR, "dinov2_vits14.pt")
+DINOV2_INT8_PATH = os.path.join(MODEL_DIR, "dinov2_vits14_int8.pt")
+HUB_REPO, HUB_MODEL = 'facebookresearch/dinov2', 'dinov2_vits14'
+TAILLE_ENTREE = 224
+TUILE_PLATEAU = 518 # tuiles du plateau entier pour l'extraction "plateau" (37 x 37 patchs de 14 px)
+TAILLES_LOT_VERIF = (1, 16) # tailles de lot vérifiées après export
+
+
+class PatchTokens(torch.nn.Module):
+    """DINOv2 réduit à sa sortie 'x_norm_patchtokens' : (lot, n_patchs, 384), un token par patch 14x14."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model.forward_features(x)["x_norm_patchtokens"]
+
+
+def chemin_artefact(quantize=False, patch_tokens=False):
+    nom = "dinov2_vits14" + ("_patch" if patch_tokens else "") + ("_int8" if quantize else "")
+    return os.path.join(MODEL_DIR, nom + ".pt")
+
+
+def choisir_moteur_int8():
+    # Sur le Pi (ARM), les noyaux int8 sont ceux de QNNPACK ; sur x86 on garde le moteur par défaut
+    if platform.machine() in ("aarch64", "arm64", "armv7l") and "qnnpack" in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = "qnnpack"
+
+
+def quantifier(model):
+    """Quantification dynamique int8 des couches linéaires : poids int8, activations quantifiées à la volée."""
+    choisir_moteur_int8()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_dinov2(device="cpu", quantize=False, chemin=None, patch_tokens=False):
+    """
+    Charge DINOv2 en mode évaluation.
+    Utilise l'artefact exporté s'il existe (aucun accès réseau), sinon torch.hub.
+    Avec quantize=True, le modèle int8 (CPU uniquement) est utilisé à la place du modèle fp32.
+    Avec patch_tokens=True, le modèle rend les tokens de patchs (PatchTokens) au lieu du token CLS.
+    """
+    chemin = chemin or chemin_artefact(quantize, patch_tokens)
+    if quantize:
+        device = "cpu"
+        choisir_moteur_int8()
+
+    if os.path.exists(chemin):
+        print(f"Chargement de DINOv2 exporté ({chemin})...")
+        model = torch.jit.load(chemin, map_location=device)
+    else:
+        print("Chargement de DINOv2 (torch.hub)...")
+        model = torch.hub.load(HUB_REPO, HUB_MODEL)
+        model.eval()
+        if quantize:
+            model = quantifier(model)
+        if patch_tokens:
+            model = PatchTokens(model)
+        model.to(device)
+    model.eval()
+    return model
+
+
+def exporter(quantize=False, chemin=None, patch_tokens=False):
+    chemin = chemin or chemin_artefact(quantize, patch_tokens)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    taille = TUILE_PLATEAU if patch_tokens else TAILLE_ENTREE
+
+    #1 Modèle d'origine (quantifié si demandé)
+    model = torch.hub.load(HUB_REPO, HUB_MODEL)
+    model.eval()
+    if quantize:
+        model = quantifier(model)
+    if patch_tokens:
+        model = PatchTokens(model).eval()
+
+    #2 Trace + gel (les poids deviennent des constantes du graphe), à la taille d'entrée utilisée
+    exemple = torch.randn(2, 3, taille, taille)
+    with torch.no_grad():
+        trace = torch.jit.trace(model, exemple)
+    fige = torch.jit.freeze(trace)
+
+    #3 Vérification sur plusieurs tailles de lot (le lot varie avec le nombre de pièces)
+    for n in TAILLES_LOT_VERIF:
+        x = torch.randn(n, 3, taille, taille)
+        with torch.no_grad():
+            ecart = (model(x) - fige(x)).abs().max().item()
+        print(f"Lot de {n} : écart max {ecart:.2e}")
+        if ecart > 1e-3:
+            raise RuntimeError(f"L'artefact exporté diverge du modèle d'origine (écart {ecart:.2e})")
+
+    #4 Sauvegarde
+    torch.jit.save(fige, chemin)
+    print(f"Modèle exporté dans '{chemin}' ({os.path.getsize(chemin) / 1e6:.1f} Mo)")
+
+
+def mesurer_demarrage(chemin=DINOV2_PATH, quantize=False):
+    """Compare le temps de chargement torch.hub et artefact exporté, suivis d'une première inférence."""
+    x = torch.randn(1, 3, TAILLE_ENTREE, TAILLE_ENTREE)
+
+    def chrono(charger):
+        t0 = time.perf_counter()
+        model = charger()
+        t_charge = time.perf_counter() - t0
+        with torch.no_grad():
+            model(x)
+        return t_charge, time.perf_counter() - t0
+
+    try:
+        t_hub = chrono(lambda: torch.hub.load(HUB_REPO, HUB_MODEL).eval())
+        print(f"torch.hub   : chargement {t_hub[0]:.2f} s, prêt après 1re inférence {t_hub[1]:.2f} s")
+    except Exception as e:
+        print(f"torch.hub   : indisponible ({e})")
+
+    if os.path.exists(chemin):
+        t_jit = chrono(lambda: load_dinov2(quantize=quantize, chemin=chemin))
+        print(f"Artefact    : chargement {t_jit[0]:.2f} s, prêt après 1re inférence {t_jit[1]:.2f} s")
+    else:
+        print(f"Artefact    : '{chemin}' absent, lancez d'abord l'export")
+
+
+if __name__ == "__main__":
+    quantize = "--int8" in sys.argv[1:]
+    patch_tokens = "--patch" in sys.argv[1:]
+    exporter(quantize=quantize, patch_tokens=patch_tokens)
+    if not patch_tokens:
+        mesurer_demarrage(chemin_artefact(quantize), quantize=quantize)
@@ -0,0 +1,345 @@
+"""
+Imprimante simulée derrière un faux port série, pour vérifier TronxyController sans matériel.
+
+FakePrinter imite le protocole de Marlin : lignes "N<n> <commande>*<checksum>", "Error" + "Resend: n" + "ok"
+sur une ligne corrompue ou hors séquence, "ok" après chaque ligne acceptée. Des pannes peuvent être injectées :
+  - lignes perdues ou corrompues entre l'hôte et l'imprimante
+  - réponses "ok" perdues entre l'imprimante et l'hôte, ou retardées (au-delà du silence qui déclenche la sonde)
+  - lignes numérotées données corrompues une fois (corrompre), ou dont le "ok" part en retard (retarder)
+M400 peut aussi durer busy_s secondes, avec un keepalive "echo:busy: processing" toutes les KEEPALIVE_S.
+Les mouvements (G90/G91/G92/G28/G0/G1) sont interprétés : trajet et feedrate de chaque segment.
+
+À lancer depuis la racine du projet :
+    python -m src.fake_printer   # vérifie send_batch (lien propre puis avec pannes), les keepalives et le filtre modal
+"""
+
+import time
+import random
+from collections import deque
+
+import numpy as np
+
+from .tronxy_control import TronxyController, EtatModal
+
+
+N_LOTS = 20
+TAILLE_LOT = 9 # lignes par lot (un déplacement de pièce)
+SILENCE_S = 0.3 # les mouvements simulés sont instantanés : sonde après un silence court
+RETARD_OK_S = 0.5 # "ok" en retard (> SILENCE_S) : les réponses suivantes attendent derrière lui
+BUSY_CONTROLE_S = 0.2 # M400 envoyé après les lots : acquitté par son propre "ok", pas par un "ok" en retard
+KEEPALIVE_S = 0.5 # intervalle des "busy: processing" pendant un M400 simulé
+N_SEQUENCES_MODALES = 200 # séquences aléatoires passées au filtre modal
+SCENARIOS = {
+    "lien propre": {},
+    "lignes corrompues (5 %)": {"corruption": 0.05},
+    "lignes perdues (5 %)": {"perte": 0.05},
+    "ok perdus (5 %)": {"perte_ok": 0.05},
+    "ok en retard (5 %)": {"retard_ok": 0.05},
+    "tout (3 % chacun)": {"corruption": 0.03, "perte": 0.03, "perte_ok": 0.03},
+}
+
+
+class FakePrinter:
+    """Faux port série (mêmes attributs que serial.Serial utilisés par TronxyController)."""
+
+    def __init__(self, perte=0.0, corruption=0.0, perte_ok=0.0, delai_s=0.001, busy_s=0.0, timeout=0.05, seed=0,
+                 corrompre=(), retard_ok=0.0, retarder=()):
+        self.perte = perte
+        self.corruption = corruption
+        self.retard_ok = retard_ok
+        self.retarder = set(retarder) # numéros de ligne dont le "ok" part en retard
+        self.corrompre = set(corrompre) # numéros de ligne corrompus à leur premier envoi
+        self.perte_ok = perte_ok
+        self.busy_s = busy_s # durée d'un M400
+        self.delai_s = delai_s # temps de réponse du firmware
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.is_open = True
+        self.derniere_ligne = 0
+        self.executees = [] # commandes acceptées, dans l'ordre d'exécution
+        self.absolu = True
+        self.feedrate = 1500.0
+        self.position = np.zeros(3)
+        self.segments = [] # (départ, arrivée, feedrate) de chaque mouvement non nul
+        self.sortie = deque() # (instant de disponibilité, réponse)
+        self.tampon = b""
+
+    @property
+    def in_waiting(self):
+        return sum(len(r) for t, r in self.sortie if t <= time.perf_counter())
+
+    def write(self, data):
+        self.tampon += data
+        while b"\n" in self.tampon:
+            ligne, self.tampon = self.tampon.split(b"\n", 1)
+            self._recevoir(ligne.decode())
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        fin = time.perf_counter() + self.timeout
+        while not self.sortie or self.sortie[0][0] > time.perf_counter():
+            if time.perf_counter() > fin:
+                return b""
+            time.sleep(0.0005)
+        return self.sortie.popleft()[1]
+
+    def close(self):
+        self.is_open = False
+
+    def _repondre(self, *reponses):
+        t = time.perf_counter() + self.delai_s
+        for r in reponses:
+            self.sortie.append((t, (r + "\n").encode()))
+
+    def _recevoir(self, ligne):
+        numerotee = ligne.startswith("N")
+        if numerotee and self.rng.random() < self.perte:
+            return
+        if numerotee and self.rng.random() < self.corruption:
+            i = self.rng.randrange(len(ligne))
+            ligne = ligne[:i] + chr(ord(ligne[i]) ^ 0x04) + ligne[i + 1:]
+        elif numerotee and ligne.split()[0][1:] in {str(n) for n in self.corrompre}:
+            self.corrompre.discard(int(ligne.split()[0][1:]))
+            ligne = ligne[:-1] + chr(ord(ligne[-1]) ^ 0x04) # checksum faux
+
+        if not numerotee:
+            if ligne.startswith("M114"): # requête : position puis "ok", rien d'exécuté
+                x, y, z = self.position
+                return self._repondre(f"X:{x:.2f} Y:{y:.2f} Z:{z:.2f} E:0.00 Count X:0 Y:0 Z:0", "ok")
+            if ligne.startswith("M110"):
+                self.derniere_ligne = int(ligne.split("N")[1])
+            else:
+                self._executer(ligne.strip())
+            if ligne.startswith("M400") and self.busy_s > 0:
+                t = time.perf_counter()
+                for k in range(1, int(self.busy_s / KEEPALIVE_S) + 1):
+                    self.sortie.append((t + k * KEEPALIVE_S, b"echo:busy: processing\n"))
+                self.sortie.append((t + self.busy_s, b"ok\n"))
+                return
+            self._repondre("ok")
+            return
+
+        #1 Checksum puis numéro de ligne, comme Marlin
+        contenu, _, checksum = ligne.partition("*")
+        attendu = 0
+        for octet in contenu.encode():
+            attendu ^= octet
+        if not checksum.isdigit() or int(checksum) != attendu:
+            return self._erreur("checksum mismatch")
+        numero, _, commande = contenu.partition(" ")
+        if not numero[1:].isdigit() or int(numero[1:]) != self.derniere_ligne + 1:
+            return self._erreur("Line Number is not Last Line Number+1")
+
+        #2 Ligne acceptée
+        self.derniere_ligne += 1
+        self._executer(commande.strip())
+        if self.rng.random() < self.perte_ok:
+            return
+        if self.rng.random() < self.retard_ok or self.derniere_ligne in self.retarder:
+            self.retarder.discard(self.derniere_ligne)
+            self.sortie.append((time.perf_counter() + RETARD_OK_S, b"ok\n"))
+            return
+        self._repondre("ok")
+
+    def _executer(self, commande):
+        self.executees.append(commande)
+        mots = commande.split()
+        code, valeurs = mots[0], {m[0]: float(m[1:]) for m in mots[1:]}
+        if code in ("G90", "G91"):
+            self.absolu = code == "G90"
+        elif code == "G28":
+            self.position = np.zeros(3)
+        elif code == "G92": # nouvelle origine (nouveau tableau : les segments gardent l'ancien)
+            self.position = np.array([valeurs.get(axe, v) for axe, v in zip("XYZ", self.position)])
+        elif code in ("G0", "G1"):
+            self.feedrate = valeurs.get("F", self.feedrate)
+            arrivee = self.position.copy()
+            for i, axe in enumerate("XYZ"):
+                if axe in valeurs:
+                    arrivee[i] = valeurs[axe] if self.absolu else arrivee[i] + valeurs[axe]
+            if np.abs(arrivee - self.position).max() > 1e-6:
+                self.segments.append((self.position, arrivee, self.feedrate))
+            self.position = arrivee
+
+    def trajet(self):
+        """Segments fusionnés quand ils prolongent le précédent (même direction, même feedrate)."""
+        fusionnes = []
+        for depart, arrivee, f in self.segments:
+            if fusionnes:
+                d0, a0, f0 = fusionnes[-1]
+                u, v = a0 - d0, arrivee - depart
+                if f == f0 and np.linalg.norm(np.cross(u, v)) < 1e-6 and u @ v > 0:
+                    fusionnes[-1] = (d0, arrivee, f)
+                    continue
+            fusionnes.append((depart, arrivee, f))
+        return fusionnes
+
+    def _erreur(self, message):
+        self._repondre(f"Error:{message}, Last Line: {self.derniere_ligne}",
+                       f"Resend: {self.derniere_ligne + 1}", "ok")
+
+
+def verifier_send_batch(nom, seed=0, **pannes):
+    """Envoie N_LOTS lots sur une FakePrinter : chaque commande doit être exécutée une fois, dans l'ordre."""
+    controller = TronxyController(silence_s=SILENCE_S)
+    controller.ser = FakePrinter(seed=seed, **pannes)
+    controller.demarrer_lecture()
+    rng = random.Random(seed)
+    commandes = [f"G1 X{rng.randint(0, 320)} Y{rng.randint(0, 320)} F6000" for _ in range(N_LOTS * TAILLE_LOT)]
+
+    attendues, etat = [], EtatModal() # send_batch passe chaque lot par le filtre modal
+    for i in range(0, len(commandes), TAILLE_LOT):
+        attendues += etat.filtrer(commandes[i:i + TAILLE_LOT])
+        assert controller.send_batch(commandes[i:i + TAILLE_LOT]), f"{nom} : lot {i // TAILLE_LOT} non acquitté"
+    assert controller.ser.executees == attendues, f"{nom} : commandes exécutées différentes des commandes envoyées"
+
+    # Comptage des "ok" toujours juste : le M400 suivant n'est acquitté que par sa propre réponse
+    controller.ser.busy_s = BUSY_CONTROLE_S
+    t0 = time.perf_counter()
+    assert controller.send_command("M400", timeout_s=5), f"{nom} : M400 non acquitté"
+    assert time.perf_counter() - t0 >= BUSY_CONTROLE_S, f"{nom} : M400 acquitté par le \"ok\" d'une autre ligne"
+    controller.disconnect()
+    assert controller.ok_sans_attente == 0, f"{nom} : {controller.ok_sans_attente} \"ok\" sans commande en attente"
+
+    durees = sorted(d for _, d, _ in controller.latences_lots)
+    renvois = sum(r for _, _, r in controller.latences_lots)
+    return durees[len(durees) // 2], durees[-1], renvois, controller
+
+
+def verifier_derniere_ligne(panne, seed=0):
+    """
+    Panne sur la dernière ligne du dernier lot, juste avant un M400 :
+      - "corrompre" : "Error" + "Resend" + "ok", et ce "ok" résout la dernière attente ; send_batch doit quand même
+        lire la demande de renvoi et faire exécuter la ligne
+      - "retarder" : son "ok" arrive après la sonde de silence ; il ne doit acquitter ni la sonde ni le M400
+    """
+    rng = random.Random(seed)
+    commandes = [f"G1 X{rng.randint(0, 320)} Y{rng.randint(0, 320)} F6000" for _ in range(N_LOTS * TAILLE_LOT)]
+    attendues, etat = [], EtatModal()
+    for i in range(0, len(commandes), TAILLE_LOT):
+        attendues += etat.filtrer(commandes[i:i + TAILLE_LOT])
+
+    controller = TronxyController(silence_s=SILENCE_S)
+    controller.ser = FakePrinter(seed=seed, **{panne: [len(attendues)]}) # lignes numérotées à partir de 1
+    controller.demarrer_lecture()
+    for i in range(0, len(commandes), TAILLE_LOT):
+        assert controller.send_batch(commandes[i:i + TAILLE_LOT]), f"{panne} : lot {i // TAILLE_LOT} non acquitté"
+    assert controller.ser.executees == attendues, f"{panne} : dernière ligne jamais exécutée"
+    assert controller.latences_lots[-1][2] == 1, f"{panne} : renvoi de la dernière ligne non compté"
+
+    controller.ser.busy_s = BUSY_CONTROLE_S
+    t0 = time.perf_counter()
+    assert controller.send_command("M400", timeout_s=5), f"{panne} : M400 non acquitté"
+    assert time.perf_counter() - t0 >= BUSY_CONTROLE_S, f"{panne} : M400 acquitté par le \"ok\" d'une autre ligne"
+    controller.disconnect()
+    assert controller.ok_sans_attente == 0, f"{panne} : {controller.ok_sans_attente} \"ok\" sans commande en attente"
+
+
+def verifier_keepalive(busy_s=2.0, timeout_s=1.0):
+    """Un M400 plus long que timeout_s aboutit tant que le firmware envoie des "busy: processing"."""
+    controller = TronxyController(silence_s=SILENCE_S)
+    controller.ser = FakePrinter(busy_s=busy_s)
+    controller.demarrer_lecture()
+    t0 = time.perf_counter()
+    assert controller.send_command("M400", timeout_s=timeout_s), "M400 abandonné malgré les keepalives"
+    duree = time.perf_counter() - t0
+    assert duree >= busy_s, "M400 acquitté avant le ok du firmware"
+    controller.disconnect()
+    return duree
+
+
+def sequence_aleatoire(rng, n=40):
+    """Commandes de mouvement avec beaucoup de répétitions (modes, F, cibles) comme dans la boucle de tri."""
+    commandes = ["G28"]
+    for _ in range(n):
+        tirage = rng.random()
+        if tirage < 0.2:
+            commandes.append(rng.choice(["G90", "G91"]))
+        elif tirage < 0.25:
+            commandes.append(f"G92 X{rng.choice([0, 10])}")
+        else:
+            axes = rng.sample("XYZ", rng.randint(1, 3))
+            mots = [f"{a}{rng.choice([0, 0, 5, 15, 300, 315])}" for a in axes]
+            if rng.random() < 0.7:
+                mots.append(f"F{rng.choice([1500, 6000])}")
+            commandes.append("G1 " + " ".join(mots))
+    return commandes
+
+
+def verifier_etat_modal(seed=0):
+    """
+    Chaque séquence aléatoire, filtrée ou non, doit donner le même trajet (segments fusionnés compris),
+    les mêmes feedrates et le même état final. Retourne (commandes, octets) avant / après filtrage.
+    """
+    rng = random.Random(seed)
+    avant, apres = [0, 0], [0, 0]
+    for _ in range(N_SEQUENCES_MODALES):
+        commandes = sequence_aleatoire(rng)
+        filtrees = EtatModal().filtrer(commandes)
+        brut, filtre = FakePrinter(), FakePrinter()
+        for c in commandes:
+            brut.write((c + "\n").encode())
+        for c in filtrees:
+            filtre.write((c + "\n").encode())
+
+        for (d0, a0, f0), (d1, a1, f1) in zip(brut.trajet(), filtre.trajet()):
+            assert np.allclose(d0, d1) and np.allclose(a0, a1) and f0 == f1, f"trajets différents : {commandes}"
+        assert len(brut.trajet()) == len(filtre.trajet()), f"trajets différents : {commandes}"
+        assert np.allclose(brut.position, filtre.position) and brut.absolu == filtre.absolu, \
+            f"états finaux différents : {commandes}"
+        avant[0] += len(commandes)
+        avant[1] += sum(len(c) + 1 for c in commandes)
+        apres[0] += len(filtrees)
+        apres[1] += sum(len(c) + 1 for c in filtrees)
+    return avant, apres
+
+
+CAS_LIMITES_MODAUX = [ # commandes -> commandes émises par le filtre modal
+    (["G90", "G1 X10 F3000 ; approche"], ["G90", "G1 X10 F3000"]), # commentaire retiré
+    (["G90", "G1 X10 F3000", "N12 G1 X10*97", "G1 X10"], # ligne numérotée transmise, état oublié
+     ["G90", "G1 X10 F3000", "N12 G1 X10*97", "G1 X10"]),
+    (["G90", "G1 X10 F3000", "G1 X10 F1500", "N3 M105*1", "G1 X20"], # F en attente envoyé avant l'état oublié
+     ["G90", "G1 X10 F3000", "G1 F1500", "N3 M105*1", "G1 X20"]),
+    (["G28 X", "G90", "G1 X0"], ["G28 X", "G90", "G1 X0"]), # paramètre sans valeur
+    (["G90", "G1 X0 F1500", "G1 X", "G1 X0"], ["G90", "G1 X0 F1500", "G1 X", "G1 X0"]), # axe sans valeur : inconnu
+    (["G92 X", "G90", "G1 X0"], ["G92 X", "G90", "G1 X0"]),
+    (["G90", "G1 X10 F3000", "G1 E5"], ["G90", "G1 X10 F3000", "G1 E5"]), # E seul : change l'état de l'imprimante
+    (["G90", "G1 X10 F3000", "G1 F1500", "G1 F1500", "G1 X20"], ["G90", "G1 X10 F3000", "G1 F1500", "G1 X20"]), # F seul
+    (["; commentaire seul"], ["; commentaire seul"]),
+]
+
+
+def verifier_cas_limites():
+    """Lignes que le filtre modal ne sait pas (ou pas entièrement) interpréter : ni exception, ni commande perdue."""
+    for commandes, attendues in CAS_LIMITES_MODAUX:
+        emises = EtatModal().filtrer(commandes)
+        assert emises == attendues, f"{commandes} : {emises} au lieu de {attendues}"
+
+
+if __name__ == "__main__":
+    import contextlib, io
+    resultats = {}
+    for nom, pannes in SCENARIOS.items():
+        with contextlib.redirect_stdout(io.StringIO()): # SND/RCV de chaque ligne
+            resultats[nom] = verifier_send_batch(nom, **pannes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        verifier_derniere_ligne("corrompre")
+        verifier_derniere_ligne("retarder")
+        duree_m400 = verifier_keepalive()
+    avant, apres = verifier_etat_modal()
+    verifier_cas_limites()
+
+    print(f"{N_LOTS} lots de {TAILLE_LOT} lignes, toutes exécutées une seule fois et dans l'ordre")
+    print(f"{'scénario':>24} | {'médiane (ms)':>12} | {'max (ms)':>9} | {'lignes renvoyées':>16}")
+    for nom, (mediane, maxi, renvois, _) in resultats.items():
+        print(f"{nom:>24} | {mediane * 1000:>12.1f} | {maxi * 1000:>9.1f} | {renvois:>16}")
+    print("Dernière ligne du dernier lot corrompue : renvoyée et exécutée ; \"ok\" en retard : M400 acquitté par le sien")
+    print(f"M400 de {duree_m400:.1f} s acquitté avec un timeout de 1 s, prolongé par les keepalives")
+    print(f"Filtre modal ({N_SEQUENCES_MODALES} séquences, trajets identiques) : {avant[0]} -> {apres[0]} commandes, "
+          f"{avant[1]} -> {apres[1]} octets")
+    print(f"Filtre modal : {len(CAS_LIMITES_MODAUX)} cas limites (commentaires, lignes numérotées, mots sans valeur, E ou F seul) OK")
+    print("\nLatence aller-retour par commande (lien propre) :")
+    resultats["lien propre"][3].rapport_latences()
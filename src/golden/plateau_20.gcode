@@ -0,0 +1,152 @@
+G90
+G1 X273.9 Y85.6 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X253.1 Y56.5 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X240 Y28.7 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y270 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X237 Y37.8 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y120 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X231.2 Y79.1 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y270 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X223.2 Y50 Z15 F6000
+G1 Z2 F1500
+G1 X315 F6000
+G1 X217.5 Y208.2 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X192.3 Y273.2 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X189.5 Y297.5 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y270 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X174.8 Y32.4 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X164.2 Y253.4 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y120 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X155.9 Y111.4 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X130.6 Y244.3 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X126.1 Y25.6 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X118.3 Y173.9 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X115.8 Y277.6 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X54.4 Y200 Z15 F6000
+G1 Z2 F1500
+G1 X315 F6000
+G1 X50.4 Y47.3 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X31.6 Y208 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X18.4 Y38.3 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 Z15 F1500
@@ -0,0 +1,21 @@
+G90
+G1 X184.4 Y145.9 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y270 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X31.4 Y244.6 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X22.4 Y200 Z15 F6000
+G1 Z2 F1500
+G1 X315 F6000
+G1 Z15 F1500
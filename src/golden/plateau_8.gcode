@@ -0,0 +1,56 @@
+G90
+G1 X257.3 Y121.9 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y270 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X238.7 Y245 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X108.9 Y270 Z15 F6000
+G1 Z2 F1500
+G1 X315 F6000
+G1 X95.1 Y207.5 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X84.7 Y144.6 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y120 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X57.8 Y267.5 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y50 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X56.2 Y182.7 Z15 F6000
+G1 Z2 F1500
+G1 X300 F6000
+G1 Y200 F6000
+G1 X315 F6000
+G1 X295 Z15 F1500
+G1 Z2 F1500
+G1 X315 F6000
+G1 X21.2 Y200 Z15 F6000
+G1 Z2 F1500
+G1 X315 F6000
+G1 Z15 F1500
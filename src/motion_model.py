@@ -0,0 +1,236 @@
+"""
+Modèle cinématique de l'imprimante : durée estimée d'une séquence G-code.
+
+Chaque G1 est un segment à profil de vitesse trapézoïdal (accélération, palier, décélération), limité par
+axe comme dans le planificateur de Marlin :
+  - vitesse max par axe (M203) et accélération max par axe (M201)
+  - accélération des déplacements sans extrusion (M204 T)
+  - vitesse de passage d'un segment au suivant par "junction deviation" (arrêt complet sur un demi-tour)
+M400, G4 et G28 arrêtent la tête (fin de bloc). Les valeurs par défaut sont celles du firmware Tronxy ;
+celles de la machine se lisent avec M503 (MotionModel.depuis_m503).
+
+Utilisé pour les timeouts adaptatifs (TronxyController) et comme coût d'ordonnancement (piece_priority).
+
+À lancer depuis la racine du projet :
+    python -m src.motion_model                     # contrôles sur des profils calculables à la main
+    python -m src.motion_model mesures/reference_mouvements.json    # + comparaison à un run de référence enregistré
+
+Calibrage en attente : aucun run de référence mesuré sur la machine n'est encore dans le dépôt. Les constantes
+ci-dessous sont les valeurs par défaut du firmware, seuls les profils calculables à la main sont vérifiés ; les
+timeouts gardent donc la marge MARGE_TIMEOUT tant que verifier_reference n'a pas été passé sur un vrai run.
+"""
+
+import sys
+import json
+import math
+
+
+ACCEL_MAX = {"X": 1000.0, "Y": 1000.0, "Z": 100.0} # M201 (mm/s²)
+VITESSE_MAX = {"X": 200.0, "Y": 200.0, "Z": 10.0} # M203 (mm/s)
+ACCEL_DEPLACEMENT = 1000.0 # M204 T (mm/s²), les mouvements de tri n'extrudent pas
+JUNCTION_DEVIATION = 0.013 # mm
+VITESSE_HOMING = {"X": 50.0, "Y": 50.0, "Z": 4.0} # mm/s
+COURSE = {"X": 330.0, "Y": 330.0, "Z": 400.0} # distance supposée quand la position de départ est inconnue
+FEEDRATE_DEFAUT = 25.0 # mm/s avant le premier mot F
+
+MARGE_TIMEOUT = 1.5 # timeout = MARGE_TIMEOUT * durée estimée + TIMEOUT_MIN_S
+TIMEOUT_MIN_S = 5.0
+ECART_REFERENCE_MAX = 0.15 # écart relatif toléré entre estimation et durée mesurée sur un run de référence
+
+
+class MotionModel:
+    def __init__(self, accel_max=None, vitesse_max=None, accel_deplacement=ACCEL_DEPLACEMENT,
+                 junction_deviation=JUNCTION_DEVIATION):
+        self.accel_max = dict(accel_max or ACCEL_MAX)
+        self.vitesse_max = dict(vitesse_max or VITESSE_MAX)
+        self.accel_deplacement = accel_deplacement
+        self.junction_deviation = junction_deviation
+
+    @classmethod
+    def depuis_m503(cls, texte):
+        """Modèle à partir de la réponse de M503 (lignes "M201 X.. Y.. Z..", "M203 ...", "M204 P.. T..", "M205 J..")."""
+        modele = cls()
+        for ligne in texte.splitlines():
+            mots = ligne.replace("echo:", "").split()
+            if not mots:
+                continue
+            valeurs = {}
+            for mot in mots[1:]:
+                try:
+                    valeurs[mot[0].upper()] = float(mot[1:])
+                except ValueError:
+                    pass
+            if mots[0] == "M201":
+                modele.accel_max.update({a: v for a, v in valeurs.items() if a in ACCEL_MAX})
+            elif mots[0] == "M203":
+                modele.vitesse_max.update({a: v for a, v in valeurs.items() if a in VITESSE_MAX})
+            elif mots[0] == "M204" and "T" in valeurs:
+                modele.accel_deplacement = valeurs["T"]
+            elif mots[0] == "M205" and "J" in valeurs:
+                modele.junction_deviation = valeurs["J"]
+        return modele
+
+    def blocs(self, commands, depart=None):
+        """
+        Découpe la séquence en blocs parcourus sans arrêt : listes de segments (longueur, direction, v_max, accel).
+        Retourne (blocs, durée fixe en s des G4 et G28).
+        """
+        position = {axe: (depart or {}).get(axe) for axe in COURSE}
+        absolu, feedrate = True, FEEDRATE_DEFAUT
+        blocs, courant, fixe = [], [], 0.0
+
+        def arret():
+            nonlocal courant
+            if courant:
+                blocs.append(courant)
+            courant = []
+
+        for command in commands:
+            mots = command.split()
+            if not mots:
+                continue
+            code = mots[0].upper()
+            valeurs = {}
+            for mot in mots[1:]:
+                try:
+                    valeurs[mot[0].upper()] = float(mot[1:])
+                except ValueError:
+                    pass
+
+            if code in ("G90", "G91"):
+                absolu = code == "G90"
+            elif code == "G92":
+                position.update({a: v for a, v in valeurs.items() if a in COURSE})
+            elif code in ("M400", "G4"):
+                arret()
+                fixe += valeurs.get("P", 0.0) / 1000 + valeurs.get("S", 0.0) if code == "G4" else 0.0
+            elif code == "G28":
+                arret()
+                axes = [a for a in COURSE if a in valeurs] or list(COURSE)
+                fixe += max((position[a] if position[a] is not None else COURSE[a]) / VITESSE_HOMING[a] for a in axes)
+                position.update(dict.fromkeys(axes, 0.0))
+            elif code in ("G0", "G1"):
+                feedrate = valeurs.get("F", feedrate * 60) / 60
+                delta = {}
+                for axe in COURSE:
+                    if axe not in valeurs:
+                        continue
+                    if not absolu:
+                        delta[axe] = valeurs[axe]
+                        if position[axe] is not None:
+                            position[axe] += valeurs[axe]
+                    elif position[axe] is not None:
+                        delta[axe] = valeurs[axe] - position[axe]
+                        position[axe] = valeurs[axe]
+                    else: # départ inconnu : pire cas sur la course de l'axe
+                        delta[axe] = max(valeurs[axe], COURSE[axe] - valeurs[axe])
+                        position[axe] = valeurs[axe]
+                longueur = math.sqrt(sum(d * d for d in delta.values()))
+                if longueur < 1e-9:
+                    continue
+                direction = {a: d / longueur for a, d in delta.items()}
+                v_max = min([feedrate] + [self.vitesse_max[a] / abs(u) for a, u in direction.items() if u])
+                accel = min([self.accel_deplacement] + [self.accel_max[a] / abs(u) for a, u in direction.items() if u])
+                courant.append((longueur, direction, v_max, accel))
+        arret()
+        return blocs, fixe
+
+    def vitesse_jonction(self, precedent, suivant):
+        # Junction deviation (Marlin) : vitesse max de passage d'un segment à l'autre selon l'angle
+        _, u0, v0, a0 = precedent
+        _, u1, v1, a1 = suivant
+        cos_theta = -sum(u0.get(a, 0.0) * u1.get(a, 0.0) for a in COURSE)
+        if cos_theta < -0.999999: # tout droit
+            return min(v0, v1)
+        if cos_theta > 0.999999: # demi-tour
+            return 0.0
+        sin_demi = math.sqrt(0.5 * (1 - cos_theta))
+        v = math.sqrt(min(a0, a1) * self.junction_deviation * sin_demi / (1 - sin_demi))
+        return min(v, v0, v1)
+
+    @staticmethod
+    def duree_segment(longueur, v_entree, v_sortie, v_max, accel):
+        """Durée d'un profil trapézoïdal (triangulaire si la distance ne permet pas d'atteindre v_max)."""
+        v_pic = math.sqrt((2 * accel * longueur + v_entree ** 2 + v_sortie ** 2) / 2)
+        if v_pic <= v_max:
+            return (2 * v_pic - v_entree - v_sortie) / accel
+        d_accel = (v_max ** 2 - v_entree ** 2) / (2 * accel)
+        d_decel = (v_max ** 2 - v_sortie ** 2) / (2 * accel)
+        return (2 * v_max - v_entree - v_sortie) / accel + (longueur - d_accel - d_decel) / v_max
+
+    def duree(self, commands, depart=None):
+        """Durée estimée (s) de la séquence, départ et arrivée à l'arrêt, depart = {"X": .., "Y": .., "Z": ..}."""
+        blocs, total = self.blocs(commands, depart)
+        for segments in blocs:
+            #1 Vitesses aux jonctions (arrêt au début et à la fin du bloc)
+            v = [0.0] + [self.vitesse_jonction(a, b) for a, b in zip(segments, segments[1:])] + [0.0]
+            #2 Passe arrière puis avant : chaque segment doit pouvoir freiner / accélérer d'une jonction à l'autre
+            for i in range(len(segments) - 1, -1, -1):
+                longueur, _, _, accel = segments[i]
+                v[i] = min(v[i], math.sqrt(v[i + 1] ** 2 + 2 * accel * longueur))
+            for i, (longueur, _, _, accel) in enumerate(segments):
+                v[i + 1] = min(v[i + 1], math.sqrt(v[i] ** 2 + 2 * accel * longueur))
+            #3 Profils trapézoïdaux
+            total += sum(self.duree_segment(l, v[i], v[i + 1], v_max, accel)
+                         for i, (l, _, v_max, accel) in enumerate(segments))
+        return total
+
+    def timeout(self, commands, depart=None):
+        """Timeout adapté à la séquence : MARGE_TIMEOUT fois la durée estimée, au moins TIMEOUT_MIN_S."""
+        return MARGE_TIMEOUT * self.duree(commands, depart) + TIMEOUT_MIN_S
+
+
+def verifier_profils(modele=None):
+    """Compare le modèle à des durées calculables à la main."""
+    modele = modele or MotionModel(accel_max={"X": 1000, "Y": 1000, "Z": 100}, vitesse_max={"X": 200, "Y": 200, "Z": 10},
+                                   accel_deplacement=1000)
+    depart = {"X": 0.0, "Y": 0.0, "Z": 0.0}
+
+    def proche(a, b):
+        return abs(a - b) < 1e-6
+
+    # Trapèze : 300 mm à 100 mm/s, a = 1000 -> L/v + v/a
+    assert proche(modele.duree(["G90", "G1 X300 F6000"], depart), 300 / 100 + 100 / 1000)
+    # Triangle : 4 mm, v_max non atteinte -> 2 * sqrt(L/a)
+    assert proche(modele.duree(["G90", "G1 X4 F6000"], depart), 2 * math.sqrt(4 / 1000))
+    # Z limité par M203 Z (10 mm/s) et M201 Z (100 mm/s²) malgré F6000
+    assert proche(modele.duree(["G90", "G1 Z20 F6000"], depart), 20 / 10 + 10 / 100)
+    # Segments alignés : même durée qu'un seul segment
+    assert proche(modele.duree(["G90", "G1 X100 F6000", "G1 X300"], depart), modele.duree(["G90", "G1 X300 F6000"], depart))
+    # Demi-tour : arrêt complet, comme deux mouvements séparés par M400
+    aller_retour = modele.duree(["G90", "G1 X100 F6000", "G1 X0"], depart)
+    assert proche(aller_retour, modele.duree(["G90", "G1 X100 F6000", "M400", "G1 X0"], depart))
+    # Angle droit : plus rapide qu'un arrêt complet, plus lent que sans jonction
+    coin = modele.duree(["G90", "G1 X100 F6000", "G1 Y100"], depart)
+    assert modele.duree(["G90", "G1 X200 F6000"], depart) < coin < aller_retour
+    # Relatif, G92 et mouvements nuls
+    assert proche(modele.duree(["G91", "G1 X300 F6000", "G1 X0"], depart), modele.duree(["G90", "G1 X300 F6000"], depart))
+    assert proche(modele.duree(["G92 X300", "G90", "G1 X0 F6000"], depart), modele.duree(["G90", "G1 X300 F6000"], depart))
+    print("Profils trapézoïdaux, jonctions, relatif et G92 : OK")
+
+
+def verifier_reference(chemin, modele=None):
+    """
+    Compare les estimations à un run enregistré par TronxyController.sauver_reference : liste de
+    {"commandes": [...], "depart": {...}, "duree_s": mesurée entre le premier envoi et le "ok" du M400}.
+    Pas lancé par défaut : il faut d'abord enregistrer un run sur la machine (voir REFERENCE_MOUVEMENTS dans main.py).
+    """
+    modele = modele or MotionModel()
+    with open(chemin) as f:
+        intervalles = json.load(f)
+    ecarts = []
+    for it in intervalles:
+        estime = modele.duree(it["commandes"], it["depart"])
+        ecarts.append((estime - it["duree_s"]) / it["duree_s"])
+    ecarts_abs = sorted(abs(e) for e in ecarts)
+    print(f"{len(ecarts)} intervalles de '{chemin}' : écart médian {ecarts_abs[len(ecarts_abs) // 2]:.1%}, "
+          f"max {ecarts_abs[-1]:.1%}, biais moyen {sum(ecarts) / len(ecarts):+.1%}")
+    assert ecarts_abs[len(ecarts_abs) // 2] <= ECART_REFERENCE_MAX, "estimations trop éloignées du run de référence"
+
+
+if __name__ == "__main__":
+    verifier_profils()
+    if not sys.argv[1:]:
+        print("Calibrage en attente : pas de run de référence mesuré, donner son chemin pour le comparer.")
+    for chemin in sys.argv[1:]:
+        verifier_reference(chemin)
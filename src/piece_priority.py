@@ -1,5 +1,13 @@
+import heapq
 from dataclasses import dataclass, field
 
+import numpy as np
+
+
+LARGEUR_BANDE_Y = 15.0 # mm, écart Y max entre pièces poussées ensemble par un même trait de brosse
+PIECE_DTYPE = np.dtype([("id", np.int64), ("x", np.float64), ("y", np.float64),
+                        ("classe", np.int64), ("bac_y", np.float64)]) # une ligne du plateau vectorisé
+
 
 @dataclass #generation automatique de méthode spéciales comme __init__ ou __repr__
 class Piece:
@@ -46,6 +54,40 @@ class Plateau:
         return abs(piece.x - bx) + abs(piece.y - by) 
 
 
+@dataclass
+class Balayage:
+    """Pièces d'un même bac poussées ensemble : la brosse se pose derrière la plus à gauche, au milieu de la bande Y."""
+    pieces: list
+
+    @property
+    def id(self):
+        return self.pieces[0].id
+
+    @property
+    def classe(self):
+        return self.pieces[0].classe
+
+    @property
+    def x(self):
+        return min(p.x for p in self.pieces)
+
+    @property
+    def y(self):
+        ys = [p.y for p in self.pieces]
+        return (min(ys) + max(ys)) / 2
+
+    def pos(self):
+        return (self.x, self.y)
+
+    def __repr__(self): #DEBUG sous forme de chaine
+        return f"Balayage[{', '.join(f'P{p.id}' for p in self.pieces)}](pos=({self.x:.1f},{self.y:.1f})mm, cl={self.classe})"
+
+
+def pieces_de(element) -> list:
+    """Pièces poussées par un élément de tri (une Piece seule ou un Balayage)."""
+    return element.pieces if isinstance(element, Balayage) else [element]
+
+
 def piece_sur_trajet(piece: Piece, autre: Piece, plateau: Plateau, marge: float = 20.0) -> bool:
     """ Vérifie si une pièce est sur le trajet pour éviter la collision
 
@@ -83,7 +125,74 @@ def compter_collisions_chemin(piece: Piece, autres: list, plateau: Plateau) -> i
     return collisions
 
 
-def calculer_priorite(pieces: list, plateau: Plateau) -> list:
+def tableau_pieces(pieces: list, plateau: Plateau) -> np.ndarray:
+    """Plateau sous forme de tableau structuré (PIECE_DTYPE), une ligne par pièce, Y du bac cible compris."""
+    tableau = np.empty(len(pieces), dtype=PIECE_DTYPE)
+    tableau["id"] = [p.id for p in pieces]
+    tableau["x"] = [p.x for p in pieces]
+    tableau["y"] = [p.y for p in pieces]
+    tableau["classe"] = [p.classe for p in pieces]
+    tableau["bac_y"] = [plateau.coordonnee_boite(p.classe)[1] for p in pieces]
+    return tableau
+
+
+def matrice_collisions(tableau: np.ndarray, plateau: Plateau, marge: float = 20.0) -> np.ndarray:
+    """
+    M[i, j] = piece_sur_trajet(pièce i, pièce j) pour toutes les paires en une passe vectorisée
+    (mêmes comparaisons, même marge ; une pièce n'est pas sur son propre trajet).
+    """
+    x, y, by = tableau["x"][:, None], tableau["y"][:, None], tableau["bac_y"][:, None]
+    ax, ay = tableau["x"][None, :], tableau["y"][None, :]
+    bx = plateau.largeur
+
+    y_min, y_max = np.minimum(y, by), np.maximum(y, by)
+    branche_y = (np.abs(ax - x) <= marge) & (y_min - marge <= ay) & (ay <= y_max + marge)
+
+    x_min, x_max = np.minimum(x, bx), np.maximum(x, bx)
+    branche_x = (x_min - marge <= ax) & (ax <= x_max + marge) & (np.abs(ay - by) <= marge)
+
+    return (branche_y | branche_x) & (tableau["id"][:, None] != tableau["id"][None, :])
+
+
+def calculer_priorite(pieces: list, plateau: Plateau, cout=None) -> list:
+    """
+    Ordre de tri glouton : d'abord la pièce la plus proche du bord, puis le moins de collisions, puis le coût.
+    cout(piece) (optionnel, ex. durée estimée par le modèle cinématique) remplace dist_totale comme dernier critère.
+
+    Même ordre que calculer_priorite_reference, sans tout recalculer à chaque pièce : les collisions sont les sommes
+    des lignes de matrice_collisions sur les pièces restantes, mises à jour avec la colonne de la pièce retirée ;
+    candidats dans un tas (égalités départagées par la position dans la liste, comme le tri stable d'origine).
+    """
+    M = matrice_collisions(tableau_pieces(pieces, plateau), plateau)
+    collisions = M.sum(axis=1).tolist()
+    restantes = np.ones(len(pieces), dtype=bool)
+    entrees = []
+    for p in pieces:
+        dist_totale = plateau.distance_totale(p)
+        entrees.append({"piece": p, "dist_bord": plateau.distance_au_bord(p), "dist_totale": dist_totale,
+                        "cout": cout(p) if cout else dist_totale})
+
+    tas = [(e["dist_bord"], collisions[i], e["cout"], i) for i, e in enumerate(entrees)]
+    heapq.heapify(tas)
+    ordre = []
+
+    while tas:
+        dist_bord, n_collisions, cout_p, i = heapq.heappop(tas)
+        if not restantes[i] or n_collisions != collisions[i]: # entrée périmée (pièce retirée ou compte changé)
+            continue
+        restantes[i] = False
+        e = entrees[i]
+        ordre.append({"piece": e["piece"], "collisions": n_collisions, "dist_bord": dist_bord,
+                      "dist_totale": e["dist_totale"], "cout": cout_p})
+        for k in np.flatnonzero(M[:, i] & restantes).tolist(): # pièces restantes dont i était sur le trajet
+            collisions[k] -= 1
+            heapq.heappush(tas, (entrees[k]["dist_bord"], collisions[k], entrees[k]["cout"], k))
+
+    return ordre
+
+
+def calculer_priorite_reference(pieces: list, plateau: Plateau, cout=None) -> list:
+    """Version d'origine de calculer_priorite (tout recalculé à chaque pièce, O(n³)), gardée pour les vérifications."""
     restantes = list(pieces)
     ordre = []
 
@@ -100,9 +209,10 @@ def calculer_priorite(pieces: list, plateau: Plateau) -> list:
                 "collisions": collisions,
                 "dist_bord": dist_bord,
                 "dist_totale": dist_totale,
+                "cout": cout(p) if cout else dist_totale,
             })
 
-        candidats.sort(key=lambda e: (e["dist_bord"],e["collisions"], e["dist_totale"],)) #d'abord la pièce la plus proche du bord, ensuite celle avec le moins de collisions, ensuite celle la plus loin
+        candidats.sort(key=lambda e: (e["dist_bord"],e["collisions"], e["cout"],)) #d'abord la pièce la plus proche du bord, ensuite celle avec le moins de collisions, ensuite celle la plus loin
 
         meilleur = candidats[0]
         ordre.append(meilleur)
@@ -111,6 +221,170 @@ def calculer_priorite(pieces: list, plateau: Plateau) -> list:
     return ordre
 
 
+def fin_poussee(piece, plateau: Plateau) -> tuple:
+    """Position XY de la tête à la fin de la poussée : bord du plateau, en face du bac."""
+    return plateau.coordonnee_boite(piece.classe)
+
+
+def approche(piece, offset_x: float = 5.0) -> tuple:
+    """Position XY où la brosse se pose, derrière la pièce."""
+    return (max(piece.x - offset_x, 0), piece.y)
+
+
+def longueur_trajet(ordre: list, plateau: Plateau, depart: tuple = (0.0, 320.0), offset_x: float = 5.0) -> float:
+    """Déplacements à vide (mm) : départ -> 1re pièce, puis bord du bac précédent -> pièce suivante."""
+    total, position = 0.0, depart
+    for p in ordre:
+        ax, ay = approche(p, offset_x)
+        total += ((ax - position[0]) ** 2 + (ay - position[1]) ** 2) ** 0.5
+        position = fin_poussee(p, plateau)
+    return total
+
+
+def calculer_priorite_trajet(pieces: list, plateau: Plateau, cout=None, depart: tuple = (0.0, 320.0),
+                             offset_x: float = 5.0) -> list:
+    """
+    Ordre qui minimise les déplacements à vide en tenant compte de la position de la tête après chaque poussée.
+
+    Contraintes : pour deux pièces dont l'une est sur le trajet de l'autre, l'ordre relatif de calculer_priorite
+    est conservé (mêmes collisions qu'avec l'ordre glouton). Construction au plus proche voisin parmi les pièces
+    disponibles, puis amélioration locale (or-opt : déplacer 1 à 3 pièces consécutives, 2-opt : inverser un segment)
+    tant qu'un mouvement admissible raccourcit le trajet.
+
+    Returns:
+        list: mêmes entrées que calculer_priorite, dans le nouvel ordre
+    """
+    reference = calculer_priorite(pieces, plateau, cout)
+    n = len(reference)
+    if n < 3:
+        return reference
+    ref = [e["piece"] for e in reference]
+
+    #1 Précédences (i avant j) et coûts à vide C[a][b] = fin de a -> approche de b (indice n = départ)
+    M = matrice_collisions(tableau_pieces(ref, plateau), plateau)
+    avant = np.triu(M | M.T, 1).tolist()
+    lies = [set(np.flatnonzero(ligne).tolist()) for ligne in M | M.T]
+    fins = [fin_poussee(p, plateau) for p in ref] + [depart]
+    approches = [approche(p, offset_x) for p in ref]
+    C = [[((fx - ax) ** 2 + (fy - ay) ** 2) ** 0.5 for ax, ay in approches] + [0.0] for fx, fy in fins]
+
+    #2 Construction : plus proche pièce dont tous les prédécesseurs sont déjà triés
+    ordre, faits, courant = [], [False] * n, n
+    while len(ordre) < n:
+        dispo = [j for j in range(n) if not faits[j] and all(faits[i] for i in range(j) if avant[i][j])]
+        courant = min(dispo, key=lambda j: (C[courant][j], j))
+        ordre.append(courant)
+        faits[courant] = True
+
+    #3 Amélioration locale jusqu'à ce qu'aucun mouvement admissible ne raccourcisse le trajet
+    def c(a, b): # b = None : fin de l'ordre, rien à parcourir
+        return 0.0 if b is None else C[a][b]
+
+    ameliore = True
+    while ameliore:
+        ameliore = False
+
+        # or-opt : segment ordre[i:i+k] déplacé plus loin (après ordre[j]) ou plus tôt (avant ordre[j])
+        for k in (1, 2, 3):
+            for i in range(n - k + 1):
+                seg = ordre[i:i + k]
+                prec = ordre[i - 1] if i > 0 else n
+                suiv = ordre[i + k] if i + k < n else None
+                retrait = c(prec, seg[0]) + c(seg[-1], suiv) - c(prec, suiv)
+                meilleur = None
+                for j in range(i + k, n): # plus loin : on saute ordre[j]
+                    if any(avant[s][ordre[j]] for s in seg):
+                        break
+                    q = ordre[j + 1] if j + 1 < n else None
+                    gain = retrait - (c(ordre[j], seg[0]) + c(seg[-1], q) - c(ordre[j], q))
+                    if gain > 1e-9 and (meilleur is None or gain > meilleur[0]):
+                        meilleur = (gain, j + 1)
+                for j in range(i - 1, -1, -1): # plus tôt : on saute ordre[j]
+                    if any(avant[ordre[j]][s] for s in seg):
+                        break
+                    a = ordre[j - 1] if j > 0 else n
+                    gain = retrait - (c(a, seg[0]) + c(seg[-1], ordre[j]) - c(a, ordre[j]))
+                    if gain > 1e-9 and (meilleur is None or gain > meilleur[0]):
+                        meilleur = (gain, j)
+                if meilleur:
+                    reste = ordre[:i] + ordre[i + k:]
+                    pos = meilleur[1] - k if meilleur[1] > i else meilleur[1]
+                    ordre = reste[:pos] + seg + reste[pos:]
+                    ameliore = True
+
+        # 2-opt : inversion de ordre[i..j], admissible si aucune paire du segment n'est contrainte
+        for i in range(n - 1):
+            prec = ordre[i - 1] if i > 0 else n
+            contraintes, direct, inverse = set(lies[ordre[i]]), 0.0, 0.0
+            for j in range(i + 1, n):
+                if ordre[j] in contraintes:
+                    break
+                contraintes |= lies[ordre[j]]
+                direct += C[ordre[j - 1]][ordre[j]]
+                inverse += C[ordre[j]][ordre[j - 1]]
+                suiv = ordre[j + 1] if j + 1 < n else None
+                avant_inv = c(prec, ordre[i]) + direct + c(ordre[j], suiv)
+                apres_inv = c(prec, ordre[j]) + inverse + c(ordre[i], suiv)
+                if apres_inv < avant_inv - 1e-9:
+                    ordre[i:j + 1] = ordre[i:j + 1][::-1]
+                    ameliore = True
+                    break
+
+    return [reference[i] for i in ordre]
+
+
+STRATEGIES_ORDRE = {
+    "glouton": calculer_priorite, # plus près du bord d'abord, puis collisions, puis coût
+    "trajet": calculer_priorite_trajet, # mêmes contraintes de collision, déplacements à vide minimisés
+}
+
+
+def bande_libre(groupe: list, etrangeres: list, plateau: Plateau, marge: float = 20.0) -> bool:
+    """
+    Aucune pièce d'une autre classe sur le trajet d'un membre du groupe (piece_sur_trajet) ni dans la bande
+    balayée par le trait commun (de la pièce la plus à gauche jusqu'au bord, sur la largeur du groupe + marge).
+    """
+    x_min = min(p.x for p in groupe)
+    ys = [p.y for p in groupe]
+    for autre in etrangeres:
+        if autre.x >= x_min - marge and min(ys) - marge <= autre.y <= max(ys) + marge:
+            return False
+        if any(piece_sur_trajet(p, autre, plateau, marge) for p in groupe):
+            return False
+    return True
+
+
+def grouper_balayages(ordre: list, plateau: Plateau, largeur: float = LARGEUR_BANDE_Y, marge: float = 20.0) -> list:
+    """
+    Regroupe les pièces qu'un seul trait en X peut pousser ensemble : même bac, écart Y <= largeur,
+    aucune pièce étrangère restante dans le couloir (bande_libre).
+
+    Args:
+        ordre (list): pièces dans l'ordre de calculer_priorite
+        plateau (Plateau): Instance de la classe Plateau
+        largeur (float, optional): écart Y max dans un groupe en mm (défaut : LARGEUR_BANDE_Y)
+        marge (float, optional): Marge d'évitement en mm (défaut : 20mm)
+
+    Returns:
+        list: Piece seules et Balayage, dans l'ordre de tri (un groupe prend la place de sa première pièce)
+    """
+    restantes = list(ordre)
+    elements = []
+
+    while restantes:
+        tete = restantes.pop(0)
+        groupe = [tete]
+        etrangeres = [a for a in restantes if a.classe != tete.classe]
+        for q in [a for a in restantes if a.classe == tete.classe]:
+            ys = [p.y for p in groupe] + [q.y]
+            if max(ys) - min(ys) <= largeur and bande_libre(groupe + [q], etrangeres, plateau, marge):
+                groupe.append(q)
+                restantes.remove(q)
+        elements.append(Balayage(groupe) if len(groupe) > 1 else tete)
+
+    return elements
+
+
 def decrire_trajet(piece: Piece, plateau: Plateau) -> str:
     bx, by = plateau.coordonnee_boite(piece.classe)
     x, y = piece.x, piece.y
@@ -0,0 +1,279 @@
+"""
+Compilateur de poussées : transforme l'ordre de tri (calculer_priorite) en un seul programme G-code.
+
+Par rapport à la séquence fixe pièce par pièce (sequence_piece) :
+  - la remontée après une poussée est fusionnée avec le trajet vers la pièce suivante quand la brosse,
+    encore basse au début de ce trajet, ne passe près d'aucune pièce restante
+  - une pièce déjà en face de son bac est poussée d'un seul trait, sans rebalayage
+  - le rebalayage n'est gardé qu'après un alignement Y (la pièce a pu rester sur le bord)
+Le couloir balayé par chaque poussée (segments brosse basse) dit quelles pièces restantes elle peut déplacer
+(pieces_touchees) : la boucle de tri ne reprend une photo que dans ce cas.
+
+À lancer depuis la racine du projet :
+    python -m src.push_compiler              # compare aux fichiers de référence (src/golden/) et affiche le gain estimé
+    python -m src.push_compiler --regenerer  # réécrit les fichiers de référence après un changement voulu
+"""
+
+import os
+import sys
+import math
+import random
+from dataclasses import dataclass, field
+
+from .piece_priority import Piece, Boite, Plateau, Balayage, calculer_priorite, pieces_de
+from .motion_model import MotionModel
+
+
+DOSSIER_GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+PLATEAUX_GOLDEN = {"plateau_3": (3, 1), "plateau_8": (8, 2), "plateau_20": (20, 3)} # nom -> (n pièces, seed)
+
+
+@dataclass
+class ParametresPoussee:
+    """Géométrie et vitesses de la séquence de poussée (mm, mm/min), mêmes valeurs que main.py."""
+    bord_x: float = 315.0 # fin de poussée, la pièce tombe dans le bac
+    arret_alignement: float = 15.0 # arrêt avant le bord pour l'alignement Y (ne pas tomber dans le mauvais bac)
+    recul_rebalayage: float = 20.0
+    offset_x: float = 5.0 # la brosse se pose derrière la pièce
+    z_haute: float = 15.0
+    z_basse: float = 2.0
+    hauteur_pieces: float = 8.0 # au-dessus, la brosse ne touche plus les pièces
+    marge: float = 20.0 # distance minimale brosse basse / pièce restante (comme piece_sur_trajet)
+    tolerance_alignement: float = 1.0 # pièce déjà en face de son bac
+    f_rapide: float = 6000
+    f_poussee: float = 6000
+    f_z: float = 1500
+
+
+@dataclass
+class Programme:
+    commandes: list
+    duree_estimee: float # s, modèle cinématique
+    duree_reference: float # s, même plan avec la séquence fixe pièce par pièce
+    remontees_fusionnees: int = 0
+    rebalayages_evites: int = 0
+    pieces: list = field(default_factory=list)
+
+    @property
+    def gain(self):
+        return self.duree_reference - self.duree_estimee
+
+
+def mm(v):
+    return f"{round(v, 2):g}"
+
+
+def sequence_piece(p, plateau, params=None):
+    """Séquence fixe d'une pièce (approche, descente, poussée, alignement Y, balayage, rebalayage, remontée)."""
+    params = params or ParametresPoussee()
+    _, bac_y = plateau.coordonnee_boite(p.classe)
+    approche_x = max(p.x - params.offset_x, 0)
+
+    commandes = [f"G1 X{mm(approche_x)} Y{mm(p.y)} F{params.f_rapide:g}", # approche
+                 f"G1 Z{mm(params.z_basse)} F{params.f_z:g}", # descente
+                 f"G1 X{mm(params.bord_x - params.arret_alignement)} F{params.f_poussee:g}"] # poussée vers le bord
+    if abs(p.y - bac_y) > params.tolerance_alignement:
+        commandes.append(f"G1 Y{mm(bac_y)} F{params.f_poussee:g}") # alignement Y
+    commandes += [f"G1 X{mm(params.bord_x)} F{params.f_poussee:g}", # balayage dans le bac
+                  f"G1 X{mm(params.bord_x - params.recul_rebalayage)} Z{mm(params.z_haute)} F{params.f_z:g}",
+                  f"G1 Z{mm(params.z_basse)} F{params.f_z:g}",
+                  f"G1 X{mm(params.bord_x)} F{params.f_poussee:g}", # rebalayage
+                  f"G1 Z{mm(params.z_haute)} F{params.f_z:g}"] # remontée
+    return commandes
+
+
+def distance_segment(point, a, b):
+    """Distance d'un point (x, y) au segment [a, b]."""
+    (px, py), (ax, ay), (bx, by) = point, a, b
+    dx, dy = bx - ax, by - ay
+    longueur2 = dx * dx + dy * dy
+    t = 0.0 if longueur2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / longueur2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def remontee_fusionnable(depart, arrivee, obstacles, params):
+    """
+    Remontée + trajet en un seul mouvement : sur la partie du trajet où la brosse est encore sous
+    hauteur_pieces, aucune pièce restante ne doit être à moins de params.marge.
+    """
+    t = (params.hauteur_pieces - params.z_basse) / (params.z_haute - params.z_basse)
+    t = max(0.0, min(1.0, t))
+    fin_basse = (depart[0] + t * (arrivee[0] - depart[0]), depart[1] + t * (arrivee[1] - depart[1]))
+    return all(distance_segment(o.pos(), depart, fin_basse) > params.marge for o in obstacles)
+
+
+def commandes_poussee(p, plateau, params):
+    """
+    Descente derrière la pièce (brosse déjà au point d'approche) puis poussée : d'un trait si la pièce est en face
+    de son bac, sinon arrêt avant le bord, alignement Y et rebalayage. Se termine brosse basse au bord.
+    """
+    _, bac_y = plateau.coordonnee_boite(p.classe)
+    commandes = [f"G1 Z{mm(params.z_basse)} F{params.f_z:g}"]
+    if abs(p.y - bac_y) <= params.tolerance_alignement:
+        return commandes + [f"G1 X{mm(params.bord_x)} F{params.f_poussee:g}"]
+    return commandes + [f"G1 X{mm(params.bord_x - params.arret_alignement)} F{params.f_poussee:g}",
+                        f"G1 Y{mm(bac_y)} F{params.f_poussee:g}",
+                        f"G1 X{mm(params.bord_x)} F{params.f_poussee:g}",
+                        f"G1 X{mm(params.bord_x - params.recul_rebalayage)} Z{mm(params.z_haute)} F{params.f_z:g}",
+                        f"G1 Z{mm(params.z_basse)} F{params.f_z:g}",
+                        f"G1 X{mm(params.bord_x)} F{params.f_poussee:g}"]
+
+
+def segments_bas(commandes, depart, params):
+    """
+    Segments XY parcourus brosse basse (sous hauteur_pieces) par des G0/G1 absolus depuis depart ({"X", "Y", "Z"}).
+    Pour un mouvement qui monte ou descend, seule la partie sous hauteur_pieces est gardée (Z linéaire le long du trajet).
+    """
+    position, segments = dict(depart), []
+    h = params.hauteur_pieces
+    for commande in commandes:
+        mots = commande.split()
+        if mots[0] not in ("G0", "G1"):
+            continue
+        cible = dict(position, **{m[0]: float(m[1:]) for m in mots[1:] if m[0] in "XYZ"})
+        z0, z1 = position["Z"], cible["Z"]
+        if max(z0, z1) <= h:
+            t0, t1 = 0.0, 1.0
+        elif min(z0, z1) <= h:
+            t = (h - z0) / (z1 - z0)
+            t0, t1 = (0.0, t) if z0 <= h else (t, 1.0)
+        else:
+            t0 = t1 = None
+        (x0, y0), (x1, y1) = (position["X"], position["Y"]), (cible["X"], cible["Y"])
+        if t0 is not None and (x0, y0) != (x1, y1):
+            segments.append(((x0 + t0 * (x1 - x0), y0 + t0 * (y1 - y0)), (x0 + t1 * (x1 - x0), y0 + t1 * (y1 - y0))))
+        position = cible
+    return segments
+
+
+def couloir(element, plateau, params=None):
+    """Couloir balayé par la poussée d'un élément (Piece ou Balayage) : segments brosse basse, de l'approche au bord."""
+    params = params or ParametresPoussee()
+    x, y = max(element.x - params.offset_x, 0), element.y
+    return segments_bas(commandes_poussee(element, plateau, params), {"X": x, "Y": y, "Z": params.z_haute}, params)
+
+
+def pieces_touchees(element, restantes, plateau, params=None):
+    """Pièces restantes (hors celles de l'élément) à moins de params.marge du couloir de sa poussée."""
+    params = params or ParametresPoussee()
+    segments = couloir(element, plateau, params)
+    propres = {p.id for p in pieces_de(element)}
+    return [q for q in restantes if q.id not in propres
+            and any(distance_segment(q.pos(), a, b) <= params.marge for a, b in segments)]
+
+
+def compiler(pieces, plateau, params=None, depart=None, obstacles=(), modele=None):
+    """
+    Programme G-code pour trier pieces (Piece ou Balayage) dans cet ordre, tête partant de depart ({"X", "Y", "Z"}).
+    obstacles : autres pièces du plateau qui ne sont pas triées par ce programme (à éviter brosse basse).
+    Le programme se termine brosse haute au-dessus du bord du dernier bac.
+    """
+    params = params or ParametresPoussee()
+    modele = modele or MotionModel()
+    commandes = ["G90"]
+    basse_au_bord = None # (x, y) de la brosse restée basse au bord après une poussée (remontée différée)
+    fusions = evites = 0
+
+    for i, p in enumerate(pieces):
+        _, bac_y = plateau.coordonnee_boite(p.classe)
+        approche = (max(p.x - params.offset_x, 0), p.y)
+        restantes = [r for element in list(pieces[i:]) + list(obstacles) for r in pieces_de(element)]
+
+        #1 Remontée de la pièce précédente + trajet d'approche (fusionnés si sans risque)
+        if basse_au_bord is not None and remontee_fusionnable(basse_au_bord, approche, restantes, params):
+            commandes.append(f"G1 X{mm(approche[0])} Y{mm(approche[1])} Z{mm(params.z_haute)} F{params.f_rapide:g}")
+            fusions += 1
+        else:
+            if basse_au_bord is not None:
+                commandes.append(f"G1 Z{mm(params.z_haute)} F{params.f_z:g}")
+            commandes.append(f"G1 X{mm(approche[0])} Y{mm(approche[1])} F{params.f_rapide:g}")
+
+        #2 Descente et poussée
+        commandes += commandes_poussee(p, plateau, params)
+        evites += abs(p.y - bac_y) <= params.tolerance_alignement
+        basse_au_bord = (params.bord_x, bac_y)
+
+    if basse_au_bord is not None:
+        commandes.append(f"G1 Z{mm(params.z_haute)} F{params.f_z:g}")
+
+    reference = ["G90"] + [c for p in pieces for c in sequence_piece(p, plateau, params)]
+    return Programme(commandes=commandes,
+                     duree_estimee=modele.duree(commandes, depart),
+                     duree_reference=modele.duree(reference, depart),
+                     remontees_fusionnees=fusions, rebalayages_evites=evites, pieces=list(pieces))
+
+
+def plateau_defaut():
+    return Plateau(largeur=320.0, hauteur=320.0,
+                   boites={1: Boite(1, 270), 2: Boite(2, 200), 3: Boite(3, 120), 4: Boite(4, 50)})
+
+
+def pieces_aleatoires(n, seed, plateau=None):
+    """Pièces synthétiques ; une sur quatre environ est déjà en face de son bac."""
+    plateau = plateau or plateau_defaut()
+    rng = random.Random(seed)
+    pieces = []
+    for i in range(1, n + 1):
+        classe = rng.randint(1, 4)
+        y = plateau.boites[classe].position if rng.random() < 0.25 else round(rng.uniform(20, 300), 1)
+        pieces.append(Piece(id=i, x=round(rng.uniform(20, 280), 1), y=y, classe=classe))
+    return pieces
+
+
+def programme_golden(n, seed):
+    plateau = plateau_defaut()
+    ordre = [e["piece"] for e in calculer_priorite(pieces_aleatoires(n, seed, plateau), plateau)]
+    return compiler(ordre, plateau, depart={"X": 0.0, "Y": 320.0, "Z": 15.0})
+
+
+def verifier_remontee():
+    """Une pièce restante près du début du trajet retour (brosse encore basse) impose de remonter d'abord."""
+    plateau, params = plateau_defaut(), ParametresPoussee()
+    premiere = Piece(id=1, x=250.0, y=270.0, classe=1) # déjà en face de son bac
+    loin = Piece(id=2, x=40.0, y=270.0, classe=1)
+    genante = Piece(id=3, x=290.0, y=262.0, classe=2) # sur le trajet retour, brosse à moins de hauteur_pieces
+
+    libre = compiler([premiere, loin], plateau, params).commandes
+    assert "G1 X35 Y270 Z15 F6000" in libre, "remontée non fusionnée alors que le trajet est libre"
+    bloque = compiler([premiere, loin], plateau, params, obstacles=[genante]).commandes
+    i = bloque.index("G1 X35 Y270 F6000")
+    assert bloque[i - 1] == f"G1 Z{mm(params.z_haute)} F{params.f_z:g}", "remontée fusionnée au-dessus d'une pièce"
+
+
+def verifier_couloir():
+    """Le couloir d'une poussée touche les pièces de sa bande X et de l'alignement Y, pas les autres."""
+    plateau, params = plateau_defaut(), ParametresPoussee()
+    p = Piece(id=1, x=100.0, y=150.0, classe=1) # bac 1 à Y=270 : poussée, alignement Y à X=300, rebalayage
+    dans_bande = Piece(id=2, x=200.0, y=160.0, classe=2)
+    sur_alignement = Piece(id=3, x=305.0, y=220.0, classe=3)
+    derriere = Piece(id=4, x=60.0, y=150.0, classe=2) # la brosse se pose après elle
+    loin = Piece(id=5, x=200.0, y=40.0, classe=4)
+    touchees = pieces_touchees(p, [dans_bande, sur_alignement, derriere, loin], plateau, params)
+    assert [q.id for q in touchees] == [2, 3], f"couloir : {touchees}"
+    assert pieces_touchees(Balayage([p, dans_bande]), [dans_bande], plateau, params) == [], \
+        "une pièce du balayage compte comme touchée"
+
+
+def verifier_golden(regenerer=False):
+    """Le programme de chaque plateau synthétique doit être identique à son fichier de référence."""
+    os.makedirs(DOSSIER_GOLDEN, exist_ok=True)
+    print(f"{'plateau':>10} | {'lignes':>6} | {'réf. (s)':>8} | {'compilé (s)':>11} | {'gain':>6} | "
+          f"{'remontées fusionnées':>20} | {'rebalayages évités':>18}")
+    for nom, (n, seed) in PLATEAUX_GOLDEN.items():
+        programme = programme_golden(n, seed)
+        chemin = os.path.join(DOSSIER_GOLDEN, f"{nom}.gcode")
+        texte = "\n".join(programme.commandes) + "\n"
+        if regenerer:
+            with open(chemin, "w") as f:
+                f.write(texte)
+        with open(chemin) as f:
+            assert f.read() == texte, f"{nom} : programme différent de '{chemin}' (--regenerer si voulu)"
+        print(f"{nom:>10} | {len(programme.commandes):>6} | {programme.duree_reference:>8.1f} | "
+              f"{programme.duree_estimee:>11.1f} | {programme.gain / programme.duree_reference:>6.1%} | "
+              f"{programme.remontees_fusionnees:>20} | {programme.rebalayages_evites:>18}")
+
+
+if __name__ == "__main__":
+    verifier_remontee()
+    verifier_couloir()
+    verifier_golden(regenerer="--regenerer" in sys.argv[1:])
@@ -3,11 +3,16 @@ Ce script :
   1. Charge toutes les images edge du dataset
   2. Extrait les features avec DINOv2
   3. Entraîne PCA + KMeans
-  4. Sauvegarde les modèles dans un dossier
+  4. Sauvegarde les modèles dans un dossier (joblib + tête NumPy head.npz utilisée à l'inférence)
   5. Affiche les clusters pour permettre l'association cluster → label
+
+Avec --head, réexporte seulement head.npz à partir des modèles joblib existants (sans ré-entraîner).
+Avec --plateau, les features sont celles de l'extraction "plateau" (tokens de patchs moyennés sur la pièce,
+voir detection.EXTRACTION) et les modèles sont sauvegardés en *_plateau (pca, kmeans, head_plateau.npz).
 """
 
 import os
+import sys
 import shutil
 import numpy as np
 import torch
@@ -19,25 +24,78 @@ from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
 import joblib
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #pour trouver le package src
+from src.export_model import load_dinov2
+from src.detection import Classifier, NumpyHead, pooler_tokens, a_l_echelle_plateau
+from src.calibration import taille_piece_px
+
 
 DATASET_PATH = "dataset_edge" #Dataset edge généré par preprocessing.py
 OUTPUT_DIR = "resultats_kmeans"
 MODEL_DIR = "models"
 N_CLUSTERS = 5 # Avec 4 clusters les résultats sont moins bons, 5 semble mieux séparer les pièces (nous n'avons que 4 bacs pour rappel)
 PCA_COMPONENTS = 50
-
-
-def main():
+HEAD_PATH = os.path.join(MODEL_DIR, "head.npz")
+HEAD_PLATEAU_PATH = os.path.join(MODEL_DIR, "head_plateau.npz")
+
+
+def exporter_tete(pca, kmeans, X, chemin=HEAD_PATH):
+    """
+    Exporte la tête NumPy (float32) et vérifie qu'elle donne les mêmes clusters que
+    pca.transform + kmeans.predict sur les features X.
+    """
+    head = NumpyHead.from_sklearn(pca, kmeans)
+    head.save(chemin)
+
+    attendu = kmeans.predict(pca.transform(X))
+    obtenu = head.predict(X)
+    accord = np.mean(attendu == obtenu)
+    print(f"Tête NumPy sauvegardée dans '{chemin}' (accord avec scikit-learn : {accord:.2%})")
+    if accord < 1.0:
+        print("ATTENTION : la tête NumPy diffère de scikit-learn sur certains points (égalités en float32).")
+    return head
+
+
+def exporter_tete_existante():
+    # Points de test proches de chaque centroïde, ramenés dans l'espace des features DINOv2
+    pca = joblib.load(os.path.join(MODEL_DIR, "pca.joblib"))
+    kmeans = joblib.load(os.path.join(MODEL_DIR, "kmeans.joblib"))
+    rng = np.random.default_rng(0)
+    centres = np.repeat(kmeans.cluster_centers_, 200, axis=0)
+    bruit = rng.normal(scale=np.sqrt(pca.explained_variance_), size=centres.shape)
+    X = pca.inverse_transform(centres + bruit).astype(np.float32)
+    exporter_tete(pca, kmeans, X)
+
+
+def features_plateau(classifier, img_path, taille_px):
+    """
+    Feature "plateau" d'une image edge : ramenée à la taille d'une pièce sur le plateau (taille_px, les images
+    du dataset font 224 px de côté max, environ 2x plus qu'à l'échelle de la caméra), posée seule sur une tuile
+    noire, puis moyenne des tokens de patchs sur son rectangle (même calcul que Classifier.extract_tray_features).
+    """
+    edges = a_l_echelle_plateau(np.array(Image.open(img_path).convert("L")), taille_px)
+    h, w = edges.shape
+    return pooler_tokens(classifier.patch_tokens(edges), (0, 0, w, h))
+
+
+def main(plateau=False):
+    suffixe = "_plateau" if plateau else ""
+    sortie = OUTPUT_DIR + suffixe
     os.makedirs(MODEL_DIR, exist_ok=True)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(sortie, exist_ok=True)
 
     #1 Charger DINOv2
     device = "cuda" if torch.cuda.is_available() else "cpu" #Nous l'avons fait tourner sur CPU, la vitesse était acceptable
     print(f"Device : {device}")
 
-    model = torch.hub.load('facebookresearch/dinov2', 'dinov2_vits14')
-    model.to(device)
-    model.eval()
+    if plateau:
+        classifier = Classifier()
+        classifier.device = device
+        classifier.model_patch = load_dinov2(device, patch_tokens=True)
+        taille_px = taille_piece_px() # échelle de la caméra (calibration px/mm), comme à l'inférence
+        print(f"Pièces ramenées à {taille_px} px (taille sur le plateau)")
+    else:
+        model = load_dinov2(device) # artefact exporté (models/) si présent, sinon torch.hub
 
     transform = transforms.Compose([
         transforms.Resize((224, 224)),
@@ -62,6 +120,9 @@ def main():
     #3 Extraction des features avec DINOv2
     features = []
     for img_path in tqdm(image_paths, desc="Extraction features"):
+        if plateau:
+            features.append(features_plateau(classifier, img_path, taille_px))
+            continue
         img = Image.open(img_path).convert("RGB")
         img_tensor = transform(img).unsqueeze(0).to(device)
         with torch.no_grad():
@@ -84,23 +145,27 @@ def main():
     print("Clustering terminé.")
 
     #6 Sauvegarder les modèles
-    joblib.dump(pca, os.path.join(MODEL_DIR, "pca.joblib"))
-    joblib.dump(kmeans, os.path.join(MODEL_DIR, "kmeans.joblib"))
+    joblib.dump(pca, os.path.join(MODEL_DIR, f"pca{suffixe}.joblib"))
+    joblib.dump(kmeans, os.path.join(MODEL_DIR, f"kmeans{suffixe}.joblib"))
     print(f"Modèles sauvegardés dans '{MODEL_DIR}/'")
+    exporter_tete(pca, kmeans, X, HEAD_PLATEAU_PATH if plateau else HEAD_PATH)
 
     #7 Copier les images dans les dossiers par cluster 
     for cluster_id in range(N_CLUSTERS):
-        cluster_dir = os.path.join(OUTPUT_DIR, f"cluster_{cluster_id}")
+        cluster_dir = os.path.join(sortie, f"cluster_{cluster_id}")
         os.makedirs(cluster_dir, exist_ok=True)
 
     cluster_counts = {i: 0 for i in range(N_CLUSTERS)}
     for img_path, label in zip(image_paths, labels):
-        dest_folder = os.path.join(OUTPUT_DIR, f"cluster_{label}")
+        dest_folder = os.path.join(sortie, f"cluster_{label}")
         shutil.copy2(img_path, os.path.join(dest_folder, os.path.basename(img_path)))
         cluster_counts[label] += 1
 
-    print(f"\nImages classées dans '{OUTPUT_DIR}/'")
+    print(f"\nImages classées dans '{sortie}/'")
 
 
 if __name__ == "__main__":
-    main()
+    if "--head" in sys.argv[1:]:
+        exporter_tete_existante()
+    else:
+        main(plateau="--plateau" in sys.argv[1:])
@@ -0,0 +1,284 @@
+"""
+Modèle d'état du plateau entre deux photos.
+
+Recalé sur chaque détection, il applique chaque poussée exécutée aux pièces qu'elle touche :
+  - les pièces de l'élément poussé sortent du plateau (dans leur bac)
+  - une pièce dans le couloir de la brosse (segments brosse basse) est emmenée dans le sens de la poussée,
+    jusqu'au bout du segment, et son incertitude croît avec la distance parcourue ; si elle passe le bord,
+    elle est comptée comme tombée dans un bac
+  - les pièces hors du couloir gardent leur position et leur incertitude
+La boucle de tri re-planifie sur ces positions prédites tant que l'incertitude reste sous un seuil.
+
+À lancer depuis la racine du projet :
+    python -m src.tray_model                                  # paires avant / après simulées (brosse_simulee)
+    python -m src.tray_model mesures/paires_detection.jsonl   # paires enregistrées par main.py (PAIRES_DETECTION)
+"""
+
+import sys
+import json
+import math
+import random
+from dataclasses import dataclass
+
+from .piece_priority import Piece, Balayage, calculer_priorite, grouper_balayages, pieces_de
+from .push_compiler import ParametresPoussee, compiler, couloir, plateau_defaut, pieces_aleatoires
+
+
+INCERTITUDE_BASE_MM = 2.0 # position détectée (conversion pixels -> mm)
+INCERTITUDE_PAR_MM = 0.1 # croissance par mm parcouru devant la brosse (couvre 80 % des erreurs sur brosse_simulee)
+APPARIEMENT_MAX_MM = 40.0 # au-delà (plus 3 incertitudes), une pièce prédite n'est pas appariée à une détection
+N_PAIRES_SYNTHETIQUES = 200
+GLISSEMENT_SYNTHETIQUE = 0.03 # écart-type du glissement réel, en fraction de la distance parcourue
+BRUIT_DETECTION_MM = 1.0 # écart-type de la position détectée
+# Brosse simulée (paires synthétiques), indépendante des paramètres du modèle
+PAS_SIMULATION_MM = 0.5
+BROSSE_DEMI_X_MM = 2.0 # épaisseur de la brosse (sens de la poussée X)
+BROSSE_DEMI_Y_MM = 12.0 # largeur de la brosse
+RAYON_PIECE_SIM_MM = 4.0
+
+
+@dataclass
+class PieceEstimee:
+    piece: Piece
+    incertitude: float = INCERTITUDE_BASE_MM # mm, écart-type de la position
+    parcouru: float = 0.0 # mm parcourus devant la brosse depuis la dernière détection
+
+    @property
+    def deplacee(self):
+        return self.parcouru > 0
+
+
+class TrayState:
+    """Pièces restantes du plateau : recalées à chaque détection, déplacées par chaque poussée exécutée."""
+
+    def __init__(self, plateau, params=None):
+        self.plateau = plateau
+        self.params = params or ParametresPoussee()
+        self.pieces = {} # id -> PieceEstimee
+        self.tombees = [] # pièces emmenées dans un bac par la poussée d'une autre
+
+    def recaler(self, pieces):
+        """Nouvelle détection : positions mesurées, incertitude de base."""
+        self.pieces = {p.id: PieceEstimee(p) for p in pieces}
+        self.tombees = []
+
+    def pousser(self, x, y, segments):
+        """
+        Suit une pièce le long des segments brosse basse : si la brosse l'atteint (écart latéral <= marge,
+        devant elle), la pièce est emmenée jusqu'au bout du segment, offset_x devant la brosse.
+        Retourne (x, y, distance parcourue).
+        """
+        contact, parcouru = self.params.offset_x, 0.0
+        for (ax, ay), (bx, by) in segments:
+            longueur = math.hypot(bx - ax, by - ay)
+            if longueur == 0:
+                continue
+            ux, uy = (bx - ax) / longueur, (by - ay) / longueur
+            le_long = (x - ax) * ux + (y - ay) * uy
+            lateral = -(x - ax) * uy + (y - ay) * ux
+            if abs(lateral) > self.params.marge or le_long < 0 or le_long >= longueur + contact:
+                continue
+            avance = longueur + contact - le_long
+            x, y, parcouru = x + avance * ux, y + avance * uy, parcouru + avance
+        return x, y, parcouru
+
+    def appliquer(self, element):
+        """Poussée exécutée d'un élément (Piece ou Balayage)."""
+        for p in pieces_de(element):
+            self.pieces.pop(p.id, None)
+        segments = couloir(element, self.plateau, self.params)
+        for id_piece, estimee in list(self.pieces.items()):
+            p = estimee.piece
+            x, y, parcouru = self.pousser(p.x, p.y, segments)
+            if parcouru == 0:
+                continue
+            estimee.piece = Piece(id=p.id, x=x, y=y, classe=p.classe)
+            estimee.incertitude += INCERTITUDE_PAR_MM * parcouru
+            estimee.parcouru += parcouru
+            if x >= self.plateau.largeur: # passée par-dessus le bord
+                self.tombees.append(self.pieces.pop(id_piece))
+
+    def incertitude_max(self):
+        return max((e.incertitude for e in self.pieces.values()), default=0.0)
+
+    def deplacees(self):
+        return [e for e in self.pieces.values() if e.deplacee]
+
+    def pieces_restantes(self):
+        return [e.piece for e in self.pieces.values()]
+
+
+def en_liste(p):
+    return [p.id, p.x, p.y, p.classe]
+
+
+def paire_json(avant, poussees, apres):
+    """Paire avant / après enregistrable : détection, éléments poussés entre les deux (listes de pièces), détection."""
+    return {"avant": [en_liste(p) for p in avant],
+            "poussees": [[en_liste(p) for p in pieces_de(e)] for e in poussees],
+            "apres": [en_liste(p) for p in apres]}
+
+
+def evaluer_paire(paire, plateau, params=None):
+    """
+    Rejoue les poussées d'une paire sur le modèle et apparie chaque pièce prédite à la détection d'après
+    la plus proche de même classe. Retourne [(PieceEstimee, erreur prédite, erreur si position d'avant gardée)],
+    erreurs None si la pièce n'a pas été retrouvée.
+    """
+    modele = TrayState(plateau, params)
+    avant = [Piece(*p) for p in paire["avant"]]
+    modele.recaler(avant)
+    for element in paire["poussees"]:
+        pieces = [Piece(*p) for p in element]
+        modele.appliquer(Balayage(pieces) if len(pieces) > 1 else pieces[0])
+
+    positions_avant = {p.id: p.pos() for p in avant}
+    libres = [Piece(*p) for p in paire["apres"]]
+    resultats = []
+    for estimee in modele.pieces.values():
+        p = estimee.piece
+        candidats = [q for q in libres if q.classe == p.classe]
+        q = min(candidats, key=lambda q: math.dist(q.pos(), p.pos()), default=None)
+        if q is None or math.dist(q.pos(), p.pos()) > APPARIEMENT_MAX_MM + 3 * estimee.incertitude:
+            resultats.append((estimee, None, None))
+            continue
+        libres.remove(q)
+        resultats.append((estimee, math.dist(q.pos(), p.pos()), math.dist(q.pos(), positions_avant[p.id])))
+    return resultats
+
+
+def brosse_simulee(commandes, pieces, plateau, params, rng):
+    """
+    Simulation indépendante du modèle (ni pousser ni couloir) : le G-code est rejoué par pas de PAS_SIMULATION_MM,
+    la brosse est un rectangle (BROSSE_DEMI_X_MM x BROSSE_DEMI_Y_MM) et les pièces des disques de RAYON_PIECE_SIM_MM.
+    Sous hauteur_pieces, une pièce touchée par la brosse est repoussée devant elle dans le sens du mouvement et pousse
+    à son tour les pièces qu'elle rencontre ; une pièce qui passe le bord du plateau tombe. Le glissement, aléatoire,
+    croît avec la distance parcourue. Retourne {id: (x, y)} des pièces restées sur le plateau.
+    """
+    r = RAYON_PIECE_SIM_MM
+    demi = (BROSSE_DEMI_X_MM + r, BROSSE_DEMI_Y_MM + r) # rectangle élargi : contact brosse / centre de pièce
+    positions = {p.id: [p.x, p.y] for p in pieces}
+    parcouru = dict.fromkeys(positions, 0.0)
+    brosse = {"X": 0.0, "Y": plateau.hauteur, "Z": params.z_haute} # parking
+
+    def pousser_hors(ident, bx, by, ux, uy):
+        # Plus petit recul le long de (ux, uy) qui sort le centre du rectangle élargi centré en (bx, by)
+        x, y = positions[ident]
+        if abs(x - bx) >= demi[0] or abs(y - by) >= demi[1]:
+            return 0.0
+        t = min(((bx + math.copysign(demi[0], ux) - x) / ux) if ux else math.inf,
+                ((by + math.copysign(demi[1], uy) - y) / uy) if uy else math.inf)
+        positions[ident] = [x + t * ux, y + t * uy]
+        return t
+
+    def chocs(ident, ux, uy):
+        # Une pièce poussée repousse celles qu'elle chevauche, en chaîne
+        pile = [ident]
+        while pile:
+            i = pile.pop()
+            for j in positions:
+                if j == i:
+                    continue
+                dx, dy = positions[j][0] - positions[i][0], positions[j][1] - positions[i][1]
+                d = math.hypot(dx, dy)
+                if d < 2 * r and dx * ux + dy * uy > 0:
+                    avance = 2 * r - d
+                    positions[j] = [positions[j][0] + avance * ux, positions[j][1] + avance * uy]
+                    parcouru[j] += avance
+                    pile.append(j)
+
+    for commande in commandes:
+        mots = commande.split()
+        if mots[0] not in ("G0", "G1"):
+            continue
+        cible = dict(brosse, **{m[0]: float(m[1:]) for m in mots[1:] if m[0] in "XYZ"})
+        longueur = math.hypot(cible["X"] - brosse["X"], cible["Y"] - brosse["Y"])
+        n = max(1, math.ceil(max(longueur, abs(cible["Z"] - brosse["Z"])) / PAS_SIMULATION_MM))
+        ux, uy = ((cible["X"] - brosse["X"]) / longueur, (cible["Y"] - brosse["Y"]) / longueur) if longueur else (0, 0)
+        for k in range(1, n + 1):
+            bx, by, bz = (brosse[a] + (cible[a] - brosse[a]) * k / n for a in "XYZ")
+            if bz > params.hauteur_pieces or not longueur:
+                continue
+            for ident in list(positions):
+                t = pousser_hors(ident, bx, by, ux, uy)
+                if t > 0:
+                    parcouru[ident] += t
+                    chocs(ident, ux, uy)
+            for ident in [i for i, (x, _) in positions.items() if x >= plateau.largeur]:
+                del positions[ident]
+        brosse = cible
+
+    return {i: (x + rng.gauss(0, GLISSEMENT_SYNTHETIQUE * parcouru[i]), y + rng.gauss(0, GLISSEMENT_SYNTHETIQUE * parcouru[i]))
+            for i, (x, y) in positions.items()}
+
+
+def paire_synthetique(rng, plateau, params):
+    """
+    Plateau aléatoire, 1 à 4 poussées prises n'importe où dans l'ordre de tri (pour que des couloirs passent sur
+    d'autres pièces), compilées en un programme comme un lot de la boucle de tri ; positions d'après données par
+    brosse_simulee (et non par TrayState), plus le bruit de détection.
+    """
+    avant = pieces_aleatoires(rng.randint(5, 30), rng.randrange(10 ** 6), plateau)
+    ordre = grouper_balayages([e["piece"] for e in calculer_priorite(avant, plateau)], plateau)
+    indices = sorted(rng.sample(range(len(ordre)), rng.randint(1, min(4, len(ordre)))))
+    poussees = [ordre[i] for i in indices]
+
+    poussees_ids = {p.id for e in poussees for p in pieces_de(e)}
+    restantes = [p for p in avant if p.id not in poussees_ids]
+    programme = compiler(poussees, plateau, params, depart={"X": 0.0, "Y": plateau.hauteur, "Z": params.z_haute},
+                         obstacles=restantes)
+    finales = brosse_simulee(programme.commandes, avant, plateau, params, rng)
+    classes = {p.id: p.classe for p in avant}
+    apres = [Piece(id=i, x=x + rng.gauss(0, BRUIT_DETECTION_MM), y=y + rng.gauss(0, BRUIT_DETECTION_MM), classe=classes[i])
+             for i, (x, y) in finales.items()]
+    return paire_json(avant, poussees, apres)
+
+
+def rapport(paires, plateau, params=None):
+    """Erreur moyenne prédite / position d'avant gardée, pièces déplacées ou non, et couverture à 2 incertitudes."""
+    stats = {"déplacées": [], "immobiles": []}
+    perdues = 0
+    for paire in paires:
+        for estimee, erreur, erreur_avant in evaluer_paire(paire, plateau, params):
+            if erreur is None:
+                perdues += 1
+                continue
+            stats["déplacées" if estimee.deplacee else "immobiles"].append((erreur, erreur_avant, estimee.incertitude))
+
+    print(f"{len(paires)} paire(s) avant / après, {perdues} pièce(s) prédite(s) non retrouvée(s)")
+    print(f"{'pièces':>10} | {'n':>5} | {'erreur prédite (mm)':>19} | {'avant inchangé (mm)':>21} | {'< 2 incert.':>11}")
+    for nom, valeurs in stats.items():
+        if not valeurs:
+            continue
+        n = len(valeurs)
+        print(f"{nom:>10} | {n:>5} | {sum(v[0] for v in valeurs) / n:>19.1f} | {sum(v[1] for v in valeurs) / n:>21.1f} | "
+              f"{sum(v[0] <= 2 * v[2] for v in valeurs) / n:>11.1%}")
+    return stats
+
+
+def verifier_synthetique(seed=0):
+    """
+    Sur des paires simulées, la prédiction doit battre la position d'avant et son incertitude couvrir l'erreur.
+    La simulation pousse aussi en chaîne et n'a pas la géométrie du couloir : le modèle peut y échouer.
+    À remplacer par des paires enregistrées (PAIRES_DETECTION dans main.py) dès qu'il y en a.
+    """
+    rng = random.Random(seed)
+    plateau, params = plateau_defaut(), ParametresPoussee()
+    stats = rapport([paire_synthetique(rng, plateau, params) for _ in range(N_PAIRES_SYNTHETIQUES)], plateau, params)
+    deplacees, immobiles = stats["déplacées"], stats["immobiles"]
+    assert deplacees, "aucune pièce déplacée par les poussées synthétiques"
+    assert sum(v[0] for v in deplacees) < 0.5 * sum(v[1] for v in deplacees), "prédiction pas meilleure que l'état d'avant"
+    assert sum(v[0] <= 2 * v[2] for v in deplacees) >= 0.8 * len(deplacees), "incertitude sous-estimée"
+    hors_couloir = sum(v[0] > 2 * v[2] + 3 * BRUIT_DETECTION_MM for v in immobiles) # poussées en chaîne, non modélisées
+    assert hors_couloir <= 0.01 * len(immobiles), f"{hors_couloir} pièce(s) hors couloir déplacée(s)"
+
+
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        paires = []
+        for chemin in sys.argv[1:]:
+            with open(chemin) as f:
+                paires += [json.loads(ligne) for ligne in f if ligne.strip()]
+        rapport(paires, plateau_defaut())
+    else:
+        verifier_synthetique()
@@ -1,94 +1,551 @@
 import serial
 import time
+import json
+import bisect
+import threading
+from collections import deque, defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+try:
+    from .motion_model import MotionModel
+except ImportError: # lancé en stand-alone (python src/tronxy_control.py)
+    from motion_model import MotionModel
 
 """programme permettant la connection et l'envoie de commande G-code pour les mouvements de l'imprimante, peut fonctionner en stand-alone
 sur un terminal pour vérifier les connections  """
 
+# Streaming des lots : nombre de lignes envoyées sans attendre leur "ok" (crédit du buffer de commandes du firmware,
+# BUFSIZE=4 par défaut sous Marlin). Le planificateur peut alors enchaîner les mouvements sans s'arrêter entre eux.
+CREDIT_STREAMING = 4
+TIMEOUT_CREDIT_S = 30 # attente max d'un "ok" pour libérer du crédit (un mouvement long peut bloquer le buffer)
+
+# Lots numérotés (send_batch) : lignes "N<numéro> <commande>*<checksum>" que le firmware redemande ("Resend: n")
+# si elles arrivent corrompues ou manquantes
+HISTORIQUE_MAX = 256 # lignes gardées pour les renvois (le firmware ne redemande que des lignes récentes)
+SILENCE_S = 5.0 # sans réponse ni keepalive pendant ce temps (> plus long mouvement), une ligne déjà envoyée sert de sonde
+BARRIERE = "M114" # suit la sonde : sa position arrive après les réponses à toutes les lignes précédentes
+
+# Thread de lecture
+EVENEMENTS_MAX = 1000 # événements gardés dans la file (les plus anciens sont perdus si personne ne les lit)
+BORNES_LATENCE_MS = (2, 5, 10, 20, 50, 100, 500, 2000) # classes des histogrammes de latence aller-retour
+
+
+@dataclass
+class Evenement:
+    """Ligne reçue de l'imprimante, typée par le thread de lecture."""
+    type: str # "ok", "busy", "echo", "error", "resend", "position" ou "autre"
+    texte: str
+    t: float = field(default_factory=time.perf_counter)
+    numero: int = None # ligne redemandée ("resend")
+    position: dict = None # {"X": .., "Y": .., "Z": ..} ("position", réponse à M114)
+
+
+def numero_renvoi(resp):
+    # "Resend: 12" (Marlin) ou "rs 12" / "rs N12" (Repetier) -> 12, sinon None
+    mots = resp.replace(':', ' ').split()
+    if len(mots) >= 2 and mots[0].lower() in ('resend', 'rs'):
+        try:
+            return int(mots[1].lstrip('Nn'))
+        except ValueError:
+            return None
+    return None
+
+
+def analyser_ligne(resp):
+    """Type une ligne reçue : "ok", "busy" (keepalive "echo:busy: processing"), "echo", "error", "resend", "position"."""
+    bas = resp.lower()
+    if bas.startswith('ok'):
+        return Evenement("ok", resp)
+    if 'busy:' in bas:
+        return Evenement("busy", resp)
+    if bas.startswith('echo'):
+        return Evenement("echo", resp)
+    if bas.startswith('error'):
+        return Evenement("error", resp)
+    n = numero_renvoi(resp)
+    if n is not None:
+        return Evenement("resend", resp, numero=n)
+    if resp.startswith('X:') and 'Y:' in resp: # "X:10.00 Y:20.00 Z:5.00 E:0.00 Count X:..."
+        position = {}
+        for mot in resp.split('Count')[0].split():
+            axe, _, valeur = mot.partition(':')
+            try:
+                position[axe] = float(valeur)
+            except ValueError:
+                pass
+        return Evenement("position", resp, position=position)
+    return Evenement("autre", resp)
+
+
+def valeur_mot(mot):
+    # "X12.5" -> 12.5 ; "X" ou "Xabc" -> None (mot sans valeur numérique)
+    try:
+        return float(mot[1:])
+    except ValueError:
+        return None
+
+
+class EtatModal:
+    """
+    État modal de l'imprimante vu par l'hôte (mode G90/G91, feedrate, dernière position commandée), pour ne pas
+    émettre ce qui ne change rien : changements de mode redondants, mots F inchangés, mouvements de longueur nulle.
+    Une valeur None est inconnue : la commande correspondante est alors toujours envoyée.
+    Seuls les mots X/Y/Z/F numériques sont interprétés ; les commentaires sont retirés, et une ligne déjà numérotée
+    (N..., *checksum) est transmise telle quelle en rendant l'état inconnu.
+    """
+
+    AXES = ("X", "Y", "Z")
+
+    def __init__(self):
+        self.oublier()
+        self.reinitialiser_compteurs()
+
+    def oublier(self):
+        # Après une connexion ou un envoi en échec, l'état réel de l'imprimante est inconnu
+        self.absolu = None
+        self.feedrate = None
+        self.f_en_attente = None # mot F d'un mouvement nul supprimé, à porter par le prochain mouvement
+        self.position = dict.fromkeys(self.AXES)
+
+    def reinitialiser_compteurs(self):
+        self.commandes_economisees = 0
+        self.octets_economises = 0
+
+    def filtrer(self, commands):
+        """
+        Retourne les commandes réellement utiles, dans l'ordre, et met l'état à jour.
+        Deux G1 consécutifs sur le même axe seul, dans le même sens et à la même vitesse, sont fusionnés
+        (même trajet, sans arrêt intermédiaire).
+        """
+        emises = []
+        fusionnable = None # (axe, sens, feedrate) du dernier G1 émis s'il ne bouge qu'un axe
+        for command in commands:
+            command = command.split(";")[0].strip() or command.strip() # commentaire seul : transmis tel quel
+            if command.startswith(";") or command[:1].upper() == "N" or "*" in command:
+                # Ligne non interprétée : envoyée telle quelle, après un éventuel F en attente qu'elle pourrait perdre
+                if self.f_en_attente and not command.startswith(";"):
+                    emises.append(f"G1 {self.f_en_attente}")
+                    self.feedrate = valeur_mot(self.f_en_attente)
+                if not command.startswith(";"):
+                    self.oublier()
+                emises.append(command)
+                fusionnable = None
+                continue
+            mots = command.split()
+            code = mots[0].upper() if mots else ""
+            ligne = command
+            mouvement = None
+
+            if code in ("G90", "G91"):
+                absolu = code == "G90"
+                ligne = None if self.absolu == absolu else command
+                self.absolu = absolu
+            elif code in ("G0", "G1"):
+                ligne, mouvement = self._filtrer_mouvement(code, mots[1:])
+            elif code == "G28": # position d'origine dépendante des butées : inconnue jusqu'au prochain mouvement absolu
+                self.position = dict.fromkeys(self.AXES)
+            elif code == "G92":
+                for mot in mots[1:]:
+                    if mot[0].upper() in self.AXES:
+                        self.position[mot[0].upper()] = valeur_mot(mot)
+
+            if ligne is None:
+                self.commandes_economisees += 1
+                self.octets_economises += len(command) + 1 # '\n' compris
+                continue
+            self.octets_economises += len(command) - len(ligne)
+            if mouvement is not None and mouvement == fusionnable:
+                precedente = emises.pop() # même trajet : seule la cible finale compte
+                self.commandes_economisees += 1
+                self.octets_economises += len(precedente) + 1
+                f_precedent = [mot for mot in precedente.split() if mot.upper().startswith("F")]
+                if f_precedent and " F" not in ligne.upper(): # le feedrate n'était porté que par la ligne fusionnée
+                    ligne += " " + f_precedent[0]
+                    self.octets_economises -= len(f_precedent[0]) + 1
+            fusionnable = mouvement
+            emises.append(ligne)
+        return emises
+
+    def _filtrer_mouvement(self, code, mots):
+        # Retourne (ligne à émettre ou None, (axe, sens, feedrate) si un seul axe bouge en absolu)
+        gardes, axes = [], []
+        feedrate = mot_f = None
+        autres = False # mots dont l'effet n'est pas suivi (E, axe sans valeur...) : la ligne est toujours émise
+        for mot in mots:
+            lettre, valeur = mot[0].upper(), valeur_mot(mot)
+            if lettre == "F" and valeur is not None:
+                feedrate, mot_f = valeur, mot
+                continue
+            if lettre in self.AXES and valeur is None:
+                self.position[lettre] = None
+                autres = True
+            elif lettre not in self.AXES:
+                autres = True
+            else:
+                actuelle = self.position[lettre]
+                if self.absolu:
+                    cible = valeur
+                elif self.absolu is False and actuelle is not None:
+                    cible = actuelle + valeur
+                else:
+                    cible = None
+                if (self.absolu and actuelle is not None and abs(cible - actuelle) < 1e-6) or \
+                        (self.absolu is False and abs(valeur) < 1e-6):
+                    continue # axe déjà à la cible
+                axes.append((lettre, None if actuelle is None or cible is None else cible - actuelle))
+                self.position[lettre] = cible
+            gardes.append(mot)
+
+        if not mots and feedrate is None: # "G1" seul
+            return code, None
+        if not axes and not autres and any(m[0].upper() in self.AXES for m in mots):
+            # Mouvement nul : le feedrate éventuel sera envoyé avec le prochain mouvement
+            if feedrate is not None:
+                self.f_en_attente = mot_f if feedrate != self.feedrate else None
+            return None, None
+        if feedrate is None and self.f_en_attente:
+            mot_f = self.f_en_attente
+            feedrate = float(mot_f[1:])
+        self.f_en_attente = None
+        if feedrate is not None and feedrate != self.feedrate:
+            gardes.append(mot_f)
+            self.feedrate = feedrate
+        if not gardes: # feedrate seul, déjà en vigueur
+            return None, None
+
+        mouvement = None
+        if self.absolu and len(axes) == 1 and axes[0][1] is not None:
+            mouvement = (axes[0][0], axes[0][1] > 0, self.feedrate)
+        return " ".join([code] + gardes), mouvement
+
+    def rapport(self):
+        print(f"Commandes évitées : {self.commandes_economisees}, octets évités : {self.octets_economises}")
+
+
 class TronxyController:
-    def __init__(self, port='/dev/ttyACM0', baud=115200, timeout=1): #changer le port et baud rate en fonction des specs du périphérique
+    def __init__(self, port='/dev/ttyACM0', baud=115200, timeout=1, credit=CREDIT_STREAMING, silence_s=SILENCE_S): #changer le port et baud rate en fonction des specs du périphérique
         self.port = port
         self.baud = baud
         self.timeout = timeout
         self.ser = None
+        self.credit = credit
+        self.silence_s = silence_s
+        self.numero = None # numéro de la dernière ligne numérotée envoyée (None : M110 pas encore envoyé)
+        self.historique = {} # numéro -> ligne encodée, pour les renvois (HISTORIQUE_MAX dernières)
+        self.latences_lots = [] # (n lignes, durée s, n renvois) de chaque send_batch
+        self.etat = EtatModal() # filtre les commandes sans effet (mode, F, mouvements nuls)
+
+        # Modèle cinématique : timeouts adaptés aux mouvements envoyés depuis le dernier M400
+        self.modele = MotionModel()
+        self.depuis_synchro = [] # commandes émises depuis le dernier point de synchronisation
+        self.depart_synchro = dict(self.etat.position) # position commandée à ce point
+        self.t_premier_envoi = None
+        self.intervalles = [] # {"commandes", "depart", "duree_s"} mesurés, pour comparer au modèle
+
+        # Thread de lecture : chaque ligne reçue devient un Evenement, chaque "ok" résout le Future de la
+        # plus ancienne commande en attente (le firmware répond dans l'ordre d'envoi)
+        self.cond = threading.Condition()
+        self.evenements = deque(maxlen=EVENEMENTS_MAX)
+        self.attentes = deque() # (Future, mot G-code, instant d'envoi), dans l'ordre d'envoi
+        self.dernier_busy = 0.0 # instant du dernier keepalive "busy: processing"
+        self.ok_sans_attente = 0 # "ok" reçus sans commande en attente : comptage des "ok" désynchronisé
+        self.position = None # dernière position rapportée (M114)
+        self.latences = defaultdict(list) # mot G-code ("G1", "M400"...) -> latences aller-retour (s)
+        self._lecteur = None
+        self._actif = False
 
     def connect(self):
         try:
             self.ser = serial.Serial(self.port, self.baud, timeout=self.timeout) #connection à l'imprimante
             time.sleep(2)
+            self.demarrer_lecture()
             self._drain_input() #élimine les potentiels messages résiduels
+            self.numero = None # la carte redémarre à l'ouverture du port : numérotation à réinitialiser (M110)
+            self.historique.clear()
+            self.etat.oublier()
+            self.lire_parametres()
             print(f"Connecté à {self.port} @ {self.baud}")
             return True
         except Exception as e:
             print("Erreur connexion:", e)
             return False
 
-    def _drain_input(self):
-        """Vide le buffer série de tous les messages en attente."""
-        if not self.ser:
-            return
-        time.sleep(0.1) #pour attendre les possibles message retardataires
-        while self.ser.in_waiting:
+    def demarrer_lecture(self):
+        """Lance le thread de lecture sur self.ser (appelé par connect, ou directement avec un port simulé)."""
+        self._actif = True
+        self._lecteur = threading.Thread(target=self._boucle_lecture, daemon=True)
+        self._lecteur.start()
+
+    def _boucle_lecture(self):
+        while self._actif:
             try:
-                line = self.ser.readline().decode(errors='ignore').strip() #decode converti les octets en caractères, strip enlève les espaces
-                if line:
-                    print("RCV (drain):", line)
-            except:
-                break
+                resp = self.ser.readline().decode(errors='ignore').strip() #bloque au plus self.timeout
+            except Exception as e:
+                if self._actif:
+                    print("Erreur lecture:", e)
+                    time.sleep(self.timeout)
+                continue
+            if not resp:
+                continue
+            print("RCV:", resp)
+            ev = analyser_ligne(resp)
+            with self.cond:
+                if ev.type == "ok" and self.attentes:
+                    fut, mot, t_envoi = self.attentes.popleft()
+                    self.latences[mot].append(ev.t - t_envoi)
+                    if not fut.done():
+                        fut.set_result(ev)
+                elif ev.type == "ok":
+                    self.ok_sans_attente += 1
+                elif ev.type == "busy":
+                    self.dernier_busy = ev.t
+                elif ev.type == "position":
+                    self.position = ev.position
+                    # Réponse à une barrière : les lignes envoyées avant elle ont toutes été traitées,
+                    # leurs "ok" encore attendus sont perdus (les "ok" suivants restent appariés dans l'ordre)
+                    if any(mot == BARRIERE for _, mot, _ in self.attentes):
+                        while self.attentes[0][1] != BARRIERE:
+                            fut, _, _ = self.attentes.popleft()
+                            if not fut.done():
+                                fut.set_result(ev)
+                self.evenements.append(ev)
+                self.cond.notify_all()
+
+    def lire_parametres(self):
+        """Règle le modèle cinématique sur les accélérations et vitesses max du firmware (réponse à M503)."""
+        self._drain_input()
+        if not self.send_command("M503", timeout_s=5):
+            print("M503 sans réponse : modèle cinématique par défaut")
+            return
+        with self.cond:
+            texte = "\n".join(ev.texte for ev in self.evenements)
+            self.evenements.clear()
+        self.modele = MotionModel.depuis_m503(texte)
+
+    def _noter_emission(self, lignes):
+        if lignes and self.t_premier_envoi is None:
+            self.t_premier_envoi = time.perf_counter()
+        self.depuis_synchro.extend(lignes)
+
+    def _drain_input(self):
+        """Oublie les événements reçus et pas encore lus (messages résiduels, déjà affichés par le thread de lecture)."""
+        with self.cond:
+            self.evenements.clear()
+
+    def _ecrire(self, data, command):
+        """Écrit une ligne et enregistre le Future résolu par son "ok"."""
+        fut = Future()
+        with self.cond:
+            self.attentes.append((fut, command.split()[0] if command.split() else "", time.perf_counter()))
+        self.ser.write(data)
+        self.ser.flush()
+        return fut
+
+    def _attendre(self, fut, timeout_s):
+        """Attend le "ok" d'un Future ; chaque keepalive "busy" reçu repousse l'échéance de timeout_s."""
+        debut = time.perf_counter()
+        with self.cond:
+            while not fut.done():
+                restant = max(debut, self.dernier_busy) + timeout_s - time.perf_counter()
+                if restant <= 0:
+                    return False
+                self.cond.wait(restant)
+        return True
+
+    def _renvoi_en_attente(self):
+        """Vrai si une demande "Resend" reçue n'a pas encore été lue (son "ok" a pu résoudre la dernière attente)."""
+        with self.cond:
+            return any(ev.type == "resend" for ev in self.evenements)
+
+    def _prochain_evenement(self, timeout_s):
+        """Retire le plus ancien événement de la file (attend au plus timeout_s, None sinon)."""
+        with self.cond:
+            if not self.evenements:
+                self.cond.wait_for(lambda: self.evenements, timeout_s)
+            return self.evenements.popleft() if self.evenements else None
 
     def send_command(self, command, wait_ok=True, timeout_s=15): # envoie commande Gcode
         if not self.ser or not self.ser.is_open: # vérifie la connection
             print("Non connecté")
             return False
+        lignes = self.etat.filtrer([command])
+        if not lignes: # déjà dans l'état demandé
+            return True
+        command = lignes[0]
+        self._noter_emission(lignes)
 
         line = (command.strip() + '\n').encode() # met les caractères en UTF-8
         try:
-            self.ser.write(line) #envoie la commande en série
-            self.ser.flush()  #force l'envoie des données
+            fut = self._ecrire(line, command) #envoie la commande en série
             print("SND:", command)
         except Exception as e:
             print("Erreur envoi:", e)
             return False
 
-        if wait_ok:
-            deadline = time.time() + timeout_s
-            while time.time() < deadline:
-                try:
-                    resp = self.ser.readline().decode(errors='ignore').strip() #recupère la réponse de l'imprimante
-                except:
-                    resp = ''  #si erreur de lecture
-                if resp:
-                    print("RCV:", resp)
-                    if 'ok' in resp.lower(): #si la réponse est 'ok' on répond True
-                        return True
+        if wait_ok and not self._attendre(fut, timeout_s):
             print(f"Timeout attente OK ({timeout_s}s) pour: {command}")
+            self.etat.oublier()
             return False
         return True
 
+    def synchroniser(self, timeout_s=None):
+        """
+        Point de synchronisation (avant une photo par ex.) : M400 attend la fin de tous les mouvements.
+        Sans timeout_s, le timeout est tiré de la durée estimée des mouvements envoyés depuis la dernière synchronisation.
+        """
+        commandes, depart = self.depuis_synchro, self.depart_synchro
+        if timeout_s is None:
+            timeout_s = self.modele.timeout(commandes, depart)
+        ok = self.send_command("M400", timeout_s=timeout_s)
+        if ok and self.t_premier_envoi is not None:
+            self.intervalles.append({"commandes": commandes, "depart": depart,
+                                     "duree_s": time.perf_counter() - self.t_premier_envoi})
+        self.depuis_synchro, self.depart_synchro, self.t_premier_envoi = [], dict(self.etat.position), None
+        return ok
+
+    def sauver_reference(self, chemin):
+        """Enregistre les intervalles mesurés (run de référence pour python -m src.motion_model <chemin>)."""
+        with open(chemin, "w") as f:
+            json.dump(self.intervalles, f, indent=1)
+        print(f"{len(self.intervalles)} intervalles de mouvement enregistrés dans '{chemin}'")
+
+    @staticmethod
+    def ligne_numerotee(numero, command):
+        """Ligne au format Marlin : "N<numero> <commande>*<checksum>", checksum = XOR des octets avant '*'."""
+        ligne = f"N{numero} {command.strip()}"
+        checksum = 0
+        for octet in ligne.encode():
+            checksum ^= octet
+        return f"{ligne}*{checksum}"
+
+    def send_batch(self, commands, timeout_s=TIMEOUT_CREDIT_S):
+        """
+        Envoie un lot de commandes numérotées avec checksum, jusqu'à self.credit lignes en vol.
+        Sur "Resend: n", renvoie les lignes depuis n (historique borné). Retourne True quand tout le lot est accepté.
+        """
+        if not self.ser or not self.ser.is_open:
+            print("Non connecté")
+            return False
+        commands = self.etat.filtrer(commands)
+        if not commands:
+            return True
+        self._noter_emission(commands)
+        if self.numero is None: # le firmware attend ensuite la ligne 1
+            if not self.send_command("M110 N0"):
+                return False
+            self.numero = 0
+
+        #1 Numérotation et historique
+        premier = self.numero + 1
+        for i, command in enumerate(commands):
+            self.historique[premier + i] = (command.strip(), (self.ligne_numerotee(premier + i, command) + '\n').encode())
+        self.numero += len(commands)
+        for n in [n for n in self.historique if n <= self.numero - HISTORIQUE_MAX]:
+            del self.historique[n]
+
+        #2 Envoi avec fenêtre de crédit (Futures en attente de "ok"), renvois sur demande
+        self._drain_input()
+        t0 = time.perf_counter()
+        prochain = premier # prochaine ligne à écrire
+        en_vol = deque() # Futures des lignes écrites
+        ignorer, ignorer_n = 0, None # demandes "Resend: ignorer_n" périmées (lignes déjà parties au rembobinage)
+        renvois = 0
+        deadline = time.perf_counter() + timeout_s # repoussée à chaque réponse du firmware
+        # Le "ok" qui suit "Error" + "Resend: n" peut résoudre la dernière attente : le lot n'est fini qu'une fois
+        # toutes les demandes de renvoi lues
+        while prochain <= self.numero or en_vol or self._renvoi_en_attente():
+            while en_vol and en_vol[0].done():
+                en_vol.popleft()
+            while len(en_vol) < self.credit and prochain <= self.numero:
+                en_vol.append(self._ecrire(self.historique[prochain][1], self.historique[prochain][0]))
+                prochain += 1
+            if not en_vol and not self._renvoi_en_attente():
+                continue
+
+            ev = self._prochain_evenement(self.silence_s)
+            if ev is None:
+                if time.perf_counter() > deadline:
+                    print(f"Timeout lot ({timeout_s}s sans réponse), lignes {premier}..{self.numero}")
+                    self.etat.oublier()
+                    return False
+                # Réponse perdue ou en retard : on renvoie la dernière ligne écrite, le firmware l'exécute si elle lui
+                # manquait, sinon il la rejette et redemande la ligne qu'il attend. La barrière qui suit résout les
+                # attentes dont le "ok" ne viendra plus, sans confondre un "ok" en retard avec celui d'une autre ligne
+                ignorer = 0
+                renvois += 1
+                en_vol.append(self._ecrire(self.historique[prochain - 1][1], self.historique[prochain - 1][0]))
+                en_vol.append(self._ecrire((BARRIERE + '\n').encode(), BARRIERE))
+                continue
+            deadline = time.perf_counter() + timeout_s
+
+            if ev.type == "resend":
+                n = ev.numero
+                if n >= prochain: # le firmware a tout reçu jusqu'à la dernière ligne écrite
+                    continue
+                if ignorer > 0 and n == ignorer_n:
+                    ignorer -= 1
+                    continue
+                if n not in self.historique:
+                    print(f"Renvoi impossible : ligne {n} hors de l'historique")
+                    self.etat.oublier()
+                    return False
+                ignorer, ignorer_n = prochain - 1 - n, n # les lignes parties après n seront aussi rejetées
+                renvois += prochain - n
+                prochain = n
+
+        duree = time.perf_counter() - t0
+        self.latences_lots.append((len(commands), duree, renvois))
+        print(f"Lot de {len(commands)} lignes : {duree * 1000:.0f} ms ({renvois} renvoi(s))")
+        return True
+
+    def histogramme_latences(self, mot=None):
+        """Nombre de commandes par classe de latence aller-retour (BORNES_LATENCE_MS), pour un mot G-code ou tous."""
+        latences = self.latences[mot] if mot else [l for ls in self.latences.values() for l in ls]
+        classes = [0] * (len(BORNES_LATENCE_MS) + 1)
+        for l in latences:
+            classes[bisect.bisect_right(BORNES_LATENCE_MS, l * 1000)] += 1
+        return classes
+
+    def rapport_latences(self):
+        bornes = [f"<{b}" for b in BORNES_LATENCE_MS] + [f">={BORNES_LATENCE_MS[-1]}"]
+        print(f"{'latence (ms)':>12} | " + " | ".join(f"{b:>6}" for b in bornes))
+        for mot in sorted(self.latences):
+            print(f"{mot:>12} | " + " | ".join(f"{c:>6}" for c in self.histogramme_latences(mot)))
+
     def disconnect(self):
+        self._actif = False
+        if self._lecteur:
+            self._lecteur.join(timeout=2 * self.timeout)
         if self.ser and self.ser.is_open:
             self.ser.close() #ferme la connection
             print("Déconnecté")
 
     def home_all(self):
-        return self.send_command("G28", timeout_s=60) #envoie la commande de homing par le port série
+        timeout_s = self.modele.timeout(["G28"], self.etat.position) # position inconnue : course complète
+        ok = self.send_command("G28", timeout_s=timeout_s) #envoie la commande de homing par le port série
+        self.depuis_synchro, self.depart_synchro, self.t_premier_envoi = [], dict(self.etat.position), None
+        return ok
 
-    def move_x(self, distance, speed=1500):
+    def _deplacer_relatif(self, axe, distance, speed):
+        # Position connue : un seul mouvement absolu (G90 n'est réellement envoyé que s'il manque)
+        actuelle = self.etat.position[axe]
+        if actuelle is not None:
+            self.send_command("G90")
+            return self.send_command(f"G1 {axe}{round(actuelle + float(distance), 3)} F{speed}")
         self.send_command("G91", wait_ok=True) #passage en mode coordonnées relatives
-        ok = self.send_command(f"G1 X{distance} F{speed}") #commande mouvement avec position et vitesse
+        ok = self.send_command(f"G1 {axe}{distance} F{speed}") #commande mouvement avec position et vitesse
         self.send_command("G90", wait_ok=True) #passage en mode coordonnées absolues
         return ok
 
+    def move_x(self, distance, speed=1500):
+        return self._deplacer_relatif("X", distance, speed)
+
     def move_y(self, distance, speed=1500):
-        self.send_command("G91", wait_ok=True)
-        ok = self.send_command(f"G1 Y{-float(distance)} F{speed}")
-        self.send_command("G90", wait_ok=True)
-        return ok
+        return self._deplacer_relatif("Y", -float(distance), speed)
 
     def move_z(self, distance, speed=300):
-        self.send_command("G91", wait_ok=True)
-        ok = self.send_command(f"G1 Z{distance} F{speed}")
-        self.send_command("G90", wait_ok=True)
-        return ok
+        return self._deplacer_relatif("Z", distance, speed)
 
     def move_to(self, x, y, z, speed=1500):
         self.send_command("G90", wait_ok=True)
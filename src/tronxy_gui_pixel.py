@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 import threading
 from .tronxy_control import TronxyController
+from .calibration import charger_ou_lineaire
 
 
 class TronxyPixelGUI:
@@ -10,13 +11,8 @@ class TronxyPixelGUI:
         self.root.title("Tronxy Control - Mode Pixels")
         self.root.geometry("700x500")
 
-        GST_W = 2028 #definition largeur
-        GST_H = 1520 #définition hauteur
-        CUT_LEFT, CUT_RIGHT = 0.10, 0.16  #pourcentage de cropage des images
-        CUT_TOP, CUT_BOTTOM = 0.0, 0.04 #pourcentage de cropage des images
-
-        self.screen_width = float(int(GST_W * (1 - CUT_RIGHT)) - int(GST_W * CUT_LEFT))   # croppage des images
-        self.screen_height = float(int(GST_H * (1 - CUT_BOTTOM)) - int(GST_H * CUT_TOP))  # croppage des images
+        # Pixels de l'image rognée -> mm : même calibration que main.py (models/calibration.npz, sinon linéaire)
+        self.calibration = charger_ou_lineaire()
 
         self.X_MIN, self.X_MAX = 0, 320  #définition des tailles plateau pour la tête
         self.Y_MIN, self.Y_MAX = 0, 320
@@ -42,12 +38,6 @@ class TronxyPixelGUI:
         self.status_label = ttk.Label(top_frame, text="Déconnecté", foreground="red")
         self.status_label.pack(side=tk.LEFT, padx=20)
 
-        # Paramètres par défaut
-        self.plate_width = 320.0 
-        self.plate_height = 320.0
-        self.screen_width = 1501.0
-        self.screen_height = 1459.0
-
         input_frame = ttk.LabelFrame(self.root, text="Coordonnées pixels")
         input_frame.pack(fill=tk.X, padx=5, pady=5)
 
@@ -81,9 +71,8 @@ class TronxyPixelGUI:
         self.y_label.grid(row=0, column=3, sticky=tk.W)
 
     def pixels_vers_mm(self, px, py):
-        mm_x = (1.0 - px / self.screen_width) * self.plate_width
-        mm_y = (py / self.screen_height) * self.plate_height
-        return round(mm_x, 2), round(mm_y, 2)
+        mm_x, mm_y = self.calibration.pixels_vers_mm(px, py)
+        return round(float(mm_x), 2), round(float(mm_y), 2)
 
     def move_from_pixels(self):
         if not self.connected: